@@ -1,48 +1,78 @@
 from tkinter import *
 from tkinter import ttk, messagebox, filedialog
 import ttkthemes
-import pymysql
 import time
 from datetime import datetime
 import csv
+import gzip
+import io
+import os
+import queue
+import threading
+from bisect import bisect_left
+from virtualview import VirtualTreeview
+from library_db import (BOOK_COLUMNS, BULK_CHUNK, DBWorker, DuplicateISBN, MySQLBackend, QueryCancelled,
+                        QueryTicket, SearchCache, filter_words, narrows)
+from library_sqlite import SQLiteBackend
+import perfview
 
 # ========================== Database ==========================
+# Storage is a backend object: MySQLBackend (a server, through a connection
+# pool) or SQLiteBackend (a local file). Every call runs on db_worker and
+# the result comes back to the Tk thread through a callback, so the window
+# never waits on the database.
+backend = None
+
+def run_db(job, on_done=None, on_error=None):
+    # job(backend) runs on a worker thread
+    db = backend
+    return db_worker.submit(lambda: job(db), on_done, on_error)
+
+def window_or_root(window):
+    # a dialog may be closed before its query finishes
+    return window if window.winfo_exists() else root
+
 def connect_database():
-    def connect():
-        global mycursor, con
-        try:
-            con = pymysql.connect(
-                host=hostEntry.get(),
-                user=userEntry.get(),
-                password=passwordEntry.get()
-            )
-            mycursor = con.cursor()
-            mycursor.execute("CREATE DATABASE IF NOT EXISTS librarymanagementsystem")
-            mycursor.execute("USE librarymanagementsystem")
-            mycursor.execute("""
-                CREATE TABLE IF NOT EXISTS books (
-                    ISBN VARCHAR(50) PRIMARY KEY,
-                    Title VARCHAR(255) NOT NULL,
-                    Author VARCHAR(255),
-                    Year INT,
-                    Added_Date DATE,
-                    Added_Time TIME
-                )
-            """)
-            con.commit()
-            messagebox.showinfo('Success', 'Database Connected and Created Successfully', parent=connectWindow)
+    def start(db):
+        def connected(_):
+            global backend, change_tracking
+            if backend is not None:
+                backend.close()
+            backend = db
+            change_tracking = db.change_tracking
+            reset_catalog()
             enable_buttons()
-            connectWindow.destroy()
-        except pymysql.err.OperationalError as e:
-            messagebox.showerror('Error', f'Connection failed: {e}', parent=connectWindow)
-            passwordEntry.delete(0, END)
-        except Exception as e:
+            if connectWindow.winfo_exists():
+                messagebox.showinfo('Success', 'Database Connected and Created Successfully', parent=connectWindow)
+                connectWindow.destroy()
+
+        def failed(e):
+            db.close()
+            if not connectWindow.winfo_exists():
+                messagebox.showerror('Error', f'Connection failed: {e}', parent=root)
+                return
+            connectButton.config(state=NORMAL)
+            fileButton.config(state=NORMAL)
             passwordEntry.delete(0, END)
             messagebox.showerror('Error', f'Connection failed: {e}', parent=connectWindow)
 
+        connectButton.config(state=DISABLED)
+        fileButton.config(state=DISABLED)
+        db_worker.submit(db.create_schema, connected, failed)
+
+    def connect():
+        start(MySQLBackend(host=hostEntry.get(), user=userEntry.get(), password=passwordEntry.get()))
+
+    def open_file():
+        path = filedialog.asksaveasfilename(parent=connectWindow, title='Library Database File',
+                                            defaultextension='.db', confirmoverwrite=False,
+                                            filetypes=[('SQLite database', '*.db'), ('All files', '*.*')])
+        if path:
+            start(SQLiteBackend(path))
+
     connectWindow = Toplevel()
     connectWindow.grab_set()
-    connectWindow.geometry('470x250+730+230')
+    connectWindow.geometry('470x300+730+230')
     connectWindow.title('Connect Database')
     connectWindow.resizable(False, False)
 
@@ -60,32 +90,267 @@ def connect_database():
     passwordEntry = Entry(connectWindow, font=('times new roman', 14, 'bold'), bd=2, show='*')
     passwordEntry.grid(row=2, column=1, padx=20, pady=8)
 
-    ttk.Button(connectWindow, text='Connect', cursor='hand2', command=connect).grid(row=3, columnspan=2, pady=12)
+    connectButton = ttk.Button(connectWindow, text='Connect', cursor='hand2', command=connect)
+    connectButton.grid(row=3, columnspan=2, pady=12)
+    fileButton = ttk.Button(connectWindow, text='Use Local File (SQLite)', cursor='hand2', command=open_file)
+    fileButton.grid(row=4, columnspan=2)
 
 
 def enable_buttons():
     for btn in [addBookButton, searchBookButton, updateBookButton,
-                deleteBookButton, showBookButton, exportBookButton]:
+                deleteBookButton, showBookButton, importBookButton, exportBookButton]:
         btn.config(state=NORMAL)
 
 # ========================== Book Operations ==========================
 def check_connection():
-    if 'mycursor' not in globals():
+    if backend is None:
         messagebox.showerror('Error', 'Database not connected')
         return False
     return True
 
+# Listings and searches can overlap; only the latest one may fill bookView.
+view_generation = 0
+
+def next_view():
+    global view_generation
+    view_generation += 1
+    return view_generation
+
+# Show Books loads the table a page at a time with keyset pagination:
+# each page is the next PAGE_SIZE rows after the last ISBN already loaded,
+# which the primary key answers directly however deep the page is. bookView
+# asks for the next page (load_more_books) when it scrolls near the end of
+# all_rows, so the first screen costs one page whatever the table size.
+PAGE_SIZE = 500
+all_rows = []
+all_loaded = True
+page_loading = False
+
+# all_rows doubles as the client's cache of the table. It is kept between
+# Show Books calls and, instead of being loaded again, is brought up to
+# date with the rows changed since catalog_seen (refresh_catalog). Search
+# results are cached per catalog version. Without change tracking (no
+# trigger privilege) every Show and Search goes to the server.
+CHECK_INTERVAL = 2.0
+change_tracking = False
+catalog_seen = None     # catalog version all_rows and search_cache are current with
+catalog_checked = 0.0   # when catalog_seen was last confirmed
+catalog_epoch = 0       # bumped by every write made from this window
+search_cache = SearchCache()
+
+def reset_catalog():
+    global all_rows, all_loaded, catalog_seen, search_cache
+    all_rows = []
+    all_loaded = False
+    catalog_seen = None
+    search_cache = SearchCache()
+
+def note_write():
+    # this window's own writes change the version too: re-check on next read
+    global catalog_epoch, catalog_checked
+    catalog_epoch += 1
+    catalog_checked = 0.0
+    search_cache.clear()
+
+def refresh_catalog(then):
+    # brings all_rows and search_cache up to the server's version, then calls then()
+    if time.monotonic() - catalog_checked < CHECK_INTERVAL:
+        then()
+        return
+    since, epoch = catalog_seen, catalog_epoch
+    # only the loaded prefix of the table is cached
+    upto = None if all_loaded else (all_rows[-1][0] if all_rows else '')
+
+    def check(db):
+        version = db.version()
+        if since is None or version == since:
+            return version, ()
+        return version, db.changes(since, upto)
+
+    def done(result):
+        global catalog_seen, catalog_checked
+        version, changes = result
+        if epoch == catalog_epoch:  # else a local write raced the check: try again next time
+            if changes is None:
+                reset_catalog()  # too old for the tombstones: start over
+            else:
+                if changes:
+                    apply_changes(*changes)
+                catalog_seen = version
+                catalog_checked = time.monotonic()
+        then()
+
+    run_db(check, done, lambda e: messagebox.showerror('Error', f'Unable to fetch data: {e}'))
+
+def apply_changes(rows, deleted):
+    written = {row[0] for row in rows}
+    gone = set(deleted) - written  # deleted and not written again since
+    if gone:
+        all_rows[:] = [row for row in all_rows if row[0] not in gone]
+    for row in rows:
+        pos = bisect_left(all_rows, row[:1])
+        if pos < len(all_rows) and all_rows[pos][0] == row[0]:
+            all_rows[pos] = row
+        else:
+            all_rows.insert(pos, row)
+    if bookView.source is all_rows:
+        bookView.render()
+
 def show_books():
     if not check_connection(): return
-    try:
-        mycursor.execute('SELECT * FROM books')
-        data = mycursor.fetchall()
-        bookTable.delete(*bookTable.get_children())
-        for row in data:
-            bookTable.insert('', END, values=row)
-    except Exception as e:
+    generation = next_view()
+
+    def show():
+        if generation != view_generation:
+            return
+        if catalog_seen is None or not all_rows and not all_loaded:
+            fetch_page(None, generation)
+        else:
+            bookView.set_source(all_rows)
+
+    if change_tracking and catalog_seen is not None:
+        refresh_catalog(show)
+    else:
+        fetch_page(None, generation)
+
+def load_more_books():
+    if bookView.source is all_rows and all_rows and not all_loaded and not page_loading:
+        fetch_page(all_rows[-1][0], view_generation)
+
+def fetch_page(after, generation):
+    global page_loading
+    page_loading = True
+    target, epoch = all_rows, catalog_epoch
+
+    def fetch(db):
+        # the version goes first: anything written during the load is newer
+        version = db.version() if after is None and change_tracking else None
+        return version, db.page(after, PAGE_SIZE)
+
+    def done(result):
+        global all_rows, all_loaded, page_loading, catalog_seen, catalog_checked
+        version, rows = result
+        page_loading = False
+        if after is None:
+            if generation != view_generation:
+                return
+            all_rows = list(rows)
+            all_loaded = len(rows) < PAGE_SIZE
+            catalog_seen = version
+            catalog_checked = time.monotonic() if epoch == catalog_epoch else 0.0
+            bookView.set_source(all_rows)
+            return
+        if target is not all_rows:
+            return  # the cache was reloaded meanwhile
+        all_loaded = len(rows) < PAGE_SIZE
+        all_rows.extend(rows)
+        bookView.extended()
+
+    def failed(e):
+        global page_loading
+        if generation == view_generation:
+            page_loading = False
         messagebox.showerror('Error', f'Unable to fetch data: {e}')
 
+    run_db(fetch, done, failed)
+
+# After a single add/update/delete only that row is applied to bookView.
+# all_rows is kept in ISBN order, so a row's place there is found by
+# bisection; other sources (search results, near matches in score order)
+# are scanned. Anything that cannot be placed falls back to a full
+# show_books().
+
+def row_position(isbn):
+    rows = bookView.source
+    if rows is not all_rows:
+        return next((pos for pos, row in enumerate(rows) if row[0] == isbn), -1)
+    pos = bisect_left(rows, (isbn,))
+    if pos < len(rows) and rows[pos][0] == isbn:
+        return pos
+    return -1
+
+def row_positions(isbns):
+    # the positions of those of isbns that are shown, ascending
+    rows = bookView.source
+    if rows is not all_rows:
+        wanted = set(isbns)
+        return [pos for pos, row in enumerate(rows) if row[0] in wanted]
+    return sorted(pos for pos in map(row_position, isbns) if pos >= 0)
+
+def selected_ranges(isbns):
+    # The selection as (first ISBN, last ISBN, rows) ranges for the
+    # backends' *_ranges calls, when that takes fewer statements than IN
+    # lists of the ISBNs. Only all_rows qualifies: it is the catalog in
+    # ISBN order with no gaps, so a selected run of rows is every book
+    # between its ends. The backend checks each range's count, so a book
+    # another client added or removed since makes it fall back to the ISBNs.
+    if bookView.source is not all_rows:
+        return None
+    ranges = bookView.selection_ranges()
+    return ranges if len(ranges) < len(isbns) / BULK_CHUNK else None
+
+def show_inserted(row):
+    note_write()
+    if bookView.source is not all_rows:
+        show_books()
+        return
+    if not all_loaded and (not all_rows or row[0] > all_rows[-1][0]):
+        return  # past the loaded pages; it arrives with a later one
+    pos = bisect_left(all_rows, row[:1])
+    if pos < len(all_rows) and all_rows[pos][0] == row[0]:
+        # a reload that finished first already has it
+        all_rows[pos] = row
+        bookView.update_row(row)
+        return
+    all_rows.insert(pos, row)
+    bookView.insert_row(pos, row)
+
+def show_updated(isbn, title, author, year):
+    note_write()
+    pos = row_position(isbn)
+    if pos < 0:
+        show_books()
+        return
+    row = (isbn, title, author, year) + tuple(bookView.source[pos][4:])
+    bookView.source[pos] = row
+    bookView.update_row(row)
+
+def show_deleted(isbn):
+    note_write()
+    pos = row_position(isbn)
+    if pos < 0:
+        show_books()
+        return
+    del bookView.source[pos]
+    bookView.delete_row(pos, isbn)
+
+# Bulk edits touch many rows at once: their rows are found together, the
+# source is rewritten in one pass and the window is rendered once.
+def show_deleted_many(isbns):
+    note_write()
+    positions = row_positions(isbns)
+    rows = bookView.source
+    kept = []
+    last = 0
+    for pos in positions:
+        kept.extend(rows[last:pos])
+        last = pos + 1
+    kept.extend(rows[last:])
+    rows[:] = kept
+    bookView.delete_rows(positions)
+
+def show_updated_many(isbns, fields):
+    note_write()
+    columns = BOOK_COLUMNS.split(', ')
+    changes = [(columns.index(name), value) for name, value in fields.items()]
+    rows = bookView.source
+    for pos in row_positions(isbns):
+        row = list(rows[pos])
+        for column, value in changes:
+            row[column] = value
+        rows[pos] = tuple(row)
+    bookView.render()
+
 def add_book():
     if not check_connection(): return
 
@@ -105,20 +370,26 @@ def add_book():
             messagebox.showerror('Error', 'Year must be a number', parent=add_window)
             return
 
-        try:
-            query = 'INSERT INTO books (ISBN, Title, Author, Year, Added_Date, Added_Time) VALUES (%s,%s,%s,%s,%s,%s)'
-            mycursor.execute(query, (
-                isbn, title, author if author else None, year,
-                time.strftime("%Y-%m-%d"), time.strftime("%H:%M:%S")
-            ))
-            con.commit()
-            messagebox.showinfo('Success', 'Book Added Successfully', parent=add_window)
-            add_window.destroy()
-            show_books()
-        except pymysql.err.IntegrityError:
-            messagebox.showerror('Error', 'ISBN already exists', parent=add_window)
-        except Exception as e:
-            messagebox.showerror('Error', f'{e}', parent=add_window)
+        row = (isbn, title, author if author else None, year,
+               time.strftime("%Y-%m-%d"), time.strftime("%H:%M:%S"))
+
+        def added(_):
+            if add_window.winfo_exists():
+                messagebox.showinfo('Success', 'Book Added Successfully', parent=add_window)
+                add_window.destroy()
+            show_inserted(row)
+
+        def failed(e):
+            parent = window_or_root(add_window)
+            if parent is add_window:
+                add_button.config(state=NORMAL)
+            if isinstance(e, DuplicateISBN):
+                messagebox.showerror('Error', 'ISBN already exists', parent=parent)
+            else:
+                messagebox.showerror('Error', f'{e}', parent=parent)
+
+        add_button.config(state=DISABLED)
+        run_db(lambda db: db.insert(row), added, failed)
 
     add_window = Toplevel()
     add_window.title('Add Book')
@@ -141,33 +412,57 @@ def add_book():
     year_entry = Entry(add_window)
     year_entry.pack(pady=6)
 
-    ttk.Button(add_window, text='Add Book', command=add_data).pack(pady=12)
+    add_button = ttk.Button(add_window, text='Add Book', command=add_data)
+    add_button.pack(pady=12)
 
 def delete_book():
     if not check_connection(): return
-    selected_item = bookTable.focus()
-    if not selected_item:
+    # the view's selection, not the Treeview's: a selected row scrolled out
+    # of the rendered window has no Treeview item
+    selected = bookView.selection()
+    if len(selected) > 1:
+        delete_books(selected)
+        return
+    if not selected:
         messagebox.showerror('Error', 'Please select a book to delete')
         return
 
-    isbn = bookTable.item(selected_item)['values'][0]
+    isbn = selected[0]
     if messagebox.askyesno('Confirm Delete', f'Do you really want to delete ISBN {isbn}?'):
-        try:
-            mycursor.execute('DELETE FROM books WHERE ISBN=%s', (isbn,))
-            con.commit()
-            bookTable.delete(selected_item)
+        def deleted(_):
+            show_deleted(isbn)
             messagebox.showinfo('Deleted', f'Book ISBN {isbn} deleted successfully')
-        except Exception as e:
-            messagebox.showerror('Error', f'Error deleting record: {e}')
+
+        run_db(lambda db: db.delete([isbn]), deleted,
+               lambda e: messagebox.showerror('Error', f'Error deleting record: {e}'))
+
+def delete_books(isbns):
+    if not messagebox.askyesno('Confirm Delete', f'Do you really want to delete the {len(isbns):,} selected books?'):
+        return
+    ranges = selected_ranges(isbns)
+
+    def delete(db):
+        count = db.delete_ranges(ranges) if ranges else None
+        return count if count is not None else db.delete(isbns)
+
+    def deleted(count):
+        show_deleted_many(isbns)
+        messagebox.showinfo('Deleted', f'{count:,} books deleted successfully')
+
+    run_db(delete, deleted, lambda e: messagebox.showerror('Error', f'Error deleting records: {e}'))
 
 def update_book():
     if not check_connection(): return
-    selected = bookTable.focus()
+    selected = bookView.selection()
+    if len(selected) > 1:
+        update_books(selected)
+        return
     if not selected:
         messagebox.showerror('Error', 'Select a book')
         return
 
-    data = bookTable.item(selected)['values']
+    selected = selected[0]
+    data = bookView.source[row_position(selected)]
 
     def save_update():
         title = title_entry.get().strip()
@@ -183,15 +478,22 @@ def update_book():
             messagebox.showerror('Error', 'Year must be a number', parent=update_window)
             return
 
-        try:
-            query = "UPDATE books SET Title=%s, Author=%s, Year=%s WHERE ISBN=%s"
-            mycursor.execute(query, (title, author if author else None, year, data[0]))
-            con.commit()
-            messagebox.showinfo('Success', 'Book details updated successfully', parent=update_window)
-            update_window.destroy()
-            show_books()
-        except Exception as e:
-            messagebox.showerror('Error', f'Update failed: {e}', parent=update_window)
+        params = (selected, title, author if author else None, year)
+
+        def updated(_):
+            if update_window.winfo_exists():
+                messagebox.showinfo('Success', 'Book details updated successfully', parent=update_window)
+                update_window.destroy()
+            show_updated(selected, title, author if author else None, year)
+
+        def failed(e):
+            parent = window_or_root(update_window)
+            if parent is update_window:
+                update_button.config(state=NORMAL)
+            messagebox.showerror('Error', f'Update failed: {e}', parent=parent)
+
+        update_button.config(state=DISABLED)
+        run_db(lambda db: db.update(*params), updated, failed)
 
     update_window = Toplevel()
     update_window.title('Update Book')
@@ -219,72 +521,458 @@ def update_book():
     year_entry.pack(pady=6)
     year_entry.insert(0, data[3] if data[3] is not None else '')
 
-    ttk.Button(update_window, text='Update', command=save_update).pack(pady=12)
+    update_button = ttk.Button(update_window, text='Update', command=save_update)
+    update_button.pack(pady=12)
 
-def search_book():
-    if not check_connection(): return
+def update_books(isbns):
+    ranges = selected_ranges(isbns)
+
+    def save_update():
+        author = author_entry.get().strip()
+        year_txt = year_entry.get().strip()
 
-    def search_data():
-        key = search_entry.get().strip()
-        if key == '':
-            messagebox.showerror('Error', 'Enter search term', parent=search_window)
+        if not author and not year_txt:
+            messagebox.showerror('Error', 'Enter an Author or a Year to set', parent=update_window)
             return
-        # Try numeric search for year, else string fields
         try:
-            possible_year = int(key)
+            year = int(year_txt) if year_txt else None
         except ValueError:
-            possible_year = None
-
-        query = """
-            SELECT * FROM books
-            WHERE ISBN=%s OR Title LIKE %s OR Author LIKE %s {year_clause}
-        """.format(year_clause="OR Year=%s" if possible_year is not None else "")
-
-        params = (key, f"%{key}%", f"%{key}%")
-        if possible_year is not None:
-            params = (key, f"%{key}%", f"%{key}%", possible_year)
-
-        mycursor.execute(query, params)
-        rows = mycursor.fetchall()
-        bookTable.delete(*bookTable.get_children())
-        for row in rows:
-            bookTable.insert('', END, values=row)
+            messagebox.showerror('Error', 'Year must be a number', parent=update_window)
+            return
+
+        fields = {}
+        if author:
+            fields['Author'] = author
+        if year_txt:
+            fields['Year'] = year
+
+        def updated(_):
+            if update_window.winfo_exists():
+                messagebox.showinfo('Success', f'{len(isbns):,} books updated successfully', parent=update_window)
+                update_window.destroy()
+            show_updated_many(isbns, fields)
+
+        def failed(e):
+            parent = window_or_root(update_window)
+            if parent is update_window:
+                update_button.config(state=NORMAL)
+            messagebox.showerror('Error', f'Update failed: {e}', parent=parent)
+
+        def update(db):
+            if not ranges or db.update_ranges(ranges, fields) is None:
+                db.update_many(isbns, fields)
+
+        update_button.config(state=DISABLED)
+        run_db(update, updated, failed)
+
+    update_window = Toplevel()
+    update_window.title('Update Books')
+    update_window.geometry('400x250')
+    update_window.grab_set()
+
+    Label(update_window, text=f'{len(isbns):,} books selected; blank fields are left unchanged').pack(pady=6)
+
+    Label(update_window, text='Author').pack(pady=6)
+    author_entry = Entry(update_window)
+    author_entry.pack(pady=6)
+
+    Label(update_window, text='Year').pack(pady=6)
+    year_entry = Entry(update_window)
+    year_entry.pack(pady=6)
+
+    update_button = ttk.Button(update_window, text='Update', command=save_update)
+    update_button.pack(pady=12)
+
+# Search as you type. Each key press restarts a SEARCH_DELAY_MS timer, so
+# only a pause in typing sends a query. A new search cancels the one still
+# running (KILL QUERY on MySQL, interrupt() on SQLite) and a superseded
+# result is never shown. When the key only adds to the words of a cached
+# search (har -> harry -> harry pot) the cached rows are filtered locally
+# instead; keys that could match an ISBN or a Year always go to the database.
+# A search that finds nothing shows the nearest books instead (suggest):
+# the ISBNs one typo away, or books whose words are near the key's.
+SEARCH_DELAY_MS = 250
+search_after = None     # pending timer
+search_ticket = None    # the search running on the database
+search_shown = ''       # key of the results in bookView
+
+def search_book():
+    if not check_connection(): return
+    searchEntry.focus_set()
+    searchEntry.select_range(0, END)
+
+def search_typed(event=None):
+    global search_after
+    if search_after is not None:
+        root.after_cancel(search_after)
+    search_after = root.after(SEARCH_DELAY_MS, search_now)
+
+def cancel_search():
+    global search_ticket
+    ticket, search_ticket = search_ticket, None
+    if ticket is not None:
+        # KILL QUERY opens a connection: not on the Tk thread
+        db = backend
+        threading.Thread(target=db.cancel, args=(ticket,), daemon=True).start()
+
+def search_now(again=False):
+    # again: Enter searches even if the key has not changed
+    global search_after, search_shown
+    search_after = None
+    key = searchEntry.get().strip()
+    if backend is None or key == search_shown and not again:
+        return
+    search_shown = key
+    cancel_search()
+    if key == '':
+        searchStatus.config(text='')
+        show_books()
+        return
+    generation = next_view()
+    searchStatus.config(text='Searching...')
+
+    def show(rows):
+        if generation != view_generation:
+            return
         if not rows:
-            messagebox.showinfo('Info', 'No record found', parent=search_window)
+            suggest()
+            return
+        bookView.set_source(list(rows))  # the view edits its source in place
+        searchStatus.config(text=f'{len(rows):,} found')
+
+    def suggest():
+        def near(matches):
+            if generation != view_generation:
+                return
+            bookView.set_source([row for row, _ in matches])
+            searchStatus.config(text=f'No record found; {len(matches)} near matches' if matches
+                                else 'No record found')
+
+        run_db(lambda db: db.suggest(key), near, failed)
+
+    def failed(e):
+        if generation == view_generation:
+            searchStatus.config(text='')
+            messagebox.showerror('Error', f'Search failed: {e}')
+
+    def run_search():
+        global search_ticket
+        if generation != view_generation:
+            return
+        version = catalog_seen if change_tracking else None
+        rows = search_cache.get(key, version) if version is not None else None
+        if rows is not None:
+            show(rows)
+            return
+
+        def done(rows):
+            if version is not None:
+                search_cache.put(key, version, rows)
+            show(rows)
+
+        words = backend.search_words(key)
+        earlier = search_cache.find_prefix(key, version) if version is not None and words else None
+        if earlier is not None:
+            earlier_words = backend.search_words(earlier[0])
+            if earlier_words and narrows(earlier_words, words):
+                cached = earlier[1]
+                db_worker.submit(lambda: filter_words(cached, words), done, failed)
+                return
+
+        ticket = search_ticket = QueryTicket()
 
-    search_window = Toplevel()
-    search_window.title('Search')
-    search_window.geometry('450x140')
-    search_window.grab_set()
-    Label(search_window, text='Enter ISBN/Title/Author/Year').pack(pady=6)
-    search_entry = Entry(search_window, width=50)
-    search_entry.pack(pady=6)
-    ttk.Button(search_window, text='Search', command=search_data).pack(pady=10)
+        def cancelled(e):
+            if not isinstance(e, QueryCancelled):
+                failed(e)
+
+        run_db(lambda db: db.search(key, ticket), done, cancelled)
+
+    if change_tracking:
+        refresh_catalog(run_search)
+    else:
+        run_search()
+
+EXPORT_COLUMNS = ['ISBN','Title','Author','Year','Added_Date','Added_Time']
 
 def export_data():
     if not check_connection(): return
 
-    data = bookTable.get_children()
-    if not data:
+    whole_table = messagebox.askyesnocancel(
+        'Export Data', 'Export the whole books table?\n\n'
+        'Yes: stream every row from the database\nNo: only the rows currently shown', parent=root)
+    if whole_table is None:
+        return
+    data = bookView.source
+    if not whole_table and not data:
         messagebox.showerror("Error", "No data to export!", parent=root)
         return
 
-    file_path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV files', '*.csv')])
+    file_path = filedialog.asksaveasfilename(defaultextension='.csv',
+                                             filetypes=[('CSV files', '*.csv'), ('Gzipped CSV', '*.csv.gz')])
     if not file_path:
         return
 
+    if whole_table:
+        export_table(file_path)
+        return
     try:
-        with open(file_path, mode='w', newline='', encoding='utf-8') as f:
+        with open_export_file(file_path) as f:
             writer = csv.writer(f)
-            writer.writerow(['ISBN','Title','Author','Year','Added_Date','Added_Time'])
-            for row_id in data:
-                writer.writerow(bookTable.item(row_id)['values'])
+            writer.writerow(EXPORT_COLUMNS)
+            writer.writerows(data)
         messagebox.showinfo("Success", f"Data exported successfully to\n{file_path}", parent=root)
     except Exception as e:
         messagebox.showerror('Error', f'Export failed: {e}', parent=root)
 
+def open_export_file(file_path):
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'wt', newline='', encoding='utf-8')
+    return open(file_path, mode='w', newline='', encoding='utf-8')
+
+def stream_export(file_path, cancel, events, chunk_size=5000):
+    # Runs on a worker thread. The backend streams the table in chunks, so
+    # memory stays flat however big it is. Progress goes back to the Tk
+    # thread through the events queue.
+    db = backend
+    try:
+        estimate = db.estimate_rows()
+        done = 0
+        chunks = db.iter_rows(chunk_size)
+        try:
+            with open_export_file(file_path) as f:
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                for rows in chunks:
+                    if cancel.is_set():
+                        break
+                    writer.writerows(rows)
+                    done += len(rows)
+                    events.put(('progress', done, max(estimate, done)))
+        finally:
+            chunks.close()
+        if cancel.is_set():
+            os.remove(file_path)
+            events.put(('cancelled',))
+        else:
+            events.put(('done', done))
+    except Exception as e:
+        events.put(('error', e))
+
+def export_table(file_path):
+    progress_window = Toplevel()
+    progress_window.title('Export Data')
+    progress_window.geometry('400x140')
+    status_label = Label(progress_window, text='Starting export...')
+    status_label.pack(pady=10)
+    progress = ttk.Progressbar(progress_window, length=340, mode='determinate')
+    progress.pack()
+
+    cancel = threading.Event()
+    events = queue.Queue()
+    ttk.Button(progress_window, text='Cancel', command=cancel.set).pack(pady=10)
+    progress_window.protocol('WM_DELETE_WINDOW', cancel.set)
+    threading.Thread(target=stream_export, args=(file_path, cancel, events), daemon=True).start()
+
+    def poll():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                root.after(100, poll)
+                return
+            if event[0] == 'progress':
+                done, total = event[1], event[2]
+                progress['value'] = 100 * done / max(total, 1)
+                status_label.config(text=f'{done:,} of ~{total:,} rows written')
+                continue
+            progress_window.destroy()
+            if event[0] == 'done':
+                messagebox.showinfo("Success", f"{event[1]:,} rows exported to\n{file_path}", parent=root)
+            elif event[0] == 'error':
+                messagebox.showerror('Error', f'Export failed: {event[1]}', parent=root)
+            return
+
+    poll()
+
+# Bulk import reads the layout export_data writes. Rows are sent in
+# batches through backend.insert_batch, one transaction each. When no
+# per-row report is needed and the backend has a server-side loader (MySQL
+# LOAD DATA LOCAL INFILE, if the server allows it), the file is handed to
+# that instead; it applies the same checks and duplicate handling.
+def parse_import_row(record, today, now):
+    if len(record) < 2:
+        raise ValueError('expected at least ISBN and Title')
+    isbn, title = record[0].strip(), record[1].strip()
+    if not isbn or not title:
+        raise ValueError('ISBN and Title are required')
+    author = record[2].strip() if len(record) > 2 else ''
+    year_txt = record[3].strip() if len(record) > 3 else ''
+    try:
+        year = int(year_txt) if year_txt else None
+    except ValueError:
+        raise ValueError(f'Year {year_txt!r} is not a number')
+    added_date = record[4].strip() if len(record) > 4 and record[4].strip() else today
+    added_time = record[5].strip() if len(record) > 5 and record[5].strip() else now
+    try:
+        datetime.strptime(added_date, '%Y-%m-%d')
+        datetime.strptime(added_time, '%H:%M:%S')
+    except ValueError:
+        raise ValueError(f'bad Added_Date/Added_Time {added_date!r} {added_time!r}')
+    return (isbn, title, author if author else None, year, added_date, added_time)
+
+def is_header(record):
+    return [field.strip().lower() for field in record] == [column.lower() for column in EXPORT_COLUMNS]
+
+def stream_import(file_path, mode, cancel, events, batch_size=5000):
+    # Runs on a worker thread, like stream_export.
+    db = backend
+    report = {'mode': mode, 'rows': 0, 'written': 0, 'errors': [], 'duplicates': []}
+    try:
+        if mode != 'report' and not file_path.endswith('.gz'):
+            with open(file_path, newline='', encoding='utf-8-sig') as f:
+                header = is_header(next(csv.reader(f), []))
+            events.put(('loading',))
+            loaded = db.load_file(file_path, mode, header, cancel.is_set, report['errors'])
+            if loaded is not None:
+                # one transaction: a cancel keeps nothing
+                report['rows'], report['written'] = loaded
+                events.put(('cancelled' if cancel.is_set() else 'done', report))
+                return
+
+        today, now = time.strftime('%Y-%m-%d'), time.strftime('%H:%M:%S')
+        size = max(os.path.getsize(file_path), 1)
+        with open(file_path, 'rb') as raw:
+            source = gzip.GzipFile(fileobj=raw) if file_path.endswith('.gz') else raw
+            reader = csv.reader(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+            batch = []
+            for record in reader:
+                if not record or reader.line_num == 1 and is_header(record):
+                    continue
+                try:
+                    batch.append(parse_import_row(record, today, now))
+                except ValueError as e:
+                    report['errors'].append((reader.line_num, str(e)))
+                if len(batch) >= batch_size:
+                    report['written'] += db.insert_batch(batch, mode, report['duplicates'])
+                    report['rows'] += len(batch)
+                    batch = []
+                    events.put(('progress', report['rows'], raw.tell() / size))
+                    if cancel.is_set():
+                        events.put(('cancelled', report))
+                        return
+            if batch:
+                report['written'] += db.insert_batch(batch, mode, report['duplicates'])
+                report['rows'] += len(batch)
+        events.put(('done', report))
+    except Exception as e:
+        events.put(('error', e, report))
+
+def import_data():
+    if not check_connection(): return
+    file_path = filedialog.askopenfilename(filetypes=[('CSV files', '*.csv'), ('Gzipped CSV', '*.csv.gz')])
+    if not file_path:
+        return
+
+    mode_window = Toplevel()
+    mode_window.title('Import Data')
+    mode_window.geometry('360x200')
+    mode_window.grab_set()
+    Label(mode_window, text='When an ISBN already exists:').pack(pady=8)
+    mode = StringVar(value='skip')
+    for value, label in [('skip', 'Skip the row'), ('upsert', 'Update the existing book'),
+                         ('report', 'Skip it and list the duplicates')]:
+        ttk.Radiobutton(mode_window, text=label, variable=mode, value=value).pack(anchor=W, padx=40)
+
+    def start():
+        chosen = mode.get()
+        mode_window.destroy()
+        import_file(file_path, chosen)
+
+    ttk.Button(mode_window, text='Import', command=start).pack(pady=12)
+
+def import_file(file_path, mode):
+    progress_window = Toplevel()
+    progress_window.title('Import Data')
+    progress_window.geometry('400x140')
+    status_label = Label(progress_window, text='Starting import...')
+    status_label.pack(pady=10)
+    progress = ttk.Progressbar(progress_window, length=340, mode='determinate')
+    progress.pack()
+
+    cancel = threading.Event()
+    events = queue.Queue()
+    ttk.Button(progress_window, text='Cancel', command=cancel.set).pack(pady=10)
+    progress_window.protocol('WM_DELETE_WINDOW', cancel.set)
+    threading.Thread(target=stream_import, args=(file_path, mode, cancel, events), daemon=True).start()
+
+    def poll():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                root.after(100, poll)
+                return
+            if event[0] == 'progress':
+                if str(progress['mode']) == 'indeterminate':  # no loader: batches after all
+                    progress.stop()
+                    progress.config(mode='determinate')
+                progress['value'] = 100 * event[2]
+                status_label.config(text=f'{event[1]:,} rows imported')
+                continue
+            if event[0] == 'loading':
+                progress.config(mode='indeterminate')
+                progress.start(10)
+                status_label.config(text='Server is loading the file...')
+                continue
+            progress_window.destroy()
+            report = event[-1]
+            if event[0] == 'done':
+                messagebox.showinfo('Success', import_summary(report), parent=root)
+            elif event[0] == 'cancelled':
+                messagebox.showinfo('Cancelled', f'Import cancelled. {import_summary(report)}\n'
+                                    'Batches committed before the cancel are kept.', parent=root)
+            else:
+                messagebox.showerror('Error', f'Import failed: {event[1]}\n{import_summary(report)}', parent=root)
+            if report['errors'] or report['duplicates']:
+                show_import_report(report)
+            note_write()
+            show_books()
+            return
+
+    poll()
+
+def import_summary(report):
+    if report['mode'] == 'upsert':
+        return f"{report['rows']:,} rows added or updated."
+    skipped = report['rows'] - report['written']
+    return f"{report['written']:,} books added, {skipped:,} duplicates skipped."
+
+def show_import_report(report, limit=1000):
+    report_window = Toplevel()
+    report_window.title('Import Report')
+    report_window.geometry('500x300')
+    text = Text(report_window, wrap='none')
+    text.pack(fill='both', expand=True)
+    lines = [f'line {line}: {message}\n' for line, message in report['errors']]
+    lines += [f'duplicate ISBN: {isbn}\n' for isbn in report['duplicates']]
+    text.insert(END, ''.join(lines[:limit]))
+    if len(lines) > limit:
+        text.insert(END, f'... and {len(lines) - limit:,} more\n')
+    text.config(state='disabled')
+
+def library_stats():
+    return {
+        'backend': backend.name if backend is not None else 'not connected',
+        'pending_jobs': db_worker.pending,
+        'cached_rows': len(all_rows),
+        'cached_searches': len(search_cache.entries),
+    }
+
 def exit_program():
     if messagebox.askyesno("Confirm Exit", "Are you sure you want to exit?", parent=root):
+        db_worker.shutdown()
+        if backend is not None:
+            backend.close()
         root.destroy()
 
 # ========================== UI Functions ==========================
@@ -309,40 +997,12 @@ def slider():
             slider()
         sliderlabel.after(1200, restart)
 
-def enable_drag_selection(treeview):
-    treeview._drag_start = None
-
-    def on_button_press(event):
-        row = treeview.identify_row(event.y)
-        if row:
-            current_selection = treeview.selection()
-            if row not in current_selection:
-                treeview.selection_set(row)
-            treeview._drag_start = row
-
-    def on_mouse_drag(event):
-        if treeview._drag_start:
-            row = treeview.identify_row(event.y)
-            if row:
-                start = treeview.index(treeview._drag_start)
-                end = treeview.index(row)
-                if start > end:
-                    start, end = end, start
-                children = treeview.get_children('')
-                treeview.selection_set(children[start:end + 1])
-
-    def on_button_release(event):
-        treeview._drag_start = None
-
-    treeview.bind("<ButtonPress-1>", on_button_press)
-    treeview.bind("<B1-Motion>", on_mouse_drag)
-    treeview.bind("<ButtonRelease-1>", on_button_release)
-
 # ========================== GUI Setup ==========================
 root = ttkthemes.ThemedTk()
 root.get_themes()
 root.set_theme('winnative')
 root.title('Library Management System')
+db_worker = DBWorker(root)
 root.geometry('1174x680+100+20')
 root.resizable(width=False, height=False)
 
@@ -376,31 +1036,41 @@ searchBookButton = ttk.Button(leftframe, text='Search Book', cursor='hand2', wid
 deleteBookButton = ttk.Button(leftframe, text='Delete Book', cursor='hand2', width=25, state=DISABLED, command=delete_book)
 updateBookButton = ttk.Button(leftframe, text='Update Book', cursor='hand2', width=25, state=DISABLED, command=update_book)
 showBookButton = ttk.Button(leftframe, text='Show Books', cursor='hand2', width=25, state=DISABLED, command=show_books)
+importBookButton = ttk.Button(leftframe, text='Import Data', cursor='hand2', width=25, state=DISABLED, command=import_data)
 exportBookButton = ttk.Button(leftframe, text='Export Data', cursor='hand2', width=25, state=DISABLED, command=export_data)
 exitButton = ttk.Button(leftframe, text='Exit', cursor='hand2', width=25, command=exit_program)
 
 for i, btn in enumerate([addBookButton, searchBookButton, deleteBookButton,
-                         updateBookButton, showBookButton, exportBookButton, exitButton], start=1):
-    btn.grid(row=i, column=0, pady=12)
+                         updateBookButton, showBookButton, importBookButton, exportBookButton,
+                         exitButton], start=1):
+    btn.grid(row=i, column=0, pady=9)
 
 # Right Frame (Book Table)
 rightframe = Frame(root)
 rightframe.place(x=370, y=90, width=780, height=560)
 
+searchbar = Frame(rightframe)
+searchbar.pack(side=TOP, fill=X, pady=(0, 6))
+Label(searchbar, text='Search ISBN/Title/Author/Year').pack(side=LEFT)
+searchEntry = Entry(searchbar, width=40)
+searchEntry.pack(side=LEFT, padx=8)
+searchEntry.bind('<KeyRelease>', search_typed)
+searchEntry.bind('<Return>', lambda event: search_now(True))
+searchStatus = Label(searchbar, text='', anchor='w')
+searchStatus.pack(side=LEFT, fill=X, expand=True)
+
 scrollbarx = Scrollbar(rightframe, orient=HORIZONTAL)
 scrollbary = Scrollbar(rightframe, orient=VERTICAL)
 bookTable = ttk.Treeview(
     rightframe,
     columns=('ISBN','Title','Author','Year','Added_Date','Added_Time'),
     xscrollcommand=scrollbarx.set,
-    yscrollcommand=scrollbary.set,
     selectmode='extended'
 )
 scrollbary.pack(side=RIGHT, fill=Y)
 scrollbarx.pack(side=BOTTOM, fill=X)
 bookTable.pack(fill='both', expand=True)
 scrollbarx.config(command=bookTable.xview)
-scrollbary.config(command=bookTable.yview)
 bookTable['show'] = 'headings'
 
 for col in bookTable['columns']:
@@ -411,6 +1081,10 @@ for col in bookTable['columns']:
     else:
         bookTable.column(col, width=120, anchor=CENTER)
 
-enable_drag_selection(bookTable)
+# only the visible rows are Treeview items; scrollbary drives the offset
+bookView = VirtualTreeview(bookTable, scrollbary, near_end=load_more_books)
+
+# F12: timings, SQL latency and slowest statements (perf is opt-in, LMS_PERF=1)
+root.bind('<F12>', lambda event: perfview.show(root, library_stats))
 
 root.mainloop()
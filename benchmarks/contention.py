@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lms_core as lms
+from perf import Histogram
+from suite import isbn13, make_catalog, make_title
+
+# -----------------------------
+# Contention: reader and writer threads sharing one catalog table
+# -----------------------------
+# For each combination of --readers and --writers, threads run for
+# --seconds against a table of --size books:
+#
+#   readers  ISBN lookups (half of them misses); every --snapshot-every
+#            lookups, a walk over get_all_books(), as an export would do
+#   writers  insert, update and delete in equal parts
+#
+# on two tables:
+#
+#   global   HashTable behind one lock, the simplest safe option
+#   striped  ConcurrentHashTable: lock-free reads, striped writers
+#
+# Both keep the title index, as lms.py does. Printed per run: operations
+# per second by role, and read latency (p50/p99, from perf.Histogram).
+# After each run the table is checked: the count, the books and the title
+# index must agree. CPython runs one thread at a time, so the figures show
+# how much threads wait on each other, not parallel speedup.
+#
+#   python benchmarks/contention.py --size 200000 --readers 1,4 --writers 0,1,4
+#   python benchmarks/contention.py --output contention.json
+
+class GlobalLockTable:
+    # the operations the threads use, each under one lock
+    def __init__(self, table):
+        self.table = table
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.table)
+
+    def search(self, isbn):
+        with self.lock:
+            return self.table.search(isbn)
+
+    def insert(self, book):
+        with self.lock:
+            return self.table.insert(book)
+
+    def insert_many(self, books):
+        with self.lock:
+            return self.table.insert_many(books)
+
+    def update(self, isbn, title, author, year):
+        with self.lock:
+            return self.table.update(isbn, title, author, year)
+
+    def delete(self, isbn):
+        with self.lock:
+            return self.table.delete(isbn)
+
+    def get_all_books(self):
+        with self.lock:
+            return self.table.get_all_books()
+
+TABLES = {
+    "global": lambda: GlobalLockTable(lms.HashTable()),
+    "striped": lms.ConcurrentHashTable,
+}
+
+def reader(table, isbns, seed, stop, args, result):
+    rng = random.Random(seed)
+    latency = Histogram()
+    reads = snapshots = 0
+    while not stop.is_set():
+        isbn = rng.choice(isbns) if rng.random() < 0.5 else isbn13(10 ** 9 - 1 - rng.randrange(10 ** 6))
+        start = time.perf_counter()
+        table.search(isbn)
+        latency.add(time.perf_counter() - start)
+        reads += 1
+        if args.snapshot_every and reads % args.snapshot_every == 0:
+            for _ in table.get_all_books():
+                pass
+            snapshots += 1
+    result.update(reads=reads, snapshots=snapshots, latency=latency)
+
+def writer(table, seed, stop, result):
+    # each writer has its own ISBN range, so the table size stays steady
+    rng = random.Random(seed)
+    first = 900000000 - seed * 1000000
+    own = []
+    writes = 0
+    while not stop.is_set():
+        op = rng.randrange(3)
+        if op == 0 or not own:
+            book = lms.Book(isbn13(first + writes), make_title(rng), "Q. Writer", 2000)
+            if table.insert(book):
+                own.append(book.isbn)
+        elif op == 1:
+            table.update(rng.choice(own), make_title(rng), "Q. Writer", 2001)
+        else:
+            table.delete(own.pop(rng.randrange(len(own))))
+        writes += 1
+    result.update(writes=writes)
+
+def merged(histograms):
+    total = Histogram()
+    for h in histograms:
+        total.count += h.count
+        total.total += h.total
+        total.max = max(total.max, h.max)
+        total.buckets = [a + b for a, b in zip(total.buckets, h.buckets)]
+    return total
+
+def check(table):
+    inner = table.table if isinstance(table, GlobalLockTable) else table
+    books = inner.get_all_books()
+    assert len(books) == len({book.isbn for book in books}) == len(inner) == len(inner.title_index), \
+        "table and title index disagree"
+
+def run(kind, catalog, readers, writers, args):
+    table = TABLES[kind]()
+    table.insert_many(lms.Book(*row) for row in catalog)
+    isbns = [row[0] for row in catalog]
+    stop = threading.Event()
+    results = [{} for _ in range(readers + writers)]
+    threads = [threading.Thread(target=reader, args=(table, isbns, n, stop, args, results[n]))
+               for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(table, n, stop, results[readers + n]))
+                for n in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    check(table)
+
+    latency = merged(result["latency"] for result in results[:readers])
+    return {
+        "table": kind,
+        "readers": readers,
+        "writers": writers,
+        "reads_per_s": sum(result["reads"] for result in results[:readers]) / elapsed,
+        "snapshots": sum(result["snapshots"] for result in results[:readers]),
+        "writes_per_s": sum(result["writes"] for result in results[readers:]) / elapsed,
+        "read_p50_us": latency.percentile(0.50) * 1e6 if latency.count else 0.0,
+        "read_p99_us": latency.percentile(0.99) * 1e6 if latency.count else 0.0,
+    }
+
+def numbers(text):
+    return [int(part) for part in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Reader/writer contention on the catalog table")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--readers", type=numbers, default=[1, 4], help="comma-separated thread counts")
+    parser.add_argument("--writers", type=numbers, default=[0, 1, 4], help="comma-separated thread counts")
+    parser.add_argument("--seconds", type=float, default=3.0, help="per run (default: %(default)s)")
+    parser.add_argument("--snapshot-every", type=int, default=20000,
+                        help="lookups between full walks per reader, 0 for none (default: %(default)s)")
+    parser.add_argument("--tables", default="global,striped")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.size)
+    results = []
+    print(f"{'table':<9}{'readers':>8}{'writers':>8}{'reads/s':>12}{'writes/s':>12}"
+          f"{'p50 us':>9}{'p99 us':>9}{'walks':>7}")
+    for readers in args.readers:
+        for writers in args.writers:
+            if not readers and not writers:
+                continue
+            for kind in args.tables.split(","):
+                result = run(kind, catalog, readers, writers, args)
+                results.append(result)
+                print(f"{kind:<9}{readers:>8}{writers:>8}{result['reads_per_s']:>12,.0f}"
+                      f"{result['writes_per_s']:>12,.0f}{result['read_p50_us']:>9.1f}"
+                      f"{result['read_p99_us']:>9.1f}{result['snapshots']:>7}", flush=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"size": args.size, "seconds": args.seconds, "results": results}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
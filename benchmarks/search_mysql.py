@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+import pymysql
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from library_db import create_schema, plan_search
+
+# -----------------------------
+# Search latency: LIKE scan vs planned indexed search
+# -----------------------------
+# Fills the books table up to --rows synthetic books (skipped if it already
+# has that many), then times the old OR/LIKE query against plan_search()
+# for a mix of ISBN, year, word, prefix and miss terms.
+#
+#   python benchmarks/search_mysql.py --password secret --rows 2000000
+
+WORDS = ["history", "garden", "river", "night", "empire", "secret", "winter",
+         "ocean", "machine", "shadow", "kingdom", "silent", "journey", "iron",
+         "python", "algorithm", "forest", "letters", "modern", "theory"]
+SURNAMES = ["Tolkien", "Austen", "Orwell", "Morrison", "Achebe", "Murakami",
+            "Knuth", "Dickens", "Woolf", "Borges", "Le Guin", "Calvino"]
+
+def old_query(key):
+    try:
+        year = int(key)
+    except ValueError:
+        year = None
+    query = ("SELECT * FROM books WHERE ISBN=%s OR Title LIKE %s OR Author LIKE %s"
+             + (" OR Year=%s" if year is not None else "") + " ORDER BY ISBN")
+    params = (key, f"%{key}%", f"%{key}%") + ((year,) if year is not None else ())
+    return query, params
+
+def fill(con, rows, batch=10000):
+    with con.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM books")
+        have = cursor.fetchone()[0]
+        rng = random.Random(have)
+        insert = ("INSERT IGNORE INTO books (ISBN, Title, Author, Year, Added_Date, Added_Time) "
+                  "VALUES (%s,%s,%s,%s,CURDATE(),CURTIME())")
+        while have < rows:
+            chunk = []
+            for n in range(have, min(rows, have + batch)):
+                title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+                author = f"{rng.choice(string.ascii_uppercase)}. {rng.choice(SURNAMES)}"
+                chunk.append((f"978{n:010d}", title, author, rng.randint(1800, 2024)))
+            cursor.executemany(insert, chunk)
+            con.commit()
+            have += len(chunk)
+            print(f"\r{have:,} rows", end="", flush=True)
+        print()
+    return have
+
+def time_query(cursor, query, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        found = len(cursor.fetchall())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Library.py search queries")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    con = pymysql.connect(host=args.host, user=args.user, password=args.password)
+    with con.cursor() as cursor:
+        create_schema(cursor)
+    con.commit()
+    total = fill(con, args.rows)
+
+    terms = ["9780000123456", "1999", "Tolkien", "secret garden", "kin", "Le", "zzzz"]
+    print(f"{total:,} books, median of {args.repeat} runs")
+    # word/prefix matching is not substring matching, so row counts can differ
+    print(f"{'term':<16}{'LIKE scan':>12}{'rows':>9}{'planned':>12}{'rows':>9}{'speedup':>10}")
+    with con.cursor() as cursor:
+        for term in terms:
+            old, old_found = time_query(cursor, *old_query(term), args.repeat)
+            new, new_found = time_query(cursor, *plan_search(term), args.repeat)
+            print(f"{term:<16}{old * 1000:>10.1f}ms{old_found:>9,}{new * 1000:>10.1f}ms{new_found:>9,}"
+                  f"{old / new:>9.1f}x")
+    con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,595 @@
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tkinter
+import tracemalloc
+from tkinter import ttk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import lms_core as lms
+from virtualview import VirtualTreeview
+
+# -----------------------------
+# Benchmark suite: catalog engines and UI refresh paths
+# -----------------------------
+# Builds synthetic catalogs (valid ISBN-13s, multi-word titles, initials +
+# surname authors) at each --sizes and times:
+#
+#   lms.*   the lms_core HashTable: bulk load, insert, search, text search,
+#           fuzzy search on mistyped ISBNs and words, update, delete,
+#           merge_sort vs the title index, CSV export, snapshot write/read
+#   view.*  VirtualTreeview over the title-ordered catalog: first render,
+#           paging, jumps, single-row edits, a drag selection scrolling
+#           through the table. Uses a real Treeview when a
+#           display is available (run under xvfb-run on a headless box),
+#           otherwise a mock widget with the same methods; the mock
+#           measures only the Python side.
+#   sql.*   the queries Library.py issues, through SQLiteBackend in a
+#           scratch file: batched import, single inserts, the four search
+#           shapes, keyset paging, updates, the change feed, deletes,
+#           streaming export. MySQL search has its own search_mysql.py.
+#   mem.*   memory, not time: the catalog loaded from CSV (import_books,
+#           as lms_cli add does) into a HashTable and a CompactHashTable,
+#           title index included. tracemalloc reports what the table
+#           holds after the load and the peak during it. These go under
+#           "memory" in the output and are not compared to a baseline.
+#
+# Each result holds the median and the best of --repeat runs, written as
+# JSON to --output. With --baseline the results are compared against an
+# earlier results file, best run to best run (the one least disturbed by
+# other load on the machine), and the run exits with status 1 if anything
+# got slower than --tolerance allows, or if a baseline benchmark that
+# --only and --sizes asked for did not run (sql.* without SQLite, say).
+# Those left out by --only or --sizes are listed as skipped. Baselines are machine-specific: record one with
+# --save-baseline on the machine that will do the comparing.
+#
+#   python benchmarks/suite.py --sizes 10000,100000,1000000 --save-baseline baseline.json
+#   python benchmarks/suite.py --baseline baseline.json
+#   xvfb-run python benchmarks/suite.py --only view.
+
+WORDS = ["history", "garden", "river", "night", "empire", "secret", "winter",
+         "ocean", "machine", "shadow", "kingdom", "silent", "journey", "iron",
+         "python", "algorithm", "forest", "letters", "modern", "theory",
+         "summer", "glass", "mountain", "daughter", "war", "peace", "light",
+         "house", "city", "stone", "children", "voyage", "island", "memory",
+         "science", "art", "fire", "lost", "golden", "road", "king", "storm"]
+CONNECTORS = ["of", "and", "the", "in", "at"]
+SURNAMES = ["Tolkien", "Austen", "Orwell", "Morrison", "Achebe", "Murakami",
+            "Knuth", "Dickens", "Woolf", "Borges", "Le Guin", "Calvino",
+            "Eliot", "Tolstoy", "Atwood", "Rushdie", "Kafka", "Ishiguro",
+            "Adichie", "Hemingway", "Marquez", "Nabokov", "Sebald", "Mantel"]
+
+def isbn13(number):
+    body = f"978{number:09d}"
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body))
+    return body + str(-total % 10)
+
+def make_title(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 4))]
+    if len(words) > 1 and rng.random() < 0.5:
+        words.insert(rng.randrange(1, len(words)), rng.choice(CONNECTORS))
+    return " ".join(words).title()
+
+def make_catalog(size, seed=0):
+    # (isbn, title, author, year) in random ISBN order
+    rng = random.Random(seed)
+    numbers = rng.sample(range(10 ** 9), size)
+    return [(isbn13(n), make_title(rng), f"{rng.choice('ABCDEFGHIJKLMNOPRSTW')}. {rng.choice(SURNAMES)}",
+             rng.randint(1800, 2024)) for n in numbers]
+
+class Timer:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, size, fn, setup=None, ops=None):
+        # fn(state) is timed; setup() builds its state outside the timing
+        runs = []
+        for _ in range(self.repeat):
+            state = setup() if setup is not None else None
+            gc.collect()
+            start = time.perf_counter()
+            fn(state)
+            runs.append(time.perf_counter() - start)
+        self.record(name, size, runs, ops)
+
+    def record(self, name, size, runs, ops=None):
+        result = {"median": statistics.median(runs), "min": min(runs), "runs": runs}
+        if ops:
+            result["ops"] = ops
+            result["per_op_us"] = result["median"] / ops * 1e6
+        self.results[f"{name}@{size}"] = result
+        per_op = f"{result['per_op_us']:>10.2f}us/op" if ops else ""
+        print(f"{name:<24}{size:>10,}{result['median'] * 1000:>12.2f}ms{per_op}", flush=True)
+
+def wanted(name, only):
+    return not only or any(part in name for part in only)
+
+# ---- lms_core ----
+
+def bench_lms(catalog, timer, only, workdir):
+    size = len(catalog)
+    ops = max(1, min(10000, size // 10))
+    rng = random.Random(size)
+    base, extra = catalog[:size - ops], catalog[size - ops:]
+    present = [row[0] for row in rng.sample(base, ops)]
+    missing = [isbn13(10 ** 9 - 1 - i) for i in range(ops)]
+    queries = [" ".join(rng.sample(WORDS, rng.randint(1, 2))) for _ in range(100)]
+
+    def build(rows):
+        table = lms.HashTable()
+        table.enable_text_index()
+        table.insert_many(lms.Book(*row) for row in rows)
+        return table
+
+    if wanted("lms.bulk_load", only):
+        timer.run("lms.bulk_load", size, lambda _: build(catalog), ops=size)
+    table = build(base)
+
+    # insert and delete undo each other, as do the two update passes, so
+    # every repeat starts from the same table
+    def insert(_):
+        for row in extra:
+            table.insert(lms.Book(*row))
+
+    def delete(_):
+        for row in extra:
+            table.delete(row[0])
+
+    def update(titles):
+        def run(_):
+            for isbn, title in zip(present, titles):
+                book = table.search(isbn)
+                table.update(isbn, title, book.author, book.year)
+        return run
+
+    old_titles = [table.search(isbn).title for isbn in present]
+    new_titles = [title + " II" for title in old_titles]
+    runs = {"lms.insert": [], "lms.delete": [], "lms.update": []}
+    for _ in range(timer.repeat):
+        for name, fn in [("lms.insert", insert), ("lms.delete", delete), ("lms.update", update(new_titles))]:
+            gc.collect()
+            start = time.perf_counter()
+            fn(None)
+            runs[name].append(time.perf_counter() - start)
+        update(old_titles)(None)
+    for name, times in runs.items():
+        if wanted(name, only):
+            timer.record(name, size, times, ops)
+
+    # one typo each: two digits swapped, a letter dropped from every word
+    typed_isbns = [isbn[:5] + isbn[6] + isbn[5] + isbn[7:] for isbn in present[:100]]
+    typed_queries = [" ".join(word[:2] + word[3:] for word in query.split()) for query in queries]
+    table.enable_fuzzy_index()
+
+    benches = [
+        ("lms.search_hit", lambda _: [table.search(isbn) for isbn in present], ops),
+        ("lms.search_miss", lambda _: [table.search(isbn) for isbn in missing], ops),
+        ("lms.search_text", lambda _: [table.search_text(query, 50) for query in queries], len(queries)),
+        ("lms.fuzzy_isbn", lambda _: [table.search_fuzzy(isbn) for isbn in typed_isbns], len(typed_isbns)),
+        ("lms.fuzzy_text", lambda _: [table.search_fuzzy(query) for query in typed_queries], len(typed_queries)),
+        ("lms.merge_sort", lambda _: lms.merge_sort(table.get_all_books()), None),
+        ("lms.sorted_listing", lambda _: list(table.books_by_title()), None),
+        ("lms.first_page", lambda _: list(table.books_by_title(0, 50)), None),
+    ]
+    for name, fn, count in benches:
+        if wanted(name, only):
+            timer.run(name, size, fn, ops=count)
+
+    path = os.path.join(workdir, "export.csv")
+
+    def export(_):
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            lms.export_books(table.books_by_title(), file)
+
+    if wanted("lms.export", only):
+        timer.run("lms.export", size, export, ops=len(table))
+    snapshot = os.path.join(workdir, "catalog.snapshot")
+    if wanted("lms.snapshot", only):
+        timer.run("lms.snapshot_write", size, lambda _: lms.write_snapshot(table, snapshot), ops=len(table))
+        timer.run("lms.snapshot_read", size, lambda _: lms.read_snapshot(snapshot), ops=len(table))
+    return table
+
+# ---- VirtualTreeview ----
+
+class MockTk:
+    def call(self, *args):
+        return ""
+
+class MockTreeview:
+    # the Treeview methods VirtualTreeview uses, over a dict and a list
+    def __init__(self, height=25):
+        self.tk = MockTk()
+        self.height = height
+        self.items = {}
+        self.order = []
+        self.selected = ()
+
+    def cget(self, option):
+        return self.height
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, sequence, func, add=None):
+        pass
+
+    def insert(self, parent, index, iid=None, values=()):
+        self.items[iid] = values
+        if index == "end":
+            self.order.append(iid)
+        else:
+            self.order.insert(index, iid)
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.items[iid]
+        gone = set(iids)
+        self.order = [iid for iid in self.order if iid not in gone]
+
+    def item(self, iid, values=None):
+        if values is not None:
+            self.items[iid] = values
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, items):
+        self.selected = tuple([items] if isinstance(items, str) else items)
+
+    def selection_add(self, items):
+        self.selected += tuple([items] if isinstance(items, str) else items)
+
+    def selection_remove(self, items):
+        gone = set([items] if isinstance(items, str) else items)
+        self.selected = tuple(iid for iid in self.selected if iid not in gone)
+
+    def focus(self, iid=None):
+        return ""
+
+class MockScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        pass
+
+class TitleRows:
+    # the same adapter as lms.CatalogRows
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        return [(b.isbn, b.title, b.author, b.year)
+                for b in self.table.books_by_title(index.start, index.stop)]
+
+def make_view(root):
+    if root is None:
+        return VirtualTreeview(MockTreeview(), MockScrollbar())
+    tree = ttk.Treeview(root, columns=("ISBN", "Title", "Author", "Year"), show="headings", height=25)
+    scrollbar = ttk.Scrollbar(root, orient="vertical")
+    return VirtualTreeview(tree, scrollbar)
+
+def bench_view(table, size, timer, only, root):
+    rows = TitleRows(table)
+    view = make_view(root)
+    rng = random.Random(size)
+
+    def settle():
+        if root is not None:
+            root.update_idletasks()
+
+    def set_source(_):
+        view.set_source(rows)
+        settle()
+
+    def page_down(_):
+        view.offset = 0
+        for _ in range(200):
+            view.scroll(view.visible)
+        settle()
+
+    jumps = [rng.random() for _ in range(200)]
+
+    def jump(_):
+        for fraction in jumps:
+            view.yview("moveto", fraction)
+        settle()
+
+    new = [lms.Book(isbn13(10 ** 9 - 1 - i), make_title(rng), "Q. Bench", 2000) for i in range(100)]
+
+    def edits(_):
+        # add and delete rows that land in the window, the way lms.py
+        # applies a single edit
+        view.offset = 0
+        view.render()
+        for book in new:
+            table.insert(book)
+            view.insert_row(table.title_index.position(book), (book.isbn, book.title, book.author, book.year))
+        for book in new:
+            position = table.title_index.position(book)
+            table.delete(book.isbn)
+            view.delete_row(position, book.isbn)
+        settle()
+
+    def drag_select(_):
+        # one drag frame per row: extend the range, scroll a row
+        view.offset = 0
+        view.render()
+        for position in range(min(2000, size)):
+            view.scroll(1)
+            view.select(0, position + 1)
+        view.select(0, 0)
+        settle()
+
+    for name, fn, count in [("view.set_source", set_source, None), ("view.page_down", page_down, 200),
+                            ("view.jump", jump, len(jumps)), ("view.edits", edits, 2 * len(new)),
+                            ("view.drag_select", drag_select, min(2000, size))]:
+        if wanted(name, only):
+            timer.run(name, size, fn, ops=count)
+
+    if root is not None and size <= 100000 and wanted("view.insert_all", only):
+        # what Show All did before the virtual view: one item per book
+        tree = ttk.Treeview(root, columns=("ISBN", "Title", "Author", "Year"), show="headings")
+        listing = [(b.isbn, b.title, b.author, b.year) for b in table.books_by_title()]
+
+        def insert_all(_):
+            tree.delete(*tree.get_children())
+            for row in listing:
+                tree.insert("", "end", values=row)
+            settle()
+
+        timer.run("view.insert_all", size, insert_all, ops=size)
+        tree.destroy()
+    if root is not None:
+        view.tree.destroy()
+
+# ---- Library.py queries ----
+
+def bench_sql(backend_class, catalog, timer, only, workdir):
+    size = len(catalog)
+    ops = max(1, min(1000, size // 10))
+    rng = random.Random(size)
+    rows = [row + ("2024-01-01", "12:00:00") for row in catalog]
+    base, extra = rows[:size - ops], rows[size - ops:]
+    present = [row[0] for row in rng.sample(base, ops)]
+    batch_size = 5000
+
+    def fresh():
+        path = os.path.join(workdir, f"bench-{time.monotonic_ns()}.db")
+        db = backend_class(path)
+        db.create_schema()
+        return db
+
+    def load(db, data):
+        for start in range(0, len(data), batch_size):
+            db.insert_batch(data[start:start + batch_size], "skip", [])
+
+    if wanted("sql.import", only):
+        runs = []
+        for _ in range(timer.repeat):
+            db = fresh()
+            gc.collect()
+            start = time.perf_counter()
+            load(db, rows)
+            runs.append(time.perf_counter() - start)
+            db.close()
+        timer.record("sql.import", size, runs, size)
+
+    db = fresh()
+    load(db, base)
+    ordered = sorted(row[0] for row in base)
+    terms = {
+        "sql.search_isbn": present[:20],
+        "sql.search_word": [rng.choice(WORDS) for _ in range(20)],
+        "sql.search_prefix": [rng.choice(SURNAMES)[:3] for _ in range(20)],
+        "sql.search_year": [str(rng.randint(1800, 2024)) for _ in range(20)],
+    }
+    runs = {"sql.insert": [], "sql.update": [], "sql.update_many": [], "sql.changes": [], "sql.delete": []}
+    for _ in range(timer.repeat):
+        version = db.version()
+        steps = [
+            ("sql.insert", lambda: [db.insert(row) for row in extra]),
+            ("sql.update", lambda: [db.update(isbn, "Bench Title", "B. Bench", 2000) for isbn in present]),
+            ("sql.update_many", lambda: db.update_many(present, {"Year": 2001})),
+            ("sql.changes", lambda: db.changes(version)),
+            ("sql.delete", lambda: db.delete([row[0] for row in extra])),
+        ]
+        for name, fn in steps:
+            gc.collect()
+            start = time.perf_counter()
+            fn()
+            runs[name].append(time.perf_counter() - start)
+    for name, times in runs.items():
+        if wanted(name, only):
+            timer.record(name, size, times, None if name == "sql.changes" else ops)
+
+    for name, keys in terms.items():
+        if wanted(name, only):
+            timer.run(name, size, lambda _, keys=keys: [db.search(key) for key in keys], ops=len(keys))
+
+    def page_walk(_):
+        after = None
+        for _ in range(20):
+            page = db.page(after, 500)
+            if len(page) < 500:
+                break
+            after = page[-1][0]
+
+    middle = ordered[len(ordered) // 2]
+    if wanted("sql.page_walk", only):
+        timer.run("sql.page_walk", size, page_walk, ops=20)
+    if wanted("sql.page_deep", only):
+        timer.run("sql.page_deep", size, lambda _: db.page(middle, 500))
+
+    path = os.path.join(workdir, "export-sql.csv")
+
+    def export(_):
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            for chunk in db.iter_rows(5000):
+                writer.writerows(chunk)
+
+    if wanted("sql.export", only):
+        timer.run("sql.export", size, export, ops=len(base))
+    db.close()
+
+# ---- memory ----
+
+def bench_memory(catalog, memory, only, workdir):
+    size = len(catalog)
+    path = os.path.join(workdir, "memory.csv")
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        lms.export_rows(catalog, file)
+    held = {}
+    for name, cls in [("mem.hash_table", lms.HashTable), ("mem.compact_table", lms.CompactHashTable)]:
+        if not wanted(name, only):
+            continue
+        gc.collect()
+        tracemalloc.start()
+        table = cls()
+        for _ in lms.import_books(table, path, lms.ImportReport()):
+            pass
+        held[name], peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del table
+        memory[f"{name}@{size}"] = {"held_bytes": held[name], "peak_bytes": peak,
+                                    "bytes_per_book": held[name] / size}
+        print(f"{name:<24}{size:>10,}{held[name] / 2 ** 20:>10.1f}MB held{peak / 2 ** 20:>10.1f}MB peak"
+              f"{held[name] / size:>8.0f}B/book", flush=True)
+    if len(held) == 2:
+        print(f"{'mem.compact/hash':<24}{size:>10,}"
+              f"{held['mem.compact_table'] / held['mem.hash_table']:>12.0%}", flush=True)
+
+# ---- baseline ----
+
+def compare(results, baseline, tolerance, min_delta, sizes, only):
+    # a result regresses if it is both tolerance slower and min_delta
+    # seconds slower than the baseline; the second guard keeps timer noise
+    # on sub-millisecond benchmarks from failing the run. Returns the
+    # regressions and the baseline keys that should have run but didn't.
+    regressions = []
+    missing = []
+    print(f"\n{'benchmark':<36}{'baseline':>12}{'now':>12}{'change':>10}")
+    for key in sorted(set(results) | set(baseline)):
+        if key not in baseline:
+            print(f"{key:<36}{'-':>12}{results[key]['min'] * 1000:>10.2f}ms{'new':>10}")
+            continue
+        if key not in results:
+            name, size = key.rsplit("@", 1)
+            old = f"{baseline[key]['min'] * 1000:>10.2f}ms"
+            if wanted(name, only) and int(size) in sizes:
+                missing.append(key)
+                print(f"{key:<36}{old}{'-':>12}{'':>10}  MISSING")
+            else:
+                print(f"{key:<36}{old}{'-':>12}{'skipped':>10}")
+            continue
+        old, new = baseline[key]["min"], results[key]["min"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > tolerance and new - old > min_delta:
+            regressions.append((key, old, new, change))
+            flag = "  REGRESSION"
+        print(f"{key:<36}{old * 1000:>10.2f}ms{new * 1000:>10.2f}ms{change:>+10.0%}{flag}")
+    return regressions, missing
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the catalog engines and UI refresh paths")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="comma-separated catalog sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", action="append", default=[],
+                        help="run only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--mock-tk", action="store_true", help="use the mock Treeview even if a display is available")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default: %(default)s = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds (default: %(default)s)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    root = None
+    if not args.mock_tk:
+        try:
+            root = tkinter.Tk()
+            root.withdraw()
+        except tkinter.TclError:
+            root = None
+    print("Treeview: " + ("Tk" if root is not None else "mock widget (no display)"))
+
+    try:
+        from library_sqlite import SQLiteBackend
+    except ImportError as e:
+        SQLiteBackend = None
+        print(f"sql.* skipped: {e}")
+
+    timer = Timer(args.repeat)
+    memory = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            catalog = make_catalog(size)
+            table = bench_lms(catalog, timer, args.only, workdir)
+            bench_view(table, size, timer, args.only, root)
+            del table
+            if SQLiteBackend is not None:
+                bench_sql(SQLiteBackend, catalog, timer, args.only, workdir)
+            bench_memory(catalog, memory, args.only, workdir)
+    if root is not None:
+        root.destroy()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "sizes": sizes,
+            "repeat": args.repeat,
+            "treeview": "tk" if root is not None else "mock",
+        },
+        "results": timer.results,
+        "memory": memory,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"wrote {path}")
+
+    if baseline is not None:
+        regressions, missing = compare(timer.results, baseline, args.tolerance, args.min_delta,
+                                       sizes, args.only)
+        if regressions:
+            print(f"\n{len(regressions)} REGRESSION(S) against {args.baseline}:", file=sys.stderr)
+            for key, old, new, change in regressions:
+                print(f"  {key}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms ({change:+.0%})", file=sys.stderr)
+        if missing:
+            print(f"\n{len(missing)} baseline benchmark(s) did not run:", file=sys.stderr)
+            for key in missing:
+                print(f"  {key}", file=sys.stderr)
+        if regressions or missing:
+            sys.exit(1)
+        print("\nno regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import heapq
+import re
+from collections import Counter
+
+# -----------------------------
+# Typo-tolerant matching
+# -----------------------------
+# Finds the keys nearest a mistyped one without comparing it to every key.
+#
+# ISBNs: neighbours() lists every string one edit away (a digit deleted,
+# doubled, replaced or swapped with the next). Probing those against a hash
+# table or an index is a few hundred exact lookups whatever the catalog
+# size. ISBNs are stored as typed, hyphens and all, so the probes are
+# compared with isbn_form() of the stored ones.
+#
+# Words: TermIndex holds trigram postings over a vocabulary (the distinct
+# words of titles and authors, far fewer than the books). A misspelt word
+# is matched to the terms sharing most trigrams, plus its one-edit
+# neighbours that are terms (a swap can leave few trigrams in common, too
+# few to stand out among thousands of terms), and those are checked by
+# edit distance. The caller then finds the books through its own word
+# index.
+#
+# Scores are 1 - edits / length: 1.0 is an exact match.
+
+ISBN_ALPHABET = "0123456789X"
+WORD_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+ISBN_TYPED = re.compile(r"[0-9Xx][0-9Xx -]{7,}[0-9Xx]")
+CANDIDATES = 50  # terms per word, by shared trigrams, checked by edit distance
+
+def isbn_form(isbn):
+    # an ISBN without hyphens or spaces, upper case
+    return isbn.replace("-", "").replace(" ", "").upper()
+
+def isbn_key(text):
+    # the ISBN a clerk meant to type, in isbn_form(), or None
+    if not ISBN_TYPED.fullmatch(text):
+        return None
+    return isbn_form(text)
+
+def neighbours(key, alphabet):
+    found = set()
+    for i in range(len(key) + 1):
+        left, right = key[:i], key[i:]
+        if right:
+            found.add(left + right[1:])
+            if len(right) > 1:
+                found.add(left + right[1] + right[0] + right[2:])
+            for c in alphabet:
+                found.add(left + c + right[1:])
+        for c in alphabet:
+            found.add(left + c + right)
+    found.discard(key)
+    return found
+
+def distance(a, b, limit):
+    # optimal string alignment (Levenshtein plus adjacent swaps); anything
+    # over limit is reported as limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+def max_edits(word):
+    # as Lucene's AUTO fuzziness: none below 3 letters, then 1, then 2
+    return 0 if len(word) < 3 else 1 if len(word) < 6 else 2
+
+def score(edits, a, b):
+    return 1.0 - edits / max(len(a), len(b), 1)
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TermIndex:
+    def __init__(self, terms=()):
+        self.terms = set()
+        self.postings = {}  # trigram -> set of terms
+        self.add_many(terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def add(self, term):
+        if term in self.terms:
+            return
+        self.terms.add(term)
+        for gram in trigrams(term):
+            self.postings.setdefault(gram, set()).add(term)
+
+    def add_many(self, terms):
+        for term in terms:
+            self.add(term)
+
+    def remove(self, term):
+        if term not in self.terms:
+            return
+        self.terms.discard(term)
+        for gram in trigrams(term):
+            terms = self.postings[gram]
+            terms.discard(term)
+            if not terms:
+                del self.postings[gram]
+
+    def similar(self, word, limit=5, weight=None):
+        # [(term, score)], best first, within max_edits(word) of word; ties
+        # go to the higher weight(term), such as how many books use it
+        edits = max_edits(word)
+        if not edits:
+            return [(word, 1.0)] if word in self.terms else []
+        shared = Counter()
+        for gram in trigrams(word):
+            shared.update(self.postings.get(gram, ()))
+        candidates = {term for term, _ in shared.most_common(CANDIDATES)}
+        candidates.update(term for term in neighbours(word, WORD_ALPHABET) if term in self.terms)
+        if word in self.terms:
+            candidates.add(word)
+        matches = []
+        for term in candidates:
+            d = distance(word, term, edits)
+            if d <= edits:
+                matches.append((score(d, word, term), weight(term) if weight else 0, term))
+        return [(term, s) for s, _, term in heapq.nlargest(limit, matches)]
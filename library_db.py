@@ -0,0 +1,768 @@
+import queue
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import pymysql
+except ImportError:  # only MySQLBackend needs it; SQLiteBackend shares the rest of this module
+    pymysql = None
+
+import perf
+from fuzzy import ISBN_ALPHABET, isbn_form, isbn_key, neighbours, score
+
+# -----------------------------
+# Connection pool + background DB worker
+# -----------------------------
+# pymysql connections are not thread-safe, so each job borrows a whole
+# connection from the pool and gives it back when done. A connection that
+# has sat idle for a while is pinged (and reconnected) before it is handed
+# out, and one that fails mid-query is thrown away rather than returned.
+#
+# DBWorker runs jobs on a thread pool. Tk must only be touched from the
+# mainloop thread, so finished jobs are queued and a root.after poll hands
+# each result (or exception) to its callback there.
+
+class ConnectionPool:
+    def __init__(self, size=4, ping_after=30.0, **config):
+        self.config = config
+        self.size = size
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()  # (connection, last used)
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _open(self):
+        return pymysql.connect(**self.config)
+
+    def _checkout(self):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+        if time.monotonic() - last_used > self.ping_after:
+            try:
+                conn.ping(reconnect=True)
+            except pymysql.err.Error:
+                self._discard(conn)
+                return self._open()
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except pymysql.err.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        # commit on success, roll back on error; at most `size` checked out
+        if self._closed:
+            raise pymysql.err.InterfaceError("connection pool is closed")
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+                conn.commit()
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+                self._discard(conn)  # dropped or broken: open a fresh one next time
+                raise
+            except BaseException:
+                try:
+                    conn.rollback()
+                except pymysql.err.Error:
+                    self._discard(conn)
+                    raise
+                self._release(conn)
+                raise
+            self._release(conn)
+        finally:
+            self._slots.release()
+
+    def _release(self, conn):
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+class DBWorker:
+    def __init__(self, root, workers=4, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        self.results = queue.Queue()
+        self.pending = 0
+        self._polling = False
+
+    def submit(self, job, on_done=None, on_error=None):
+        # job() runs on a worker thread; on_done(result) / on_error(exc) on the Tk thread
+        future = self.executor.submit(job)
+        future.add_done_callback(lambda f: self.results.put((f, on_done, on_error)))
+        self.pending += 1
+        self._schedule()
+        return future
+
+    def _schedule(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        try:
+            while True:
+                try:
+                    future, on_done, on_error = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending -= 1
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is None:
+                    if on_done is not None:
+                        on_done(future.result())
+                elif on_error is not None:
+                    on_error(error)
+        finally:
+            # a failing callback must not stop the results behind it
+            if self.pending:
+                self._schedule()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# -----------------------------
+# Schema and search planning
+# -----------------------------
+# Title/Author/Year each get a B-tree index and Title+Author share one
+# FULLTEXT index. A search is planned as a UNION of single-index lookups
+# (one per access path that fits the term) instead of an OR chain of
+# leading-wildcard LIKEs, which can only be answered by a full scan.
+
+BOOK_COLUMNS = 'ISBN, Title, Author, Year, Added_Date, Added_Time'
+
+BOOK_INDEXES = {
+    'idx_title': 'INDEX idx_title (Title)',
+    'idx_author': 'INDEX idx_author (Author)',
+    'idx_year': 'INDEX idx_year (Year)',
+    'ft_title_author': 'FULLTEXT INDEX ft_title_author (Title, Author)',
+    'idx_last_modified': 'INDEX idx_last_modified (Last_Modified)',
+    'idx_isbn_key': 'INDEX idx_isbn_key (ISBN_Key)',
+}
+
+# fuzzy.isbn_form in SQL: ISBNs are stored as typed, so near-ISBN lookups
+# go through this (a generated column in MySQL, an expression index in SQLite)
+ISBN_FORM_SQL = "UPPER(REPLACE(REPLACE(ISBN, '-', ''), ' ', ''))"
+ISBN_KEY_COLUMN = f'ISBN_Key VARCHAR(50) AS ({ISBN_FORM_SQL}) STORED'
+
+def create_schema(cursor):
+    cursor.execute("CREATE DATABASE IF NOT EXISTS librarymanagementsystem")
+    cursor.execute("USE librarymanagementsystem")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS books (
+            ISBN VARCHAR(50) PRIMARY KEY,
+            Title VARCHAR(255) NOT NULL,
+            Author VARCHAR(255),
+            Year INT,
+            Added_Date DATE,
+            Added_Time TIME,
+            Last_Modified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            {ISBN_KEY_COLUMN}
+        )
+    """)
+    # tables created before the columns and indexes existed get them added here
+    cursor.execute("SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='books'")
+    columns = {name for (name,) in cursor.fetchall()}
+    if 'Last_Modified' not in columns:
+        cursor.execute("ALTER TABLE books ADD COLUMN Last_Modified TIMESTAMP(6) NOT NULL "
+                       "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+    if 'ISBN_Key' not in columns:
+        cursor.execute(f"ALTER TABLE books ADD COLUMN {ISBN_KEY_COLUMN}")
+    cursor.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='books'")
+    existing = {name for (name,) in cursor.fetchall()}
+    for name, definition in BOOK_INDEXES.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE books ADD {definition}")
+    return create_change_tracking(cursor)
+
+# -----------------------------
+# Change tracking
+# -----------------------------
+# Every write bumps a row's Last_Modified, and a trigger records deleted
+# ISBNs in books_deleted. The newest timestamp in each table is the
+# catalog's version: two indexed MAX() lookups tell a client whether
+# anything changed, and the rows newer than its last version tell it what.
+
+TOMBSTONE_DAYS = 7
+CHANGE_MARGIN = 1  # seconds; a row can commit a little after its timestamp
+
+def create_change_tracking(cursor):
+    # returns False if the user may not create triggers (no change tracking)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS books_deleted (
+            ISBN VARCHAR(50) PRIMARY KEY,
+            Deleted_At TIMESTAMP(6) NOT NULL,
+            INDEX idx_deleted_at (Deleted_At)
+        )
+    """)
+    cursor.execute(f"DELETE FROM books_deleted WHERE Deleted_At < NOW(6) - INTERVAL {TOMBSTONE_DAYS} DAY")
+    cursor.execute("SELECT 1 FROM information_schema.TRIGGERS "
+                   "WHERE TRIGGER_SCHEMA=DATABASE() AND TRIGGER_NAME='books_track_delete'")
+    if cursor.fetchone():
+        return True
+    try:
+        cursor.execute("""
+            CREATE TRIGGER books_track_delete AFTER DELETE ON books FOR EACH ROW
+            INSERT INTO books_deleted (ISBN, Deleted_At) VALUES (OLD.ISBN, NOW(6))
+            ON DUPLICATE KEY UPDATE Deleted_At = NOW(6)
+        """)
+    except (pymysql.err.OperationalError, pymysql.err.InternalError):
+        return False
+    return True
+
+def catalog_version(cursor):
+    # (newest write, newest delete)
+    cursor.execute("SELECT (SELECT MAX(Last_Modified) FROM books), "
+                   "(SELECT MAX(Deleted_At) FROM books_deleted)")
+    return cursor.fetchone()
+
+def fetch_changes(cursor, since, upto=None):
+    # (rows written, ISBNs deleted) after version `since`, limited to ISBNs <= upto;
+    # None when the tombstones no longer reach back to `since`
+    modified, deleted = since
+    if modified is None:
+        return None
+    cursor.execute(f"SELECT %s < NOW(6) - INTERVAL {TOMBSTONE_DAYS - 1} DAY", (modified,))
+    if cursor.fetchone()[0]:
+        return None
+    bound = ' AND ISBN <= %s' if upto is not None else ''
+    extra = (upto,) if upto is not None else ()
+    cursor.execute(f"SELECT {BOOK_COLUMNS} FROM books WHERE Last_Modified >= %s - INTERVAL "
+                   f"{CHANGE_MARGIN} SECOND{bound} ORDER BY ISBN", (modified,) + extra)
+    rows = cursor.fetchall()
+    if deleted is None:
+        cursor.execute(f"SELECT ISBN FROM books_deleted WHERE TRUE{bound}", extra)
+    else:
+        cursor.execute(f"SELECT ISBN FROM books_deleted WHERE Deleted_At >= %s - INTERVAL "
+                       f"{CHANGE_MARGIN} SECOND{bound}", (deleted,) + extra)
+    return rows, [isbn for (isbn,) in cursor.fetchall()]
+
+class SearchCache:
+    # LRU of search results, each tagged with the catalog version it was read at
+    def __init__(self, max_entries=64, max_rows=200000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()  # key -> (version, rows)
+        self.rows = 0
+
+    def get(self, key, version):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            if perf.enabled:
+                perf.count('search_cache.miss')
+            return None
+        if perf.enabled:
+            perf.count('search_cache.hit')
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def find_prefix(self, key, version):
+        # the cached search for the longest earlier prefix of key, or None
+        for length in range(len(key) - 1, 0, -1):
+            entry = self.entries.get(key[:length])
+            if entry is not None and entry[0] == version:
+                return key[:length], entry[1]
+        return None
+
+    def clear(self):
+        self.entries.clear()
+        self.rows = 0
+
+    def put(self, key, version, rows):
+        if len(rows) > self.max_rows:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.rows -= len(old[1])
+        self.entries[key] = (version, rows)
+        self.rows += len(rows)
+        while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.rows -= len(evicted)
+
+ISBN_LIKE = re.compile(r"[0-9][0-9-]{8,}[0-9Xx]")
+FT_WORD = re.compile(r"\w+")
+FT_MIN_TOKEN = 3  # innodb_ft_min_token_size
+# InnoDB's default full-text stopword list; such words are never indexed
+FT_STOPWORDS = frozenset("""
+    a about an are as at be by com de en for from how i in is it la of on
+    or that the this to was what when where who will with und www
+""".split())
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def plan_search(key):
+    # returns (query, params) for an ISBN/Title/Author/Year search on key
+    if ISBN_LIKE.fullmatch(key):
+        return f'SELECT {BOOK_COLUMNS} FROM books WHERE ISBN=%s', (key,)  # primary key lookup only
+    branches = [('ISBN=%s', (key,))]
+    if key.isdigit() and len(key) <= 4:
+        branches.append(('Year=%s', (int(key),)))
+    words = [word for word in FT_WORD.findall(key)
+             if len(word) >= FT_MIN_TOKEN and word.lower() not in FT_STOPWORDS]
+    if words:
+        # every word must appear, each may be a prefix ("tolk" finds Tolkien)
+        terms = ' '.join(f'+{word}*' for word in words)
+        branches.append(('MATCH(Title, Author) AGAINST (%s IN BOOLEAN MODE)', (terms,)))
+    else:
+        # too short for the full-text index: prefix match on the B-trees
+        pattern = escape_like(key) + '%'
+        branches.append(('Title LIKE %s', (pattern,)))
+        branches.append(('Author LIKE %s', (pattern,)))
+    query = ' UNION '.join(f'(SELECT {BOOK_COLUMNS} FROM books WHERE {condition})' for condition, _ in branches)
+    params = tuple(param for _, values in branches for param in values)
+    return query + ' ORDER BY ISBN', params
+
+# Narrowing a search locally. When a key is a plain word search, its rows
+# are exactly those where every word is a prefix of some word of Title or
+# Author. Typing more of such a key can only keep or drop rows, so the
+# new result is the old one filtered by the new words, with no query.
+# Keys that could be an ISBN or a year also hit those columns exactly, so
+# they are never narrowed. fold() stands in for the accent- and
+# case-insensitive collation.
+ISBN_PREFIX = re.compile(r'[0-9Xx-]+')
+
+def fold(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text.casefold()) if not unicodedata.combining(c))
+
+def plain_words(key, keep=lambda word: True):
+    # the words a word search on key requires, or None if key is not one
+    if ISBN_PREFIX.fullmatch(key):
+        return None
+    words = [fold(word) for word in FT_WORD.findall(key) if keep(word)]
+    return words or None
+
+def mysql_search_words(key):
+    return plain_words(key, lambda word: len(word) >= FT_MIN_TOKEN and word.lower() not in FT_STOPWORDS)
+
+def narrows(old_words, new_words):
+    # every old word is still required, possibly longer
+    return all(any(new.startswith(old) for new in new_words) for old in old_words)
+
+def filter_words(rows, words):
+    matched = []
+    for row in rows:
+        tokens = FT_WORD.findall(fold(f'{row[1]} {row[2] or ""}'))
+        if all(any(token.startswith(word) for token in tokens) for word in words):
+            matched.append(row)
+    return matched
+
+# Near matches, offered when a search finds nothing (see fuzzy.py). A
+# mistyped ISBN is looked up together with every string one edit away, in
+# one primary key IN list. Words are corrected against the full-text
+# vocabulary where the backend can read it.
+SUGGESTIONS = 20
+TERMS_PER_WORD = 8
+
+def near_isbns(key):
+    # {isbn_form: score} to look up for a mistyped ISBN, or None if key is not one
+    isbn = isbn_key(key)
+    if isbn is None:
+        return None
+    scores = {near: score(1, near, isbn) for near in neighbours(isbn, ISBN_ALPHABET)}
+    scores[isbn] = 1.0
+    return scores
+
+def rank_isbns(rows, scores, limit):
+    return sorted(((row, scores[isbn_form(row[0])]) for row in rows),
+                  key=lambda match: (-match[1], match[0][0]))[:limit]
+
+def rank_words(rows, corrected, limit):
+    # corrected holds, per word of the key, its near terms as [(term, score)];
+    # a row scores the mean over the words of the best term it contains
+    ranked = []
+    for row in rows:
+        tokens = set(FT_WORD.findall(fold(f'{row[1]} {row[2] or ""}')))
+        total = sum(max((s for term, s in terms if term in tokens), default=0.0) for terms in corrected)
+        ranked.append((row, total / len(corrected)))
+    ranked.sort(key=lambda match: (-match[1], match[0][0]))
+    return ranked[:limit]
+
+# -----------------------------
+# Storage backends
+# -----------------------------
+# Library.py reaches storage only through a backend object, and only from
+# worker threads (DBWorker jobs or the import/export threads):
+#   create_schema()                        set up the tables; sets change_tracking
+#   page(after, limit)                     the next `limit` rows after ISBN `after`
+#   version(), changes(since, upto)        see catalog_version / fetch_changes
+#   search(key, ticket=None)               rows matching an ISBN/Title/Author/Year term;
+#                                          cancel(ticket) from another thread stops it
+#   search_words(key)                      see plain_words
+#   suggest(key, limit)                    [(row, score)] near a key that found nothing
+#   insert(row)                            raises DuplicateISBN
+#   update(isbn, title, author, year)
+#   delete(isbns), update_many(isbns, fields)   one transaction; delete returns the count
+#   delete_ranges(ranges), update_ranges(ranges, fields)
+#                                          the same over (first ISBN, last ISBN, rows)
+#                                          ranges; None, with nothing changed, if a
+#                                          range no longer holds exactly `rows` books
+#   insert_batch(rows, mode, duplicates)   one transaction; returns rows written
+#   load_file(path, mode, header, cancelled, errors)
+#                                          server-side bulk load, one transaction; returns
+#                                          (rows, written), or None if unsupported
+#   estimate_rows(), iter_rows(chunk_size) for streaming exports
+#   close()
+# MySQLBackend is below; SQLiteBackend is in library_sqlite.py. Rows are
+# always tuples in BOOK_COLUMNS order, sorted by ISBN.
+
+class DuplicateISBN(Exception):
+    pass
+
+class StaleRange(Exception):
+    pass  # raised inside a *_ranges transaction to roll it back
+
+class QueryCancelled(Exception):
+    pass
+
+class QueryTicket:
+    # Lets another thread cancel a search. While the query runs, handle is
+    # what the backend interrupts (a MySQL thread id, a sqlite3 connection);
+    # the lock keeps a cancel from hitting the connection's next query.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.handle = None
+
+@contextmanager
+def running(ticket, handle):
+    if ticket is None:
+        yield
+        return
+    with ticket.lock:
+        if ticket.cancelled:
+            raise QueryCancelled()
+        ticket.handle = handle
+    try:
+        yield
+    except Exception as e:
+        if ticket.cancelled:
+            raise QueryCancelled() from e
+        raise
+    finally:
+        with ticket.lock:
+            ticket.handle = None
+
+BULK_CHUNK = 1000
+
+def chunked(items, size=BULK_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def placeholders(values, marker='%s'):
+    return ', '.join([marker] * len(values))
+
+IMPORT_MODES = {
+    'skip': 'ON DUPLICATE KEY UPDATE ISBN=ISBN',
+    'upsert': 'ON DUPLICATE KEY UPDATE Title=VALUES(Title), Author=VALUES(Author), Year=VALUES(Year)',
+    'report': 'ON DUPLICATE KEY UPDATE ISBN=ISBN',
+}
+
+# LOAD DATA fills a staging table of raw fields, which is checked the way
+# Library.parse_import_row checks a CSV row and then copied into books with
+# the same IMPORT_MODES clause as insert_batch. Loading into books directly
+# would skip the checks, and REPLACE would delete and re-insert upserted
+# rows (new Added_Date, a books_deleted tombstone for each).
+# The staging columns are not named after the books columns, so ISBN in an
+# ON DUPLICATE KEY UPDATE clause can only mean books.ISBN.
+STAGING_TABLE = """
+    CREATE TEMPORARY TABLE books_import (
+        Line INT AUTO_INCREMENT PRIMARY KEY,
+        raw_isbn TEXT, raw_title TEXT, raw_author TEXT, raw_year TEXT, raw_date TEXT, raw_time TEXT,
+        error TEXT
+    ) CHARACTER SET utf8mb4
+"""
+
+def stripped(field):
+    # str.strip() in SQL: whitespace includes the \r of CRLF files, which
+    # ends up in whichever field is last on the line
+    return f"REGEXP_REPLACE({field}, '^[[:space:]]+|[[:space:]]+$', '')"
+
+# %% is a literal % here: these run with parameters
+STAGING_CHECK = """
+    UPDATE books_import SET error = CASE
+        WHEN raw_title IS NULL THEN 'expected at least ISBN and Title'
+        WHEN raw_isbn = '' OR raw_title = '' THEN 'ISBN and Title are required'
+        WHEN raw_year <> '' AND raw_year NOT REGEXP '^[+-]?[0-9]+$'
+            THEN CONCAT('Year ', QUOTE(raw_year), ' is not a number')
+        WHEN COALESCE(NULLIF(raw_date, ''), %s) NOT REGEXP '^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$'
+            OR STR_TO_DATE(COALESCE(NULLIF(raw_date, ''), %s), '%%Y-%%m-%%d') IS NULL
+            OR COALESCE(NULLIF(raw_time, ''), %s) NOT REGEXP '^[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}$'
+            OR STR_TO_DATE(COALESCE(NULLIF(raw_time, ''), %s), '%%H:%%i:%%s') IS NULL
+            THEN CONCAT('bad Added_Date/Added_Time ', QUOTE(COALESCE(NULLIF(raw_date, ''), %s)),
+                        ' ', QUOTE(COALESCE(NULLIF(raw_time, ''), %s)))
+    END
+"""
+
+STAGING_COPY = f"""
+    INSERT INTO books ({BOOK_COLUMNS})
+    SELECT raw_isbn, raw_title, NULLIF(raw_author, ''), CAST(NULLIF(raw_year, '') AS SIGNED),
+           COALESCE(NULLIF(raw_date, ''), %s), COALESCE(NULLIF(raw_time, ''), %s)
+    FROM books_import WHERE error IS NULL ORDER BY Line
+"""
+
+class MySQLBackend:
+    name = 'MySQL'
+
+    def __init__(self, database='librarymanagementsystem', **config):
+        self.config = dict(config, database=database)
+        self.server_config = config
+        self.pool = ConnectionPool(**self.config)
+        self.change_tracking = False
+
+    @contextmanager
+    def cursor(self):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            yield perf.traced(cursor)
+
+    def create_schema(self):
+        # the database may not exist yet, so this connects to the server only
+        if pymysql is None:
+            raise ImportError("MySQL needs the PyMySQL package (pip install pymysql)")
+        con = pymysql.connect(**self.server_config)
+        try:
+            with con.cursor() as cursor:
+                self.change_tracking = create_schema(cursor)
+            con.commit()
+        finally:
+            con.close()
+
+    def page(self, after, limit):
+        with self.cursor() as cursor:
+            if after is None:
+                cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY ISBN LIMIT %s', (limit,))
+            else:
+                cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE ISBN > %s ORDER BY ISBN LIMIT %s',
+                               (after, limit))
+            return list(cursor.fetchall())
+
+    def version(self):
+        with self.cursor() as cursor:
+            return catalog_version(cursor)
+
+    def changes(self, since, upto=None):
+        with self.cursor() as cursor:
+            return fetch_changes(cursor, since, upto)
+
+    def search(self, key, ticket=None):
+        query, params = plan_search(key)
+        with self.cursor() as cursor:
+            with running(ticket, cursor.connection.thread_id()):
+                cursor.execute(query, params)
+                return list(cursor.fetchall())
+
+    def search_words(self, key):
+        return mysql_search_words(key)
+
+    def suggest(self, key, limit=SUGGESTIONS):
+        # ISBNs only: InnoDB shows its FULLTEXT vocabulary only through
+        # innodb_ft_aux_table, a global setting, so there are no terms to
+        # correct words against
+        scores = near_isbns(key)
+        if scores is None:
+            return []
+        rows = []
+        with self.cursor() as cursor:
+            for chunk in chunked(list(scores)):
+                cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE ISBN_Key IN ({placeholders(chunk)})',
+                               chunk)
+                rows.extend(cursor.fetchall())
+        return rank_isbns(rows, scores, limit)
+
+    def cancel(self, ticket):
+        # KILL QUERY has to come from another connection; the killed one
+        # fails with an OperationalError and the pool replaces it
+        with ticket.lock:
+            ticket.cancelled = True
+            if ticket.handle is None:
+                return
+            try:
+                con = pymysql.connect(**self.config)
+                try:
+                    with con.cursor() as cursor:
+                        cursor.execute('KILL QUERY %s', (ticket.handle,))
+                finally:
+                    con.close()
+            except pymysql.err.Error:
+                pass  # the result is dropped anyway
+
+    def insert(self, row):
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(f'INSERT INTO books ({BOOK_COLUMNS}) VALUES ({placeholders(row)})', row)
+        except pymysql.err.IntegrityError:
+            raise DuplicateISBN(row[0])
+
+    def update(self, isbn, title, author, year):
+        with self.cursor() as cursor:
+            cursor.execute('UPDATE books SET Title=%s, Author=%s, Year=%s WHERE ISBN=%s',
+                           (title, author, year, isbn))
+
+    def delete(self, isbns):
+        # one statement per chunk, all in one transaction
+        deleted = 0
+        with self.cursor() as cursor:
+            for chunk in chunked(isbns):
+                cursor.execute(f'DELETE FROM books WHERE ISBN IN ({placeholders(chunk)})', chunk)
+                deleted += cursor.rowcount
+        return deleted
+
+    def update_many(self, isbns, fields):
+        assignments = ', '.join(f'{name}=%s' for name in fields)
+        values = tuple(fields.values())
+        with self.cursor() as cursor:
+            for chunk in chunked(isbns):
+                cursor.execute(f'UPDATE books SET {assignments} WHERE ISBN IN ({placeholders(chunk)})',
+                               values + tuple(chunk))
+
+    @staticmethod
+    def _lock_ranges(cursor, ranges):
+        # FOR UPDATE locks the rows and the gaps between them until commit,
+        # so no other client can change what was counted
+        for first, last, rows in ranges:
+            cursor.execute('SELECT COUNT(*) FROM books WHERE ISBN BETWEEN %s AND %s FOR UPDATE', (first, last))
+            if cursor.fetchone()[0] != rows:
+                raise StaleRange(first, last)
+
+    def delete_ranges(self, ranges):
+        try:
+            with self.cursor() as cursor:
+                self._lock_ranges(cursor, ranges)
+                for first, last, _ in ranges:
+                    cursor.execute('DELETE FROM books WHERE ISBN BETWEEN %s AND %s', (first, last))
+        except StaleRange:
+            return None
+        return sum(rows for _, _, rows in ranges)
+
+    def update_ranges(self, ranges, fields):
+        assignments = ', '.join(f'{name}=%s' for name in fields)
+        values = tuple(fields.values())
+        try:
+            with self.cursor() as cursor:
+                self._lock_ranges(cursor, ranges)
+                for first, last, _ in ranges:
+                    cursor.execute(f'UPDATE books SET {assignments} WHERE ISBN BETWEEN %s AND %s',
+                                   values + (first, last))
+        except StaleRange:
+            return None
+        return sum(rows for _, _, rows in ranges)
+
+    def insert_batch(self, rows, mode, duplicates):
+        # executemany is sent as multi-row INSERT statements
+        with self.cursor() as cursor:
+            if mode == 'report':
+                # look the ISBNs up first so duplicates can be listed
+                isbns = list({row[0] for row in rows})
+                cursor.execute(f'SELECT ISBN FROM books WHERE ISBN IN ({placeholders(isbns)})', isbns)
+                existing = {isbn for (isbn,) in cursor.fetchall()}
+                fresh = []
+                for row in rows:
+                    if row[0] in existing:
+                        duplicates.append(row[0])
+                    else:
+                        existing.add(row[0])
+                        fresh.append(row)
+                rows = fresh
+            if not rows:
+                return 0
+            cursor.executemany(f'INSERT INTO books ({BOOK_COLUMNS}) VALUES ({placeholders(rows[0])}) '
+                               + IMPORT_MODES[mode], rows)
+            return cursor.rowcount
+
+    def load_file(self, path, mode, header, cancelled, errors):
+        # LOAD DATA LOCAL INFILE when the server allows it, through the
+        # staging table; rejected rows go to errors as (line, message)
+        today, now = time.strftime('%Y-%m-%d'), time.strftime('%H:%M:%S')
+        conn = pymysql.connect(local_infile=True, **self.config)
+        try:
+            cursor = perf.traced(conn.cursor())
+            cursor.execute('SELECT @@GLOBAL.local_infile')
+            if not cursor.fetchone()[0]:
+                return None
+            cursor.execute(STAGING_TABLE)
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE books_import CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n' {'IGNORE 1 LINES' if header else ''}
+                (@isbn, @title, @author, @year, @added_date, @added_time)
+                SET raw_isbn = {stripped('@isbn')}, raw_title = {stripped('@title')},
+                    raw_author = {stripped('@author')}, raw_year = {stripped('@year')},
+                    raw_date = {stripped('@added_date')}, raw_time = {stripped('@added_time')}
+            """, (path,))
+            # blank lines, which the csv reader skips
+            cursor.execute("DELETE FROM books_import WHERE raw_isbn = '' AND raw_title IS NULL")
+            cursor.execute(STAGING_CHECK, (today, today, now, now, today, now))
+            cursor.execute('SELECT Line, error FROM books_import WHERE error IS NOT NULL ORDER BY Line')
+            errors.extend((line + header, error) for line, error in cursor.fetchall())
+            cursor.execute('SELECT COUNT(*) FROM books_import WHERE error IS NULL')
+            rows = cursor.fetchone()[0]
+            if cancelled():
+                return rows, 0
+            cursor.execute(STAGING_COPY + IMPORT_MODES[mode], (today, now))
+            written = cursor.rowcount
+            if cancelled():
+                conn.rollback()
+                return rows, 0
+            conn.commit()
+            return rows, written
+        finally:
+            conn.close()  # drops the staging table
+
+    def estimate_rows(self):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='books'")
+            return (cursor.fetchone() or (0,))[0] or 0
+
+    def iter_rows(self, chunk_size):
+        # SSCursor leaves the result set on the server and fetchmany pulls it
+        # chunk by chunk, so memory stays flat however big the table is
+        conn = pymysql.connect(**self.config)
+        try:
+            cursor = perf.traced(conn.cursor(pymysql.cursors.SSCursor))
+            cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            # closing the connection (not the cursor) skips draining unread rows
+            conn.close()
+
+    def close(self):
+        self.pool.close()
+
+BACKEND_CALLS = ['page', 'version', 'changes', 'search', 'suggest', 'insert', 'update', 'delete',
+                 'update_many', 'delete_ranges', 'update_ranges', 'insert_batch', 'load_file', 'estimate_rows']
+perf.instrument(MySQLBackend, BACKEND_CALLS, 'db')
@@ -0,0 +1,363 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import perf
+from fuzzy import TermIndex
+from library_db import (BACKEND_CALLS, BOOK_COLUMNS, CHANGE_MARGIN, FT_WORD, ISBN_FORM_SQL, ISBN_LIKE,
+                        SUGGESTIONS, TERMS_PER_WORD, TOMBSTONE_DAYS, DuplicateISBN, StaleRange, chunked, escape_like,
+                        fold, near_isbns, placeholders, plain_words, rank_isbns, rank_words, running)
+
+# -----------------------------
+# SQLite backend
+# -----------------------------
+# Same interface and schema as MySQLBackend, in a local file: no server and
+# no network round-trip. Each worker thread keeps its own connection (WAL
+# lets readers run alongside the one writer), and sqlite3 keeps a per
+# connection cache of prepared statements, so repeated queries skip parsing.
+#
+# MySQL's ON UPDATE CURRENT_TIMESTAMP, delete trigger and FULLTEXT index
+# are triggers here: they keep Last_Modified, books_deleted and the FTS5
+# table books_fts (external content over books) in step with every write.
+# books_vocab lists the FTS terms, which suggest() corrects words against.
+
+NOW = "((julianday('now') - 2440587.5) * 86400.0)"  # unix time with milliseconds
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS books (
+    ISBN TEXT PRIMARY KEY,
+    Title TEXT NOT NULL,
+    Author TEXT,
+    Year INTEGER,
+    Added_Date TEXT,
+    Added_Time TEXT,
+    Last_Modified REAL NOT NULL DEFAULT {NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_title ON books (Title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_author ON books (Author COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_year ON books (Year);
+CREATE INDEX IF NOT EXISTS idx_last_modified ON books (Last_Modified);
+CREATE INDEX IF NOT EXISTS idx_isbn_key ON books ({ISBN_FORM_SQL});
+
+CREATE TABLE IF NOT EXISTS books_deleted (
+    ISBN TEXT PRIMARY KEY,
+    Deleted_At REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_at ON books_deleted (Deleted_At);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    Title, Author, content='books', content_rowid='rowid'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS books_vocab USING fts5vocab(books_fts, 'row');
+
+CREATE TRIGGER IF NOT EXISTS books_after_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts (rowid, Title, Author) VALUES (new.rowid, new.Title, new.Author);
+END;
+CREATE TRIGGER IF NOT EXISTS books_after_update AFTER UPDATE OF ISBN, Title, Author, Year ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, Title, Author) VALUES ('delete', old.rowid, old.Title, old.Author);
+    INSERT INTO books_fts (rowid, Title, Author) VALUES (new.rowid, new.Title, new.Author);
+    UPDATE books SET Last_Modified = {NOW} WHERE rowid = new.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS books_track_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, Title, Author) VALUES ('delete', old.rowid, old.Title, old.Author);
+    INSERT INTO books_deleted (ISBN, Deleted_At) VALUES (old.ISBN, {NOW})
+    ON CONFLICT (ISBN) DO UPDATE SET Deleted_At = excluded.Deleted_At;
+END;
+"""
+
+SUGGEST_SCAN = 5000  # FTS matches scored per suggestion
+VOCAB_PATCH = 500  # changed rows, and words, up to which the cached vocabulary is patched rather than reread
+
+IMPORT_MODES = {
+    'skip': 'ON CONFLICT (ISBN) DO NOTHING',
+    'upsert': 'ON CONFLICT (ISBN) DO UPDATE SET Title=excluded.Title, Author=excluded.Author, Year=excluded.Year',
+    'report': 'ON CONFLICT (ISBN) DO NOTHING',
+}
+
+class SQLiteBackend:
+    name = 'SQLite'
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.change_tracking = True
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._vocabulary = None  # [version, TermIndex, term -> books, stale]
+        self._vocabulary_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=256,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # durable at each checkpoint; safe with WAL
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def cursor(self):
+        # commit on success, roll back on error, like ConnectionPool.connection
+        conn = self._connection()
+        with conn:
+            cursor = conn.cursor()
+            try:
+                yield perf.traced(cursor)
+            finally:
+                cursor.close()
+
+    def create_schema(self):
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute(f'DELETE FROM books_deleted WHERE Deleted_At < {NOW} - ?', (TOMBSTONE_DAYS * 86400,))
+
+    def page(self, after, limit):
+        with self.cursor() as cursor:
+            if after is None:
+                cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY ISBN LIMIT ?', (limit,))
+            else:
+                cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE ISBN > ? ORDER BY ISBN LIMIT ?',
+                               (after, limit))
+            return cursor.fetchall()
+
+    def version(self):
+        with self.cursor() as cursor:
+            cursor.execute('SELECT (SELECT MAX(Last_Modified) FROM books), '
+                           '(SELECT MAX(Deleted_At) FROM books_deleted)')
+            return cursor.fetchone()
+
+    def changes(self, since, upto=None):
+        modified, deleted = since
+        if modified is None or modified < time.time() - (TOMBSTONE_DAYS - 1) * 86400:
+            return None
+        bound = ' AND ISBN <= ?' if upto is not None else ''
+        extra = (upto,) if upto is not None else ()
+        with self.cursor() as cursor:
+            # without ANALYZE statistics SQLite would rather walk the whole
+            # primary key for the ORDER BY than sort a few recent rows
+            cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books INDEXED BY idx_last_modified '
+                           f'WHERE Last_Modified >= ?{bound} ORDER BY ISBN', (modified - CHANGE_MARGIN,) + extra)
+            rows = cursor.fetchall()
+            cursor.execute(f'SELECT ISBN FROM books_deleted WHERE Deleted_At >= ?{bound}',
+                           ((deleted or 0) - CHANGE_MARGIN,) + extra)
+            return rows, [isbn for (isbn,) in cursor.fetchall()]
+
+    def search(self, key, ticket=None):
+        # the same access paths as plan_search, as one OR that SQLite
+        # answers index by index
+        conditions, params = ['ISBN = ?'], [key]
+        words = FT_WORD.findall(key)
+        if ISBN_LIKE.fullmatch(key):
+            pass  # primary key lookup only
+        elif words:
+            conditions.append('rowid IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?)')
+            params.append(' '.join(f'"{word}"*' for word in words))
+        else:
+            pattern = escape_like(key) + '%'
+            conditions.append("Title LIKE ? ESCAPE '\\'")
+            conditions.append("Author LIKE ? ESCAPE '\\'")
+            params += [pattern, pattern]
+        if key.isdigit() and len(key) <= 4:
+            conditions.append('Year = ?')
+            params.append(int(key))
+        with self.cursor() as cursor, running(ticket, self._connection()):
+            cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE {" OR ".join(conditions)} ORDER BY ISBN',
+                           params)
+            return cursor.fetchall()
+
+    def search_words(self, key):
+        return plain_words(key)  # FTS5 needs every word, however short
+
+    def suggest(self, key, limit=SUGGESTIONS):
+        scores = near_isbns(key)
+        if scores is not None:
+            rows = []
+            with self.cursor() as cursor:
+                for chunk in chunked(list(scores)):
+                    cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books '
+                                   f'WHERE {ISBN_FORM_SQL} IN ({placeholders(chunk, "?")})', chunk)
+                    rows.extend(cursor.fetchall())
+            return rank_isbns(rows, scores, limit)
+        corrected = []
+        with self._vocabulary_lock:
+            self._refresh_terms()
+            for word in {fold(word) for word in FT_WORD.findall(key)}:
+                near = self._near_terms(word)
+                if not near:
+                    return []
+                corrected.append(near)
+        if not corrected:
+            return []
+        match = ' AND '.join('(' + ' OR '.join(f'"{term}"' for term, _ in near) + ')' for near in corrected)
+        with self.cursor() as cursor:
+            cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE rowid IN '
+                           '(SELECT rowid FROM books_fts WHERE books_fts MATCH ? LIMIT ?)', (match, SUGGEST_SCAN))
+            return rank_words(cursor.fetchall(), corrected, limit)
+
+    # The FTS vocabulary is cached as a TermIndex plus each term's book
+    # count, read in full once. After a write, the words of the rows
+    # changes() returns are looked up in books_vocab and added or recounted.
+    # Words that only a deleted or overwritten row had can't be listed that
+    # way, so from then on the vocabulary is stale: _near_terms() checks the
+    # terms it picks and drops those that are gone. A large change (or one
+    # older than the tombstones) rereads the whole vocabulary instead.
+    # Callers hold _vocabulary_lock.
+    def _refresh_terms(self):
+        version = self.version()
+        cached = self._vocabulary
+        if cached is not None and cached[0] != version:
+            delta = self.changes(cached[0])
+            words = None
+            if delta is not None and len(delta[0]) <= VOCAB_PATCH:
+                words = {fold(word) for row in delta[0] for word in FT_WORD.findall(f'{row[1]} {row[2] or ""}')}
+            if words is None or len(words) > VOCAB_PATCH:
+                cached = None
+            else:
+                counts = self._count_terms(words)
+                cached[1].add_many(counts)
+                cached[2].update(counts)
+                cached[0], cached[3] = version, True
+        if cached is None:
+            with self.cursor() as cursor:
+                cursor.execute('SELECT term, doc FROM books_vocab')
+                frequency = dict(cursor.fetchall())
+            self._vocabulary = [version, TermIndex(frequency), frequency, False]
+
+    def _count_terms(self, terms):
+        # {term: books} for those of terms still in the vocabulary
+        counts = {}
+        with self.cursor() as cursor:
+            for chunk in chunked(list(terms)):
+                cursor.execute(f'SELECT term, doc FROM books_vocab WHERE term IN ({placeholders(chunk, "?")})',
+                               chunk)
+                counts.update(cursor.fetchall())
+        return counts
+
+    def _near_terms(self, word):
+        _, terms, frequency, stale = self._vocabulary
+        near = terms.similar(word, TERMS_PER_WORD, frequency.get)
+        while stale and near:
+            counts = self._count_terms(term for term, _ in near)
+            gone = [term for term, _ in near if term not in counts]
+            frequency.update(counts)
+            if not gone:
+                break
+            for term in gone:
+                terms.remove(term)
+                del frequency[term]
+            near = terms.similar(word, TERMS_PER_WORD, frequency.get)
+        return near
+
+    def cancel(self, ticket):
+        with ticket.lock:
+            ticket.cancelled = True
+            if ticket.handle is not None:
+                ticket.handle.interrupt()
+
+    def insert(self, row):
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(f'INSERT INTO books ({BOOK_COLUMNS}) VALUES ({placeholders(row, "?")})', row)
+        except sqlite3.IntegrityError:
+            raise DuplicateISBN(row[0])
+
+    def update(self, isbn, title, author, year):
+        with self.cursor() as cursor:
+            cursor.execute('UPDATE books SET Title=?, Author=?, Year=? WHERE ISBN=?',
+                           (title, author, year, isbn))
+
+    def delete(self, isbns):
+        deleted = 0
+        with self.cursor() as cursor:
+            for chunk in chunked(isbns):
+                cursor.execute(f'DELETE FROM books WHERE ISBN IN ({placeholders(chunk, "?")})', chunk)
+                deleted += cursor.rowcount
+        return deleted
+
+    def update_many(self, isbns, fields):
+        assignments = ', '.join(f'{name}=?' for name in fields)
+        values = tuple(fields.values())
+        with self.cursor() as cursor:
+            for chunk in chunked(isbns):
+                cursor.execute(f'UPDATE books SET {assignments} WHERE ISBN IN ({placeholders(chunk, "?")})',
+                               values + tuple(chunk))
+
+    # The write transaction only begins at the first DML statement, so a
+    # count taken before it could be stale: each range is changed first and
+    # its rowcount checked inside the transaction.
+    def _change_ranges(self, statement, values, ranges):
+        try:
+            with self.cursor() as cursor:
+                for first, last, rows in ranges:
+                    cursor.execute(statement, values + (first, last))
+                    if cursor.rowcount != rows:
+                        raise StaleRange(first, last)
+        except StaleRange:
+            return None
+        return sum(rows for _, _, rows in ranges)
+
+    def delete_ranges(self, ranges):
+        return self._change_ranges('DELETE FROM books WHERE ISBN BETWEEN ? AND ?', (), ranges)
+
+    def update_ranges(self, ranges, fields):
+        assignments = ', '.join(f'{name}=?' for name in fields)
+        return self._change_ranges(f'UPDATE books SET {assignments} WHERE ISBN BETWEEN ? AND ?',
+                                   tuple(fields.values()), ranges)
+
+    def insert_batch(self, rows, mode, duplicates):
+        with self.cursor() as cursor:
+            if mode == 'report':
+                isbns = list({row[0] for row in rows})
+                existing = set()
+                for chunk in chunked(isbns):
+                    cursor.execute(f'SELECT ISBN FROM books WHERE ISBN IN ({placeholders(chunk, "?")})', chunk)
+                    existing.update(isbn for (isbn,) in cursor.fetchall())
+                fresh = []
+                for row in rows:
+                    if row[0] in existing:
+                        duplicates.append(row[0])
+                    else:
+                        existing.add(row[0])
+                        fresh.append(row)
+                rows = fresh
+            if not rows:
+                return 0
+            cursor.executemany(f'INSERT INTO books ({BOOK_COLUMNS}) VALUES ({placeholders(rows[0], "?")}) '
+                               + IMPORT_MODES[mode], rows)
+            return cursor.rowcount
+
+    def load_file(self, path, mode, header, cancelled, errors):
+        return None  # batched inserts in one local transaction are already fast
+
+    def estimate_rows(self):
+        with self.cursor() as cursor:
+            cursor.execute('SELECT MAX(rowid) FROM books')
+            return cursor.fetchone()[0] or 0
+
+    def iter_rows(self, chunk_size):
+        # a WAL reader sees one snapshot for the whole export
+        conn = self._connection()
+        cursor = perf.traced(conn.cursor())
+        cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books')
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+perf.instrument(SQLiteBackend, BACKEND_CALLS, 'db')
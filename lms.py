@@ -1,93 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+from virtualview import VirtualTreeview
+from lms_core import (DATA_DIR, Book, CatalogStore, ConcurrentHashTable, ImportReport, export_books,
+                      import_books)
+import perfview
+import threading
 import time
-import csv
-
-# -----------------------------
-# DSA Core: Hash Table + Merge Sort
-# -----------------------------
-
-class Book:
-    def __init__(self, isbn, title, author, year):
-        self.isbn = isbn
-        self.title = title
-        self.author = author
-        self.year = year
-
-class HashTable:
-    def __init__(self, size=20):
-        self.size = size
-        self.table = [[] for _ in range(size)]
-
-    def hash_function(self, isbn):
-        return sum(ord(c) for c in isbn) % self.size
-
-    def insert(self, book):
-        index = self.hash_function(book.isbn)
-        for b in self.table[index]:
-            if b.isbn == book.isbn:
-                return False  # duplicate
-        self.table[index].append(book)
-        return True
-
-    def search(self, isbn):
-        index = self.hash_function(isbn)
-        for book in self.table[index]:
-            if book.isbn == isbn:
-                return book
-        return None
-
-    def delete(self, isbn):
-        index = self.hash_function(isbn)
-        for book in self.table[index]:
-            if book.isbn == isbn:
-                self.table[index].remove(book)
-                return True
-        return False
-
-    def update(self, isbn, title, author, year):
-        book = self.search(isbn)
-        if book:
-            book.title = title
-            book.author = author
-            book.year = year
-            return True
-        return False
-
-    def get_all_books(self):
-        books = []
-        for chain in self.table:
-            books.extend(chain)
-        return books
-
-# Merge sort (by title)
-def merge_sort(books):
-    if len(books) <= 1:
-        return books
-    mid = len(books) // 2
-    left = merge_sort(books[:mid])
-    right = merge_sort(books[mid:])
-    return merge(left, right)
-
-def merge(left, right):
-    result = []
-    i = j = 0
-    while i < len(left) and j < len(right):
-        if left[i].title.lower() < right[j].title.lower():
-            result.append(left[i])
-            i += 1
-        else:
-            result.append(right[j])
-            j += 1
-    result.extend(left[i:])
-    result.extend(right[j:])
-    return result
 
 # -----------------------------
 # Main Application GUI
 # -----------------------------
 
-hash_table = HashTable()
+# concurrent: exports run on a worker thread while the window stays usable
+hash_table = ConcurrentHashTable()
+catalog_store = CatalogStore(DATA_DIR)
+catalog_store.load(hash_table)
 
 root = tk.Tk()
 root.title("Library Management System (DSA Based)")
@@ -159,7 +86,7 @@ def open_add_window():
         if hash_table.insert(book):
             messagebox.showinfo("Success", "Book added successfully.")
             win.destroy()
-            display_books()
+            show_inserted(book)
         else:
             messagebox.showerror("Error", "Book with this ISBN already exists.")
 
@@ -170,19 +97,34 @@ def open_search_window():
     win.title("Search Book")
     win.geometry("400x200")
 
-    tk.Label(win, text="Enter ISBN:").pack(pady=5)
+    tk.Label(win, text="Enter ISBN or keywords (title/author):").pack(pady=5)
     isbn_entry = tk.Entry(win, width=40)
     isbn_entry.pack()
 
     def search_action():
         isbn = isbn_entry.get().strip()
         if not isbn:
-            messagebox.showwarning("Warning", "Enter ISBN to search.")
+            messagebox.showwarning("Warning", "Enter ISBN or keywords to search.")
             return
         book = hash_table.search(isbn)
         if book:
             messagebox.showinfo("Book Found",
                                 f"ISBN: {book.isbn}\nTitle: {book.title}\nAuthor: {book.author}\nYear: {book.year}")
+            return
+        if not search_index_ready.is_set():
+            messagebox.showinfo("Please Wait", "The keyword index is still being built. Try again in a moment.")
+            return
+        books = hash_table.search_text(isbn)
+        if books:
+            book_view.set_source([(b.isbn, b.title, b.author, b.year) for b in books])
+            win.destroy()
+            return
+        # a typo: show the nearest books instead
+        matches = hash_table.search_fuzzy(isbn)
+        if matches:
+            book_view.set_source([(b.isbn, b.title, b.author, b.year) for b, _ in matches])
+            win.destroy()
+            messagebox.showinfo("No Exact Match", f"Book not found. Showing the {len(matches)} closest matches.")
         else:
             messagebox.showerror("Not Found", "Book not found.")
 
@@ -248,10 +190,11 @@ def open_update_window():
             messagebox.showerror("Error", "Year must be a number.")
             return
 
+        old_position = title_position(isbn)
         if hash_table.update(isbn, title, author, year):
             messagebox.showinfo("Success", "Book updated successfully.")
             win.destroy()
-            display_books()
+            show_updated(old_position, isbn)
         else:
             messagebox.showerror("Error", "Book not found.")
 
@@ -273,26 +216,65 @@ def open_delete_window():
             messagebox.showwarning("Warning", "Enter ISBN to delete.")
             return
 
+        position = title_position(isbn)
         if hash_table.delete(isbn):
             messagebox.showinfo("Success", "Book deleted successfully.")
             win.destroy()
-            display_books()
+            show_deleted(position, isbn)
         else:
             messagebox.showerror("Error", "Book not found.")
 
     tk.Button(win, text="Delete Book", bg="#d9534f", fg="white", command=delete_action).pack(pady=10)
 
+class CatalogRows:
+    # The whole catalog in title order, sliced on demand by book_view. The
+    # title index is already sorted, so no merge_sort pass is needed and
+    # only the rows on screen are ever looked up.
+    def __len__(self):
+        return len(hash_table)
+
+    def __getitem__(self, index):
+        return [(b.isbn, b.title, b.author, b.year)
+                for b in hash_table.books_by_title(index.start, index.stop)]
+
+catalog_rows = CatalogRows()
+
 def display_books():
-    for row in book_table.get_children():
-        book_table.delete(row)
-    all_books = hash_table.get_all_books()
-    sorted_books = merge_sort(all_books)
-    for b in sorted_books:
-        book_table.insert("", tk.END, values=(b.isbn, b.title, b.author, b.year))
+    book_view.set_source(catalog_rows)
+
+# After a single edit only the changed row is applied to the view, at its
+# place in title order. If the view is showing search results instead of
+# the catalog, it falls back to a full display_books().
+def book_row(book):
+    return (book.isbn, book.title, book.author, book.year)
+
+def title_position(isbn):
+    book = hash_table.search(isbn)
+    if book is None:
+        return -1
+    return hash_table.title_index.position(book)
+
+def show_inserted(book):
+    if book_view.source is not catalog_rows:
+        display_books()
+        return
+    book_view.insert_row(hash_table.title_index.position(book), book_row(book))
+
+def show_updated(old_position, isbn):
+    if book_view.source is not catalog_rows:
+        display_books()
+        return
+    book = hash_table.search(isbn)
+    book_view.move_row(old_position, hash_table.title_index.position(book), book_row(book))
+
+def show_deleted(position, isbn):
+    if book_view.source is not catalog_rows:
+        display_books()
+        return
+    book_view.delete_row(position, isbn)
 
 def export_data():
-    books = hash_table.get_all_books()
-    if not books:
+    if not len(hash_table):
         messagebox.showerror("Error", "No data to export.")
         return
 
@@ -300,12 +282,113 @@ def export_data():
     if not file_path:
         return
 
-    with open(file_path, mode="w", newline='', encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["ISBN", "Title", "Author", "Year"])
-        for book in books:
-            writer.writerow([book.isbn, book.title, book.author, book.year])
-    messagebox.showinfo("Success", "Data exported successfully!")
+    # the catalog as of now; edits made while the file is written don't reach it
+    books = hash_table.get_all_books()
+    failed = []
+
+    def write():
+        try:
+            with open(file_path, mode="w", newline='', encoding="utf-8") as file:
+                export_books(books, file)
+        except OSError as e:
+            failed.append(e)
+
+    worker = threading.Thread(target=write, daemon=True)
+    worker.start()
+
+    def wait():
+        if worker.is_alive():
+            root.after(100, wait)
+        elif failed:
+            messagebox.showerror("Error", f"Export failed: {failed[0]}")
+        else:
+            messagebox.showinfo("Success", "Data exported successfully!")
+
+    wait()
+
+def import_data():
+    file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+    if not file_path:
+        return
+
+    win = tk.Toplevel(root)
+    win.title("Import Data")
+    win.geometry("400x120")
+    win.grab_set()  # the table's indexes are detached until the load ends
+    status_label = tk.Label(win, text="Reading...")
+    status_label.pack(pady=10)
+    progress = ttk.Progressbar(win, length=340, mode="determinate")
+    progress.pack()
+
+    report = ImportReport()
+    steps = import_books(hash_table, file_path, report)
+
+    def cancel():
+        steps.close()  # rebuilds the indexes for the rows loaded so far
+        finish()
+
+    win.protocol("WM_DELETE_WINDOW", cancel)
+
+    # one batch per Tk callback, so the window keeps repainting
+    def step():
+        try:
+            done, expected = next(steps)
+        except StopIteration:
+            finish()
+        except Exception as e:
+            steps.close()
+            win.destroy()
+            display_books()
+            messagebox.showerror("Error", f"Import failed: {e}")
+        else:
+            progress["value"] = 100 * done / max(expected, 1)
+            status_label.config(text=f"{done:,} of ~{expected:,} rows read")
+            root.after(1, step)
+
+    def finish():
+        win.destroy()
+        display_books()
+        messagebox.showinfo("Import Data", f"{report.added:,} books imported, "
+                                           f"{len(report.errors):,} rows rejected.")
+        if report.errors:
+            show_import_errors(report.errors)
+
+    root.after(1, step)
+
+def show_import_errors(errors, limit=1000):
+    win = tk.Toplevel(root)
+    win.title("Rejected Rows")
+    win.geometry("500x300")
+    text = tk.Text(win, wrap="none")
+    text.pack(fill="both", expand=True)
+    text.insert(tk.END, "".join(f"line {line}: {message}\n" for line, message in errors[:limit]))
+    if len(errors) > limit:
+        text.insert(tk.END, f"... and {len(errors) - limit:,} more\n")
+    text.config(state="disabled")
+
+# Journal upkeep: fsync what the last second wrote, compact when it grows
+# The keyword and near-match indexes take seconds to build over a large
+# catalog, so they are built on a worker once the window is up instead of
+# before it appears. Until then keyword searches say so rather than wait.
+search_index_ready = threading.Event()
+
+def build_search_index():
+    def build():
+        hash_table.enable_fuzzy_index()
+        search_index_ready.set()
+    threading.Thread(target=build, daemon=True).start()
+
+def sync_catalog():
+    catalog_store.sync()
+    root.after(int(catalog_store.fsync_interval * 1000), sync_catalog)
+
+def compact_catalog():
+    catalog_store.maybe_compact(hash_table)
+    root.after(60000, compact_catalog)
+
+def exit_app():
+    catalog_store.close(hash_table)
+    root.destroy()
 
 # Left-side buttons
 buttons = [
@@ -314,8 +397,9 @@ buttons = [
     ("Delete Book", open_delete_window, "#d9534f"),
     ("Search Book", open_search_window, "#0275d8"),
     ("Show All", display_books, "#764ef0"),
+    ("Import Data", import_data, "#20c997"),
     ("Export Data", export_data, "#17a2b8"),
-    ("Exit", root.destroy, "#6c757d")
+    ("Exit", exit_app, "#6c757d")
 ]
 
 for text, cmd, color in buttons:
@@ -333,6 +417,15 @@ book_table = ttk.Treeview(right_frame, columns=cols, show="headings")
 for col in cols:
     book_table.heading(col, text=col)
     book_table.column(col, width=180, anchor='center')
+book_scrollbar = ttk.Scrollbar(right_frame, orient="vertical")
+book_scrollbar.pack(side="right", fill="y", pady=10)
 book_table.pack(fill="both", expand=True, padx=10, pady=10)
-
+book_view = VirtualTreeview(book_table, book_scrollbar)
+display_books()
+
+root.protocol("WM_DELETE_WINDOW", exit_app)
+root.bind("<F12>", lambda event: perfview.show(root, hash_table.chain_stats))
+sync_catalog()
+compact_catalog()
+root.after(200, build_search_index)
 root.mainloop()
@@ -0,0 +1,1771 @@
+import time
+import csv
+import heapq
+import json
+import math
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, deque
+from contextlib import contextmanager
+from itertools import chain, islice
+from operator import attrgetter, itemgetter, methodcaller
+
+import perf
+from fuzzy import ISBN_ALPHABET, TermIndex, isbn_form, isbn_key, neighbours, score
+
+# -----------------------------
+# DSA Core: Hash Table + Merge Sort
+# -----------------------------
+# The catalog engine behind lms.py (the Tk app) and lms_cli.py (batch
+# jobs). Nothing here imports tkinter, so scripts can use it headless.
+
+class Book:
+    __slots__ = ("isbn", "title", "author", "year")
+
+    def __init__(self, isbn, title, author, year):
+        self.isbn = isbn
+        self.title = title
+        self.author = author
+        self.year = year
+
+class HashTable:
+    # Grow when the average chain gets longer than MAX_LOAD, shrink when the
+    # table is mostly empty. Resizes are spread over later operations
+    # (REHASH_STEP old buckets per call) so no single call pays for all of it.
+    MAX_LOAD = 1.0
+    MIN_LOAD = 0.25
+    REHASH_STEP = 8
+
+    def __init__(self, size=20):
+        # bucket count is kept a power of two so the hash can be masked;
+        # empty buckets stay None until something is inserted into them
+        self.size = self._bucket_count(size)
+        self.min_size = self.size
+        self.table = [None] * self.size
+        self.count = 0
+        self._old_table = None
+        self._old_size = 0
+        self._rehash_index = 0
+        # indexes are told about every change through add(book)/remove(book)
+        self.title_index = TitleIndex()
+        self.author_index = None
+        self.year_index = None
+        self.text_index = None
+        self.fuzzy_index = None
+        self.indexes = [self.title_index]
+
+    @staticmethod
+    def _bucket_count(size):
+        n = 8
+        while n < size:
+            n <<= 1
+        return n
+
+    def __len__(self):
+        return self.count
+
+    def hash_function(self, isbn):
+        # str hash is SipHash: permutations of the same digits spread out
+        return hash(isbn) & (self.size - 1)
+
+    def _locate(self, isbn):
+        h = hash(isbn)
+        chain = self.table[h & (self.size - 1)]
+        if chain:
+            for i, book in enumerate(chain):
+                if book.isbn == isbn:
+                    return chain, i
+        if self._old_table is not None:
+            index = h & (self._old_size - 1)
+            chain = self._old_table[index] if index >= self._rehash_index else None
+            if chain:
+                for i, book in enumerate(chain):
+                    if book.isbn == isbn:
+                        return chain, i
+        return None, -1
+
+    def _rehash_step(self, steps=REHASH_STEP):
+        old = self._old_table
+        if old is None:
+            return
+        table = self.table
+        mask = self.size - 1
+        end = min(self._rehash_index + steps, self._old_size)
+        for index in range(self._rehash_index, end):
+            chain = old[index]
+            if chain:
+                for book in chain:
+                    i = hash(book.isbn) & mask
+                    if table[i] is None:
+                        table[i] = [book]
+                    else:
+                        table[i].append(book)
+                old[index] = None
+        self._rehash_index = end
+        if end == self._old_size:
+            self._old_table = None
+            self._old_size = 0
+            self._rehash_index = 0
+
+    def _resize(self, new_size):
+        if self._old_table is not None:
+            self._rehash_step(self._old_size)
+        self._old_table = self.table
+        self._old_size = self.size
+        self._rehash_index = 0
+        self.size = new_size
+        self.table = [None] * new_size
+
+    def insert_many(self, books):
+        with self.bulk_load() as add:
+            return add(list(books))
+
+    @contextmanager
+    def bulk_load(self):
+        # For loads of many books, possibly in several batches: yields
+        # add(books), which skips duplicates and returns the books it added.
+        # The indexes are detached meanwhile and each is built once at the
+        # end, even if the load is abandoned part way.
+        indexes, self.indexes = self.indexes, []
+        added = []
+
+        def add(books):
+            self.reserve(len(self) + len(books))
+            new = []
+            self._add_all(books, new)
+            added.extend(new)
+            return new
+
+        try:
+            yield add
+        finally:
+            self.attach_indexes(indexes, added)
+
+    def attach_indexes(self, indexes, added):
+        # put back indexes detached for a bulk load, with the books it added
+        self.indexes = indexes
+        for index in indexes:
+            index.add_many(added)
+
+    def _add_all(self, books, added):
+        # table is already big enough: finish any rehash, then append to the
+        # chains directly instead of paying for insert() per book
+        self._rehash_step(self._old_size)
+        table = self.table
+        mask = self.size - 1
+        for book in books:
+            isbn = book.isbn
+            i = hash(isbn) & mask
+            chain = table[i]
+            if chain is None:
+                table[i] = [book]
+            elif any(other.isbn == isbn for other in chain):
+                continue  # duplicate
+            else:
+                chain.append(book)
+            added.append(book)
+            self.count += 1
+
+    def reserve(self, count):
+        # pre-size for count entries so a bulk load never has to grow
+        size = self._bucket_count(count / self.MAX_LOAD)
+        if size > self.size:
+            self._resize(size)
+            self._rehash_step(self._old_size)
+
+    def _shrunk_size(self):
+        # the size a shrink goes to: count at half MAX_LOAD, however far
+        # below MIN_LOAD it has fallen, so one resize is enough
+        return max(self.min_size, self._bucket_count(2 * self.count / self.MAX_LOAD))
+
+    def _check_load(self, deleted=False):
+        # Inserts only grow the table and deletes only shrink it, so the
+        # inserts after a reserve() don't undo it. Either may start
+        # mid-rehash (_resize finishes the running one first): deletes can
+        # empty the table faster than a rehash moves it.
+        if deleted:
+            if self.size > self.min_size and self.count < self.size * self.MIN_LOAD:
+                self._resize(self._shrunk_size())
+        elif self.count > self.size * self.MAX_LOAD:
+            self._resize(self.size * 2)
+
+    def insert(self, book):
+        self._rehash_step()
+        if self._locate(book.isbn)[0] is not None:
+            return False  # duplicate
+        index = self.hash_function(book.isbn)
+        if self.table[index] is None:
+            self.table[index] = [book]
+        else:
+            self.table[index].append(book)
+        self.count += 1
+        for index in self.indexes:
+            index.add(book)
+        self._check_load()
+        return True
+
+    def search(self, isbn):
+        self._rehash_step()
+        chain, i = self._locate(isbn)
+        if chain is None:
+            return None
+        return chain[i]
+
+    def delete(self, isbn):
+        self._rehash_step()
+        chain, i = self._locate(isbn)
+        if chain is None:
+            return False
+        book = chain.pop(i)
+        self.count -= 1
+        for index in self.indexes:
+            index.remove(book)
+        self._check_load(deleted=True)
+        return True
+
+    def update(self, isbn, title, author, year):
+        book = self.search(isbn)
+        if book:
+            for index in self.indexes:
+                index.remove(book)
+            book.title = title
+            book.author = author
+            book.year = year
+            for index in self.indexes:
+                index.add(book)
+            return True
+        return False
+
+    def books_by_title(self, start=0, stop=None):
+        for isbn in self.title_index.islice(start, stop):
+            yield self.search(isbn)
+
+    def enable_secondary_indexes(self):
+        if self.author_index is not None:
+            return
+        self.author_index = AuthorIndex()
+        self.year_index = YearIndex()
+        books = self.get_all_books()
+        self.author_index.add_many(books)
+        self.year_index.add_many(books)
+        self.indexes += [self.author_index, self.year_index]
+
+    def enable_text_index(self):
+        if self.text_index is not None:
+            return
+        self.text_index = TextIndex()
+        self.text_index.add_many(self.get_all_books())
+        self.indexes.append(self.text_index)
+
+    def search_text(self, text, limit=None):
+        self.enable_text_index()
+        books = []
+        for isbn in self.text_index.search(text, limit):
+            book = self.search(isbn)
+            if book is not None:
+                books.append(book)
+        return books
+
+    def enable_fuzzy_index(self):
+        if self.fuzzy_index is not None:
+            return
+        self.enable_text_index()
+        self.fuzzy_index = FuzzyIndex(self.text_index, self.get_all_books())
+        self.indexes.append(self.fuzzy_index)  # after text_index: see FuzzyIndex
+
+    def search_fuzzy(self, text, limit=10):
+        # the nearest books to a mistyped ISBN or title/author words, as
+        # [(book, score)] best first; score 1.0 is an exact match
+        self.enable_fuzzy_index()
+        key = isbn_key(text)
+        if key is not None:
+            matches = []
+            for near in chain([key], neighbours(key, ISBN_ALPHABET)):
+                s = score(0 if near == key else 1, near, key)
+                matches.append((near, s))
+                matches.extend((isbn, s) for isbn in self.fuzzy_index.isbns.get(near, ()))
+        else:
+            matches = self.fuzzy_index.search(text, limit)
+        found = []
+        for isbn, s in matches:
+            book = self.search(isbn)
+            if book is not None:
+                found.append((book, s))
+        return heapq.nsmallest(limit, found, key=lambda match: (-match[1], match[0].isbn))
+
+    def query(self, isbn=None, author=None, year_from=None, year_to=None, title_prefix=None):
+        # Each available index offers (estimated matches, candidate ISBNs);
+        # the smallest candidate set is walked and the other conditions are
+        # checked on the books it yields.
+        plans = []
+        if isbn is not None:
+            plans.append((1, lambda: [isbn]))
+        if author is not None and self.author_index is not None:
+            plans.append((self.author_index.count(author),
+                          lambda: self.author_index.get(author)))
+        has_years = year_from is not None or year_to is not None
+        if has_years and self.year_index is not None:
+            plans.append((self.year_index.count(year_from, year_to),
+                          lambda: self.year_index.between(year_from, year_to)))
+        if title_prefix:
+            plans.append((self.title_index.count_prefix(title_prefix),
+                          lambda: self.title_index.prefix(title_prefix)))
+        if plans:
+            candidates = min(plans, key=lambda plan: plan[0])[1]()
+        else:
+            candidates = self.title_index
+
+        author_key = author.casefold() if author is not None else None
+        prefix_key = title_prefix.casefold() if title_prefix else None
+        results = []
+        for candidate in list(candidates):
+            book = self.search(candidate)
+            if book is None:
+                continue
+            if isbn is not None and book.isbn != isbn:
+                continue
+            if author_key is not None and book.author.casefold() != author_key:
+                continue
+            if year_from is not None and book.year < year_from:
+                continue
+            if year_to is not None and book.year > year_to:
+                continue
+            if prefix_key and not book.title.casefold().startswith(prefix_key):
+                continue
+            results.append(book)
+        return results
+
+    def _chains(self):
+        # every non-empty chain, including old buckets not yet migrated
+        chains = [chain for chain in self.table if chain]
+        if self._old_table is not None:
+            chains.extend(chain for chain in self._old_table[self._rehash_index:] if chain)
+        return chains
+
+    def get_all_books(self):
+        books = []
+        for chain in self._chains():
+            books.extend(chain)
+        return books
+
+    def chain_stats(self):
+        lengths = Counter(len(chain) for chain in self._chains())
+        used = sum(lengths.values())
+        buckets = self.size
+        if self._old_table is not None:
+            buckets += self._old_size - self._rehash_index
+        lengths[0] = buckets - used
+        return {
+            "size": self.size,
+            "count": self.count,
+            "load_factor": self.count / self.size,
+            "used_buckets": used,
+            "max_chain": max(lengths),
+            "avg_chain": self.count / used if used else 0.0,
+            "histogram": dict(sorted(lengths.items())),
+            "rehashing": self._old_table is not None,
+        }
+
+class BookStore:
+    # Column-per-field storage for a large catalog. A row id indexes every
+    # column and deleted rows are recycled. Authors repeat a lot, so they are
+    # interned, and years live in a C int array instead of int objects.
+    def __init__(self):
+        self.isbns = []
+        self.titles = []
+        self.authors = []
+        self.years = array("i")
+        self.free_rows = []
+
+    def __len__(self):
+        return len(self.isbns) - len(self.free_rows)
+
+    def add(self, book):
+        author = sys.intern(book.author)
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.isbns[row] = book.isbn
+            self.titles[row] = book.title
+            self.authors[row] = author
+            self.years[row] = book.year
+            return row
+        self.isbns.append(book.isbn)
+        self.titles.append(book.title)
+        self.authors.append(author)
+        self.years.append(book.year)
+        return len(self.isbns) - 1
+
+    def get(self, row):
+        return Book(self.isbns[row], self.titles[row], self.authors[row], self.years[row])
+
+    def set(self, row, title, author, year):
+        self.titles[row] = title
+        self.authors[row] = sys.intern(author)
+        self.years[row] = year
+
+    def remove(self, row):
+        self.isbns[row] = None
+        self.titles[row] = None
+        self.authors[row] = None
+        self.years[row] = 0
+        self.free_rows.append(row)
+
+class CompactHashTable(HashTable):
+    # Same operations as HashTable, for catalogs too big for one Python
+    # object per book. The table is a flat array of row ids into a BookStore
+    # (open addressing with linear probing), so there are no chain lists and
+    # no int objects per entry. search() and get_all_books() build Book
+    # copies on the way out, so edits must go through update().
+    MAX_LOAD = 0.5
+    MIN_LOAD = 0.125
+    EMPTY = -1
+    DELETED = -2
+
+    def __init__(self, size=20, store=None):
+        super().__init__(size)
+        self.table = self._new_slots(self.size)
+        self.tombstones = 0
+        self.store = store if store is not None else BookStore()
+
+    @staticmethod
+    def _new_slots(size):
+        return array("l", [CompactHashTable.EMPTY]) * size
+
+    def _probe(self, table, size, isbn):
+        isbns = self.store.isbns
+        mask = size - 1
+        i = hash(isbn) & mask
+        while True:
+            row = table[i]
+            if row == self.EMPTY:
+                return -1
+            if row >= 0 and isbns[row] == isbn:
+                return i
+            i = (i + 1) & mask
+
+    def _free_slot(self, isbn):
+        table = self.table
+        mask = self.size - 1
+        i = hash(isbn) & mask
+        while table[i] >= 0:
+            i = (i + 1) & mask
+        return i
+
+    def _locate(self, isbn):
+        slot = self._probe(self.table, self.size, isbn)
+        if slot >= 0:
+            return self.table, slot
+        if self._old_table is not None:
+            # migrated slots are tombstoned, so probing the old table still works
+            slot = self._probe(self._old_table, self._old_size, isbn)
+            if slot >= 0:
+                return self._old_table, slot
+        return None, -1
+
+    def _put(self, isbn, row):
+        slot = self._free_slot(isbn)
+        if self.table[slot] == self.DELETED:
+            self.tombstones -= 1
+        self.table[slot] = row
+
+    def _rehash_step(self, steps=HashTable.REHASH_STEP):
+        old = self._old_table
+        if old is None:
+            return
+        isbns = self.store.isbns
+        end = min(self._rehash_index + steps, self._old_size)
+        for index in range(self._rehash_index, end):
+            row = old[index]
+            if row >= 0:
+                self._put(isbns[row], row)
+                old[index] = self.DELETED
+        self._rehash_index = end
+        if end == self._old_size:
+            self._old_table = None
+            self._old_size = 0
+            self._rehash_index = 0
+
+    def _resize(self, new_size):
+        if self._old_table is not None:
+            self._rehash_step(self._old_size)
+        self._old_table = self.table
+        self._old_size = self.size
+        self._rehash_index = 0
+        self.size = new_size
+        self.table = self._new_slots(new_size)
+        self.tombstones = 0
+
+    def _check_load(self, deleted=False):
+        # as in HashTable; growing mid-rehash also keeps the new slot array
+        # from filling up, which open addressing can't survive
+        if deleted:
+            if self.size > self.min_size and self.count < self.size * self.MIN_LOAD:
+                self._resize(self._shrunk_size())
+        elif self.count + self.tombstones > self.size * self.MAX_LOAD:
+            # mostly tombstones: rebuild at the same size instead of growing
+            grow = self.count > self.size * self.MAX_LOAD / 2
+            self._resize(self.size * 2 if grow else self.size)
+
+    def _add_all(self, books, added):
+        for book in books:
+            if self.insert(book):
+                added.append(book)
+
+    def insert(self, book):
+        self._rehash_step()
+        if self._locate(book.isbn)[0] is not None:
+            return False  # duplicate
+        self._put(book.isbn, self.store.add(book))
+        self.count += 1
+        for index in self.indexes:
+            index.add(book)
+        self._check_load()
+        return True
+
+    def search(self, isbn):
+        self._rehash_step()
+        table, slot = self._locate(isbn)
+        if table is None:
+            return None
+        return self.store.get(table[slot])
+
+    def delete(self, isbn):
+        self._rehash_step()
+        table, slot = self._locate(isbn)
+        if table is None:
+            return False
+        row = table[slot]
+        if self.indexes:
+            book = self.store.get(row)
+            for index in self.indexes:
+                index.remove(book)
+        self.store.remove(row)
+        table[slot] = self.DELETED
+        if table is self.table:
+            self.tombstones += 1
+        self.count -= 1
+        self._check_load(deleted=True)
+        return True
+
+    def update(self, isbn, title, author, year):
+        self._rehash_step()
+        table, slot = self._locate(isbn)
+        if table is None:
+            return False
+        row = table[slot]
+        for index in self.indexes:
+            index.remove(self.store.get(row))
+        self.store.set(row, title, author, year)
+        for index in self.indexes:
+            index.add(self.store.get(row))
+        return True
+
+    def _rows(self):
+        rows = [row for row in self.table if row >= 0]
+        if self._old_table is not None:
+            rows.extend(row for row in self._old_table[self._rehash_index:] if row >= 0)
+        return rows
+
+    def get_all_books(self):
+        get = self.store.get
+        return [get(row) for row in self._rows()]
+
+    def chain_stats(self):
+        # with open addressing the "chain" of a key is its probe sequence:
+        # report how far each entry sits from its home slot
+        isbns = self.store.isbns
+        mask = self.size - 1
+        table = self.table
+        lengths = Counter()
+        for slot, row in enumerate(table):
+            if row >= 0:
+                lengths[((slot - hash(isbns[row])) & mask) + 1] += 1
+        probes = sum(n * count for n, count in lengths.items())
+        return {
+            "size": self.size,
+            "count": self.count,
+            "load_factor": self.count / self.size,
+            "tombstones": self.tombstones,
+            "max_probe": max(lengths, default=0),
+            "avg_probe": probes / sum(lengths.values()) if lengths else 0.0,
+            "histogram": dict(sorted(lengths.items())),
+            "rehashing": self._old_table is not None,
+        }
+
+class ConcurrentHashTable(HashTable):
+    # HashTable for several threads, e.g. an export or import on a worker
+    # while the GUI keeps searching and editing.
+    #
+    # Writers lock one of STRIPES stripes, picked by the low bits of the
+    # hash, so a bucket keeps its stripe through resizes. Readers take no
+    # lock at all. Chains are tuples that a write replaces whole (copy on
+    # write), and update() puts a new Book in place instead of editing the
+    # old one, so a reader sees a chain and its books from before a write
+    # or after it, never half way.
+    #
+    # Resizes are spread out as in HashTable. Starting one (under every
+    # stripe) only publishes an empty bucket array next to the old one;
+    # each write then moves REHASH_STEP old buckets across, each under its
+    # own stripe. The table never has fewer than STRIPES buckets, so a
+    # bucket's books move to buckets of the same stripe. A move adds the
+    # chain to the new array before clearing the old bucket, and readers
+    # look in the old bucket first, so a book is never missing from both.
+    # The two arrays are published as one tuple, and a lookup that misses
+    # while that tuple changed looks again. snapshot() copies the bucket
+    # arrays, C-level pointer copies, under every stripe: a consistent view
+    # to iterate at leisure while writers carry on.
+    #
+    # The indexes (title order, text, journal) are single shared
+    # structures: writers update them under index_lock while holding their
+    # stripe, so same-ISBN writes are ordered. Locks are always taken
+    # stripes first, then index_lock; rehash_lock guards the rehash cursor
+    # and is never held while waiting for a stripe. A bulk load holds every
+    # stripe and index_lock from start to end: other threads' writes wait
+    # for it, and the loading thread's own raise, since the indexes they
+    # would update are detached.
+    STRIPES = 64
+
+    def __init__(self, size=20):
+        super().__init__(max(size, self.STRIPES))
+        self.stripes = [threading.RLock() for _ in range(self.STRIPES)]
+        self.index_lock = threading.RLock()
+        self.rehash_lock = threading.Lock()
+        self._rehash_done = 0
+        self._buckets = (self.table, None)
+        self._loading = False
+
+    @contextmanager
+    def _all_stripes(self):
+        for lock in self.stripes:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self.stripes):
+                lock.release()
+
+    def _stripe(self, isbn):
+        return self.stripes[hash(isbn) & (self.STRIPES - 1)]
+
+    def _check_writable(self):
+        # the caller holds a stripe, so a running load is on this thread
+        if self._loading:
+            raise RuntimeError("the catalog is being bulk loaded")
+
+    @staticmethod
+    def _find_in(buckets, isbn):
+        # (bucket array, bucket index, chain, position in chain or -1); a
+        # miss points at the new array, where inserts go
+        table, old = buckets
+        h = hash(isbn)
+        if old is not None:
+            i = h & (len(old) - 1)
+            chain = old[i]
+            if chain:
+                for j, book in enumerate(chain):
+                    if book.isbn == isbn:
+                        return old, i, chain, j
+        i = h & (len(table) - 1)
+        chain = table[i]
+        if chain:
+            for j, book in enumerate(chain):
+                if book.isbn == isbn:
+                    return table, i, chain, j
+        return table, i, chain, -1
+
+    def _find(self, isbn):
+        # the caller holds the stripe, so the arrays can't be swapped meanwhile
+        return self._find_in(self._buckets, isbn)
+
+    def search(self, isbn):
+        while True:
+            buckets = self._buckets
+            _, _, chain, j = self._find_in(buckets, isbn)
+            if j >= 0:
+                return chain[j]
+            if self._buckets is buckets:
+                return None
+
+    def insert(self, book):
+        self._rehash_step()
+        with self._stripe(book.isbn):
+            self._check_writable()
+            table, i, chain, j = self._find(book.isbn)
+            if j >= 0:
+                return False  # duplicate
+            table[i] = chain + (book,) if chain else (book,)
+            with self.index_lock:
+                self.count += 1
+                for index in self.indexes:
+                    index.add(book)
+        self._check_load()
+        return True
+
+    def delete(self, isbn):
+        self._rehash_step()
+        with self._stripe(isbn):
+            self._check_writable()
+            table, i, chain, j = self._find(isbn)
+            if j < 0:
+                return False
+            table[i] = chain[:j] + chain[j + 1:] or None
+            with self.index_lock:
+                self.count -= 1
+                for index in self.indexes:
+                    index.remove(chain[j])
+        self._check_load(deleted=True)
+        return True
+
+    def update(self, isbn, title, author, year):
+        self._rehash_step()
+        with self._stripe(isbn):
+            self._check_writable()
+            table, i, chain, j = self._find(isbn)
+            if j < 0:
+                return False
+            book = Book(isbn, title, author, year)
+            table[i] = chain[:j] + (book,) + chain[j + 1:]
+            with self.index_lock:
+                for index in self.indexes:
+                    index.remove(chain[j])
+                for index in self.indexes:
+                    index.add(book)
+        return True
+
+    @contextmanager
+    def bulk_load(self):
+        with self._all_stripes(), self.index_lock:
+            self._check_writable()
+            self._loading = True
+            try:
+                with super().bulk_load() as add:
+                    yield add
+            finally:
+                self._loading = False
+
+    def _add_all(self, books, added):
+        # every stripe is held and no rehash is running
+        table = self.table
+        mask = len(table) - 1
+        for book in books:
+            i = hash(book.isbn) & mask
+            chain = table[i]
+            if chain is None:
+                table[i] = (book,)
+            elif any(other.isbn == book.isbn for other in chain):
+                continue  # duplicate
+            else:
+                table[i] = chain + (book,)
+            added.append(book)
+        with self.index_lock:
+            self.count += len(added)
+
+    def reserve(self, count):
+        with self._all_stripes():
+            self._grow(count)
+            self._finish_rehash()
+
+    def _grow(self, count):
+        size = self._bucket_count(count / self.MAX_LOAD)
+        if size > self.size:
+            self._resize(size)
+
+    def _load_size(self, deleted):
+        # the size the count calls for, or the current one; as in
+        # HashTable, only a delete shrinks
+        if deleted:
+            if self.size > self.min_size and self.count < self.size * self.MIN_LOAD:
+                return self._shrunk_size()
+        elif self.count > self.size * self.MAX_LOAD:
+            return self.size * 2
+        return self.size
+
+    def _check_load(self, deleted=False):
+        if self._load_size(deleted) != self.size:
+            with self._all_stripes():
+                size = self._load_size(deleted)  # again: another writer may have resized meanwhile
+                if size != self.size:
+                    self._resize(size)
+
+    def _publish(self, table, old):
+        self.table = table
+        self.size = len(table)
+        self._old_table = old
+        self._old_size = len(old) if old is not None else 0
+        self._buckets = (table, old)
+
+    @staticmethod
+    def _move(table, old, index):
+        # the caller holds the bucket's stripe
+        chain = old[index]
+        if chain:
+            mask = len(table) - 1
+            for book in chain:
+                i = hash(book.isbn) & mask
+                table[i] = table[i] + (book,) if table[i] else (book,)
+            old[index] = None
+
+    def _resize(self, new_size):
+        # every stripe is held: finish the running rehash, then leave the
+        # buckets for later writes to move
+        self._finish_rehash()
+        with self.rehash_lock:
+            self._rehash_index = self._rehash_done = 0
+            self._publish([None] * new_size, self.table)
+
+    def _finish_rehash(self):
+        # every stripe is held, so no move is half done; buckets claimed by
+        # a _rehash_step still waiting for its stripe are moved here too
+        with self.rehash_lock:
+            table, old = self._buckets
+            if old is not None:
+                for index in range(len(old)):
+                    self._move(table, old, index)
+                self._publish(table, None)
+
+    def _rehash_step(self, steps=HashTable.REHASH_STEP):
+        # Claim the next old buckets, then move them under their stripe. The
+        # cursor walks the buckets stripe by stripe (s, s + STRIPES, ...), so
+        # a step takes one lock.
+        if self._buckets[1] is None:
+            return
+        with self.rehash_lock:
+            buckets = self._buckets
+            table, old = buckets
+            if old is None or self._rehash_index == len(old):
+                return
+            per_stripe = len(old) // self.STRIPES
+            start = self._rehash_index
+            stripe, offset = divmod(start, per_stripe)
+            end = self._rehash_index = min(start + steps, (stripe + 1) * per_stripe)
+        with self.stripes[stripe]:
+            for index in range(stripe + offset * self.STRIPES, stripe + (offset + end - start) * self.STRIPES,
+                               self.STRIPES):
+                self._move(table, old, index)
+        with self.rehash_lock:
+            if self._buckets is buckets:  # else a resize finished it meanwhile
+                self._rehash_done += end - start
+                if self._rehash_done == len(old):
+                    self._publish(table, None)
+
+    def snapshot(self):
+        # the buckets as of now: a list of chain tuples (or None), including
+        # old buckets not yet moved
+        with self._all_stripes():
+            table, old = self._buckets
+            return list(table) + list(old) if old is not None else list(table)
+
+    def _chains(self):
+        return [chain for chain in self.snapshot() if chain]
+
+    def get_all_books(self):
+        return list(chain.from_iterable(self._chains()))
+
+    def books_by_title(self, start=0, stop=None):
+        with self.index_lock:
+            isbns = list(self.title_index.islice(start, stop))
+        for isbn in isbns:
+            book = self.search(isbn)
+            if book is not None:  # deleted since
+                yield book
+
+    # building an index reads every book and must not miss a write
+    def enable_secondary_indexes(self):
+        if self.author_index is None:
+            with self._all_stripes(), self.index_lock:
+                self._check_writable()
+                super().enable_secondary_indexes()
+
+    def enable_text_index(self):
+        if self.text_index is None:
+            with self._all_stripes(), self.index_lock:
+                self._check_writable()
+                super().enable_text_index()
+
+    def enable_fuzzy_index(self):
+        if self.fuzzy_index is None:
+            with self._all_stripes(), self.index_lock:
+                self._check_writable()
+                super().enable_fuzzy_index()
+
+    # index readers: the index is enabled first, outside index_lock, to
+    # keep the lock order
+    def search_text(self, text, limit=None):
+        self.enable_text_index()
+        with self.index_lock:
+            return super().search_text(text, limit)
+
+    def search_fuzzy(self, text, limit=10):
+        self.enable_fuzzy_index()
+        with self.index_lock:
+            return super().search_fuzzy(text, limit)
+
+    def query(self, isbn=None, author=None, year_from=None, year_to=None, title_prefix=None):
+        with self.index_lock:
+            return super().query(isbn, author, year_from, year_to, title_prefix)
+
+# Sorted index (by title)
+class SortedIndex:
+    # Sorted list of keys split into chunks of CHUNK to 2*CHUNK keys. Lookups
+    # bisect the chunk maxima and then one chunk, so add/remove only shift a
+    # short list instead of the whole catalog.
+    CHUNK = 512
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def add(self, key):
+        chunks, maxes = self._chunks, self._maxes
+        if not chunks:
+            chunks.append([key])
+            maxes.append(key)
+        else:
+            pos = bisect_left(maxes, key)
+            if pos == len(maxes):
+                pos -= 1
+                chunks[pos].append(key)
+                maxes[pos] = key
+            else:
+                insort(chunks[pos], key)
+            if len(chunks[pos]) > 2 * self.CHUNK:
+                chunk = chunks[pos]
+                chunks.insert(pos + 1, chunk[self.CHUNK:])
+                del chunk[self.CHUNK:]
+                maxes.insert(pos, chunk[-1])
+        self._len += 1
+
+    def update(self, keys):
+        # bulk add: one sort (timsort merges the two sorted runs) and re-chunk
+        keys = sorted(chain(self, keys))
+        self._chunks = [keys[i:i + self.CHUNK] for i in range(0, len(keys), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(keys)
+
+    def remove(self, key):
+        chunks, maxes = self._chunks, self._maxes
+        pos = bisect_left(maxes, key)
+        if pos == len(maxes):
+            return False
+        chunk = chunks[pos]
+        i = bisect_left(chunk, key)
+        if chunk[i] != key:
+            return False
+        del chunk[i]
+        if chunk:
+            maxes[pos] = chunk[-1]
+        else:
+            del chunks[pos]
+            del maxes[pos]
+        self._len -= 1
+        return True
+
+    def irange(self, lo, hi):
+        # keys with lo <= key < hi, in order
+        chunks = self._chunks
+        pos = bisect_left(self._maxes, lo)
+        if pos == len(chunks):
+            return
+        start = bisect_left(chunks[pos], lo)
+        for chunk in chunks[pos:]:
+            end = bisect_left(chunk, hi)
+            yield from chunk[start:end]
+            if end < len(chunk):
+                return
+            start = 0
+
+    def islice(self, start=0, stop=None):
+        # keys at positions start..stop-1; whole chunks are skipped by length
+        if stop is None or stop > self._len:
+            stop = self._len
+        count = stop - start
+        for chunk in self._chunks:
+            if count <= 0:
+                return
+            if start >= len(chunk):
+                start -= len(chunk)
+                continue
+            part = chunk[start:start + count]
+            yield from part
+            count -= len(part)
+            start = 0
+
+    def rank(self, key):
+        # number of keys < key
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            return self._len
+        return sum(map(len, self._chunks[:pos])) + bisect_left(self._chunks[pos], key)
+
+    def count_range(self, lo, hi):
+        return max(0, self.rank(hi) - self.rank(lo))
+
+class TitleIndex:
+    # keys are (casefolded title, isbn): computed once per change, never
+    # while sorting, and unique even when titles repeat
+    def __init__(self):
+        self.keys = SortedIndex()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        for _, isbn in self.keys:
+            yield isbn
+
+    def islice(self, start=0, stop=None):
+        for _, isbn in self.keys.islice(start, stop):
+            yield isbn
+
+    def position(self, book):
+        return self.keys.rank(self.key(book))
+
+    @staticmethod
+    def key(book):
+        return (book.title.casefold(), book.isbn)
+
+    def add(self, book):
+        self.keys.add(self.key(book))
+
+    def add_many(self, books):
+        self.keys.update(map(self.key, books))
+
+    def remove(self, book):
+        self.keys.remove(self.key(book))
+
+    @staticmethod
+    def _prefix_range(prefix):
+        prefix = prefix.casefold()
+        return (prefix,), (prefix + chr(sys.maxunicode),)
+
+    def prefix(self, prefix):
+        for _, isbn in self.keys.irange(*self._prefix_range(prefix)):
+            yield isbn
+
+    def count_prefix(self, prefix):
+        return self.keys.count_range(*self._prefix_range(prefix))
+
+class AuthorIndex:
+    # casefolded author -> set of ISBNs
+    def __init__(self):
+        self.isbns = {}
+
+    def add(self, book):
+        self.isbns.setdefault(book.author.casefold(), set()).add(book.isbn)
+
+    def add_many(self, books):
+        for book in books:
+            self.add(book)
+
+    def remove(self, book):
+        key = book.author.casefold()
+        isbns = self.isbns.get(key)
+        if isbns is not None:
+            isbns.discard(book.isbn)
+            if not isbns:
+                del self.isbns[key]
+
+    def get(self, author):
+        return self.isbns.get(author.casefold(), ())
+
+    def count(self, author):
+        return len(self.get(author))
+
+class YearIndex:
+    # (year, isbn) keys in a SortedIndex, for year ranges
+    def __init__(self):
+        self.keys = SortedIndex()
+
+    def add(self, book):
+        self.keys.add((book.year, book.isbn))
+
+    def add_many(self, books):
+        self.keys.update((book.year, book.isbn) for book in books)
+
+    def remove(self, book):
+        self.keys.remove((book.year, book.isbn))
+
+    @staticmethod
+    def _year_range(year_from, year_to):
+        lo = (float("-inf") if year_from is None else year_from,)
+        hi = (float("inf") if year_to is None else year_to + 1,)
+        return lo, hi
+
+    def between(self, year_from=None, year_to=None):
+        for _, isbn in self.keys.irange(*self._year_range(year_from, year_to)):
+            yield isbn
+
+    def count(self, year_from=None, year_to=None):
+        return self.keys.count_range(*self._year_range(year_from, year_to))
+
+# Full-text index (title + author keywords)
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.casefold())
+
+def _contains(sorted_list, item):
+    i = bisect_left(sorted_list, item)
+    return i < len(sorted_list) and sorted_list[i] == item
+
+def _intersect(candidates, sorted_list):
+    # a few candidates are bisected into a long posting list; otherwise the
+    # set scans the list in one C-level pass
+    if len(candidates) * 16 < len(sorted_list):
+        return {item for item in candidates if _contains(sorted_list, item)}
+    return candidates.intersection(sorted_list)
+
+class TextIndex:
+    # Inverted index: token -> sorted list of ISBNs, kept separately for
+    # titles and authors so ranking knows where a term matched. A query
+    # starts from the rarest term's postings and intersects the others into
+    # it, so the work follows the smallest posting list, not the catalog.
+    TITLE_WEIGHT = 2.0
+    AUTHOR_WEIGHT = 1.0
+
+    def __init__(self):
+        self.title_postings = {}
+        self.author_postings = {}
+        self.doc_count = 0
+
+    @staticmethod
+    def _post(postings, text, isbn):
+        for token in set(tokenize(text)):
+            insort(postings.setdefault(token, []), isbn)
+
+    @staticmethod
+    def _unpost(postings, text, isbn):
+        for token in set(tokenize(text)):
+            isbns = postings.get(token)
+            if isbns is None:
+                continue
+            i = bisect_left(isbns, isbn)
+            if i < len(isbns) and isbns[i] == isbn:
+                del isbns[i]
+            if not isbns:
+                del postings[token]
+
+    def add(self, book):
+        self._post(self.title_postings, book.title, book.isbn)
+        self._post(self.author_postings, book.author, book.isbn)
+        self.doc_count += 1
+
+    def add_many(self, books):
+        # collect new postings per token, then sort each list once
+        for postings, field in ((self.title_postings, attrgetter("title")),
+                                (self.author_postings, attrgetter("author"))):
+            new = {}
+            for book in books:
+                for token in set(tokenize(field(book))):
+                    new.setdefault(token, []).append(book.isbn)
+            for token, isbns in new.items():
+                existing = postings.get(token)
+                if existing:
+                    isbns += existing
+                isbns.sort()
+                postings[token] = isbns
+        self.doc_count += len(books)
+
+    def remove(self, book):
+        self._unpost(self.title_postings, book.title, book.isbn)
+        self._unpost(self.author_postings, book.author, book.isbn)
+        self.doc_count -= 1
+
+    def search(self, text, limit=None):
+        # all terms must match (AND); ranked by field-weighted idf
+        terms = []
+        for token in set(tokenize(text)):
+            titles = self.title_postings.get(token, [])
+            authors = self.author_postings.get(token, [])
+            df = len(titles) + len(authors)
+            if not df:
+                return []
+            idf = math.log(1 + self.doc_count / df)
+            terms.append((df, idf, titles, authors))
+        if not terms:
+            return []
+        terms.sort(key=lambda term: term[0])
+
+        _, _, titles, authors = terms[0]
+        candidates = set(titles).union(authors)
+        for _, _, titles, authors in terms[1:]:
+            candidates = _intersect(candidates, titles) | _intersect(candidates, authors)
+            if not candidates:
+                return []
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for _, idf, titles, _ in terms:
+            title_hits = _intersect(candidates, titles)
+            for isbn in title_hits:
+                scores[isbn] += self.TITLE_WEIGHT * idf
+            for isbn in candidates - title_hits:
+                scores[isbn] += self.AUTHOR_WEIGHT * idf
+        rank = lambda isbn: (-scores[isbn], isbn)
+        if limit is None:
+            return sorted(scores, key=rank)
+        return heapq.nsmallest(limit, scores, key=rank)
+
+class FuzzyIndex:
+    # Typo-tolerant word search over a TextIndex. Its vocabulary (a
+    # TermIndex) is the text index's tokens, kept in step as they appear and
+    # disappear: it must come after the text index in HashTable.indexes, so
+    # that remove() sees the postings the book has already left.
+    #
+    # isbns maps isbn_form() to the ISBNs stored some other way (with
+    # hyphens, say), so near-ISBN probes find those too. ISBNs already in
+    # that form are found by the table itself and take no entry.
+    TERMS_PER_WORD = 8
+
+    def __init__(self, text_index, books=()):
+        self.text = text_index
+        self.terms = TermIndex(set(text_index.title_postings).union(text_index.author_postings))
+        self.isbns = {}
+        for book in books:
+            self._add_isbn(book.isbn)
+
+    @staticmethod
+    def _tokens(book):
+        return set(tokenize(book.title)).union(tokenize(book.author))
+
+    def _frequency(self, term):
+        return len(self.text.title_postings.get(term, ())) + len(self.text.author_postings.get(term, ()))
+
+    def _add_isbn(self, isbn):
+        form = isbn_form(isbn)
+        if form != isbn:
+            self.isbns.setdefault(form, set()).add(isbn)
+
+    def add(self, book):
+        for token in self._tokens(book):
+            self.terms.add(token)
+        self._add_isbn(book.isbn)
+
+    def add_many(self, books):
+        tokens = set()
+        for book in books:
+            tokens.update(tokenize(book.title))
+            tokens.update(tokenize(book.author))
+            self._add_isbn(book.isbn)
+        self.terms.add_many(tokens)
+
+    def remove(self, book):
+        text = self.text
+        for token in self._tokens(book):
+            if token not in text.title_postings and token not in text.author_postings:
+                self.terms.remove(token)
+        form = isbn_form(book.isbn)
+        if form != book.isbn:
+            isbns = self.isbns[form]
+            isbns.discard(book.isbn)
+            if not isbns:
+                del self.isbns[form]
+
+    def search(self, text, limit=None):
+        # [(isbn, score)] best first: books matching a near term for every word. A word
+        # scores its best term's similarity, weighted down for author-only
+        # hits as in TextIndex; the score is the mean over the words.
+        words = []
+        for word in set(tokenize(text)):
+            terms = self.terms.similar(word, self.TERMS_PER_WORD, self._frequency)
+            if not terms:
+                return []
+            postings = [(s, self.text.title_postings.get(term, []), self.text.author_postings.get(term, []))
+                        for term, s in terms]
+            words.append((sum(len(titles) + len(authors) for _, titles, authors in postings), postings))
+        if not words:
+            return []
+        words.sort(key=itemgetter(0))
+
+        candidates = set()
+        for _, titles, authors in words[0][1]:
+            candidates.update(titles)
+            candidates.update(authors)
+        for _, postings in words[1:]:
+            matched = set()
+            for _, titles, authors in postings:
+                matched |= _intersect(candidates, titles) | _intersect(candidates, authors)
+            candidates = matched
+            if not candidates:
+                return []
+
+        author_weight = TextIndex.AUTHOR_WEIGHT / TextIndex.TITLE_WEIGHT
+        scores = dict.fromkeys(candidates, 0.0)
+        for _, postings in words:
+            best = dict.fromkeys(candidates, 0.0)
+            for s, titles, authors in postings:
+                for isbn in _intersect(candidates, authors):
+                    best[isbn] = max(best[isbn], s * author_weight)
+                for isbn in _intersect(candidates, titles):
+                    best[isbn] = max(best[isbn], s)
+            for isbn, s in best.items():
+                scores[isbn] += s / len(words)
+        rank = lambda item: (-item[1], item[0])
+        if limit is None:
+            return sorted(scores.items(), key=rank)
+        return heapq.nsmallest(limit, scores.items(), key=rank)
+
+# Merge sort (by title)
+@perf.timed("sort.merge_sort")
+def merge_sort(books):
+    return _merge_sort(books)
+
+def _merge_sort(books):
+    if len(books) <= 1:
+        return books
+    mid = len(books) // 2
+    left = _merge_sort(books[:mid])
+    right = _merge_sort(books[mid:])
+    return merge(left, right)
+
+def merge(left, right):
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i].title.lower() < right[j].title.lower():
+            result.append(left[i])
+            i += 1
+        else:
+            result.append(right[j])
+            j += 1
+    result.extend(left[i:])
+    result.extend(right[j:])
+    return result
+
+# CSV import / export
+EXPORT_COLUMNS = ["ISBN", "Title", "Author", "Year"]
+
+def export_books(books, file):
+    export_rows(((book.isbn, book.title, book.author, book.year) for book in books), file)
+
+def export_rows(rows, file):
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+
+ISBN_PATTERN = re.compile(r"\d{9}[\dX]|\d{13}")
+
+def parse_books_csv(file):
+    # yields (line number, Book or None, error or None) for each data row;
+    # accepts the layout export_data writes, header row optional
+    reader = csv.reader(file)
+    for row in reader:
+        line = reader.line_num
+        if line == 1 and row and row[0].strip().lower() == "isbn":
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 4:
+            yield line, None, "expected 4 columns: ISBN, Title, Author, Year"
+            continue
+        isbn, title, author, year = [cell.strip() for cell in row[:4]]
+        if not ISBN_PATTERN.fullmatch(isbn.replace("-", "").upper()):
+            yield line, None, f"bad ISBN {isbn!r}"
+        elif not title or not author:
+            yield line, None, "title and author are required"
+        else:
+            try:
+                yield line, Book(isbn, title, author, int(year)), None
+            except ValueError:
+                yield line, None, f"bad year {year!r}"
+
+def count_csv_rows(path):
+    # cheap size estimate for pre-sizing: newlines, minus the header
+    lines = 0
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+class ImportReport:
+    def __init__(self):
+        self.added = 0
+        self.errors = []  # (line number, message)
+
+@perf.timed("table.import_books")
+def import_books(table, path, report, batch_size=5000):
+    # Generator: loads the CSV in batches and yields (rows read, expected
+    # rows) after each one, so a caller can show progress or hand control
+    # back to an event loop. The table is pre-sized once and the load runs
+    # as one table.bulk_load(), so the indexes are built once at the end
+    # and a ConcurrentHashTable keeps other writers out until the
+    # generator finishes or is closed.
+    expected = count_csv_rows(path)
+    table.reserve(len(table) + expected)
+    report.added = 0
+    with table.bulk_load() as add, open(path, newline="", encoding="utf-8") as file:
+        rows = parse_books_csv(file)
+        done = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            added = {id(book) for book in add([book for _, book, error in batch if not error])}
+            for line, book, error in batch:
+                if error:
+                    report.errors.append((line, error))
+                elif id(book) not in added:
+                    report.errors.append((line, f"duplicate ISBN {book.isbn!r}"))
+            report.added += len(added)
+            done += len(batch)
+            yield done, expected
+
+# Persistence: binary snapshot + append-only journal
+# The snapshot holds the whole catalog in title order as four columns: the
+# ISBN, title and author strings are each one NUL-separated UTF-8 blob and
+# the years a packed int32 array. Loading is a handful of C-level
+# decode/split calls over a memory-mapped file, and since the rows come
+# back already sorted the title index is built without a real sort. Every
+# change after the snapshot is appended to the journal as one JSON line;
+# compaction folds the journal into a fresh snapshot.
+#
+# A NUL or SNAPSHOT_ESCAPE inside a value is written as SNAPSHOT_ESCAPE
+# followed by "0" or by itself. Only a column that holds one is escaped
+# and only one that holds SNAPSHOT_ESCAPE is unescaped, so a usual catalog
+# still costs one join and one split per column. LMSSNAP1 files, written
+# before escaping (NULs were dropped), are read as they are.
+SNAPSHOT_MAGIC = b"LMSSNAP2"
+SNAPSHOT_MAGIC_UNESCAPED = b"LMSSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQQQ")  # magic, rows, 4 section sizes
+SNAPSHOT_ESCAPE = "\x01"
+SNAPSHOT_ESCAPED = re.compile("\x01(.)", re.DOTALL)
+
+def _join_column(values):
+    text = "\0".join(values)
+    if text.count("\0") != len(values) - 1 or SNAPSHOT_ESCAPE in text:
+        text = "\0".join(value.replace(SNAPSHOT_ESCAPE, SNAPSHOT_ESCAPE * 2).replace("\0", SNAPSHOT_ESCAPE + "0")
+                         for value in values)
+    return text.encode("utf-8")
+
+def _unescape(match):
+    return "\0" if match.group(1) == "0" else match.group(1)
+
+def _split_column(text):
+    values = text.split("\0")
+    if SNAPSHOT_ESCAPE in text:
+        values = [SNAPSHOT_ESCAPED.sub(_unescape, value) for value in values]
+    return values
+
+def write_snapshot(table, path):
+    books = list(table.books_by_title())
+    sections = [
+        _join_column([book.isbn for book in books]),
+        _join_column([book.title for book in books]),
+        _join_column([book.author for book in books]),
+        array("i", (book.year for book in books)).tobytes(),
+    ]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(books), *map(len, sections)))
+        for section in sections:
+            file.write(section)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)  # readers only ever see a complete snapshot
+
+def read_snapshot(path):
+    # returns (isbns, titles, authors, years) columns
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, rows, *sizes = SNAPSHOT_HEADER.unpack_from(data)
+        if magic not in (SNAPSHOT_MAGIC, SNAPSHOT_MAGIC_UNESCAPED):
+            raise ValueError(f"{path} is not a catalog snapshot")
+        if not rows:
+            return [], [], [], array("i")
+        split = _split_column if magic == SNAPSHOT_MAGIC else methodcaller("split", "\0")
+        columns = []
+        start = SNAPSHOT_HEADER.size
+        for size in sizes[:3]:
+            columns.append(split(data[start:start + size].decode("utf-8")))
+            start += size
+        years = array("i")
+        years.frombytes(data[start:start + sizes[3]])
+        columns.append(years)
+    return columns
+
+class Journal:
+    # Sits in HashTable.indexes, so it hears about every change. An update
+    # arrives as remove + add and is logged as D + I: the D line is only
+    # buffered and goes out together with the I line, so a crash cannot
+    # leave half an update behind. Inserts are flushed to the OS at once;
+    # fsync runs at most every fsync_interval seconds (sync() is also called
+    # from a timer), which bounds what a crash can lose.
+    def __init__(self, path, fsync_interval=1.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.file = open(path, "a", encoding="utf-8")
+        self.entries = 0
+        self.last_sync = time.monotonic()
+        self.dirty = False
+
+    def _write(self, lines):
+        self.file.write(lines)
+        self.file.flush()
+        self.dirty = True
+        if time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def add(self, book):
+        self._write(json.dumps(["I", book.isbn, book.title, book.author, book.year]) + "\n")
+        self.entries += 1
+
+    def add_many(self, books):
+        self._write("".join(json.dumps(["I", book.isbn, book.title, book.author, book.year]) + "\n"
+                            for book in books))
+        self.entries += len(books)
+
+    def remove(self, book):
+        self.file.write(json.dumps(["D", book.isbn]) + "\n")
+        self.dirty = True
+        self.entries += 1
+
+    def sync(self):
+        if self.dirty:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def truncate(self):
+        # fsync even with nothing written: if the truncation were lost in a
+        # crash, the old entries would be replayed on top of the snapshot
+        # that already holds them
+        self.file.close()
+        self.file = open(self.path, "w", encoding="utf-8")
+        os.fsync(self.file.fileno())
+        self.dirty = False
+        self.last_sync = time.monotonic()
+        self.entries = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+def replay_journal(table, path):
+    # Applies the journal on top of the snapshot. Inserts act as upserts, so
+    # replaying a journal whose effects are already in the snapshot (a crash
+    # between writing the snapshot and truncating the journal) is harmless.
+    entries = 0
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line from a crash mid-write
+            if entry[0] == "I":
+                _, isbn, title, author, year = entry
+                if not table.insert(Book(isbn, title, author, year)):
+                    table.update(isbn, title, author, year)
+            elif entry[0] == "D":
+                table.delete(entry[1])
+            entries += 1
+    return entries
+
+class CatalogStore:
+    SNAPSHOT = "catalog.snapshot"
+    JOURNAL = "catalog.journal"
+
+    def __init__(self, directory, fsync_interval=1.0, compact_after=50000):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT)
+        self.journal_path = os.path.join(directory, self.JOURNAL)
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+        self.journal = None
+
+    def load(self, table, read_only=False):
+        # snapshot + journal tail into table, then start journaling its
+        # changes; read_only leaves the journal closed, so close() neither
+        # writes nor compacts and the files are safe to share with a writer
+        if os.path.exists(self.snapshot_path):
+            isbns, titles, authors, years = read_snapshot(self.snapshot_path)
+            table.insert_many(map(Book, isbns, titles, authors, years))
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            replayed = replay_journal(table, self.journal_path)
+        if read_only:
+            return
+        self.journal = Journal(self.journal_path, self.fsync_interval)
+        self.journal.entries = replayed
+        table.indexes.append(self.journal)
+
+    def sync(self):
+        if self.journal is not None:
+            self.journal.sync()
+
+    def compact(self, table):
+        write_snapshot(table, self.snapshot_path)
+        if self.journal is not None:
+            self.journal.truncate()
+        elif os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def maybe_compact(self, table):
+        if self.journal is not None and self.journal.entries >= self.compact_after:
+            self.compact(table)
+
+    def close(self, table):
+        if self.journal is None:
+            return
+        self.maybe_compact(table)
+        self.journal.close()
+        table.indexes.remove(self.journal)
+        self.journal = None
+
+def journal_changes(path):
+    # the last journal entry per ISBN: a (isbn, title, author, year) row,
+    # or None if the book was deleted
+    changes = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line, as in replay_journal
+            changes[entry[1]] = tuple(entry[1:]) if entry[0] == "I" else None
+    return changes
+
+def catalog_rows(directory):
+    # every book in a CatalogStore directory as (isbn, title, author, year),
+    # read straight from the snapshot and journal without building a table
+    snapshot_path = os.path.join(directory, CatalogStore.SNAPSHOT)
+    journal_path = os.path.join(directory, CatalogStore.JOURNAL)
+    changes = journal_changes(journal_path) if os.path.exists(journal_path) else {}
+    if os.path.exists(snapshot_path):
+        for row in zip(*read_snapshot(snapshot_path)):
+            if row[0] not in changes:
+                yield row
+    for row in changes.values():
+        if row is not None:
+            yield row
+
+# External merge sort
+# For listings bigger than memory. Rows are cut into runs of RUN_SIZE; a
+# process pool sorts each run on keys computed once per row and writes it
+# to a temporary file as pickled blocks of (key, row). heapq.merge then
+# streams the runs back in order, holding one block per run. With more
+# than MERGE_FAN_IN runs they are merged in groups first, again in the
+# pool. Memory stays around (workers + 2) runs, whatever the input size.
+RUN_SIZE = 200000
+RUN_BLOCK = 2000
+MERGE_FAN_IN = 64
+
+def _title_key(row):
+    return (row[1].casefold(), row[0])
+
+def _author_key(row):
+    return ((row[2] or "").casefold(), row[1].casefold(), row[0])
+
+def _year_key(row):
+    return (row[3] if row[3] is not None else -sys.maxsize, row[1].casefold(), row[0])
+
+def _isbn_key(row):
+    return row[0]
+
+SORT_KEYS = {"title": _title_key, "author": _author_key, "year": _year_key, "isbn": _isbn_key}
+
+def _write_run(pairs, path):
+    with open(path, "wb") as file:
+        for start in range(0, len(pairs), RUN_BLOCK):
+            pickle.dump(pairs[start:start + RUN_BLOCK], file, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _read_run(path):
+    with open(path, "rb", buffering=1 << 20) as file:
+        while True:
+            try:
+                block = pickle.load(file)
+            except EOFError:
+                return
+            yield from block
+
+def _sort_run(rows, key, path):
+    key = SORT_KEYS[key]
+    pairs = [(key(row), row) for row in rows]
+    pairs.sort(key=itemgetter(0))
+    return _write_run(pairs, path)
+
+def _merge_runs(paths, path):
+    with open(path, "wb") as file:
+        merged = heapq.merge(*map(_read_run, paths), key=itemgetter(0))
+        while True:
+            block = list(islice(merged, RUN_BLOCK))
+            if not block:
+                break
+            pickle.dump(block, file, pickle.HIGHEST_PROTOCOL)
+    for old in paths:
+        os.remove(old)
+    return path
+
+@perf.timed("sort.external_sort")
+def external_sort(rows, key="title", run_size=RUN_SIZE, workers=None, directory=None):
+    # Generator: rows in key order. A single run is sorted in memory
+    # without temporary files or worker processes.
+    sort_key = SORT_KEYS[key]
+    rows = iter(rows)
+    run = list(islice(rows, run_size))
+    if len(run) < run_size:
+        run.sort(key=sort_key)
+        yield from run
+        return
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(dir=directory, prefix="lms-sort-") as tmp:
+        pool = None
+        if workers > 1:
+            # imported here: the process pool machinery takes longer to
+            # import than the rest of lms_core, and most callers never sort
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            paths = []
+            pending = deque()
+            while run:
+                path = os.path.join(tmp, f"run{len(paths) + len(pending)}")
+                if pool is None:
+                    paths.append(_sort_run(run, key, path))
+                else:
+                    # at most workers + 1 runs queued, so reading can't outrun sorting
+                    if len(pending) > workers:
+                        paths.append(pending.popleft().result())
+                    pending.append(pool.submit(_sort_run, run, key, path))
+                run = list(islice(rows, run_size))
+            paths.extend(future.result() for future in pending)
+            passes = 0
+            while len(paths) > MERGE_FAN_IN:
+                passes += 1
+                groups = [paths[i:i + MERGE_FAN_IN] for i in range(0, len(paths), MERGE_FAN_IN)]
+                outputs = [os.path.join(tmp, f"merge{passes}.{i}") for i in range(len(groups))]
+                paths = list((pool.map if pool else map)(_merge_runs, groups, outputs))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        for _, row in heapq.merge(*map(_read_run, paths), key=itemgetter(0)):
+            yield row
+
+# Instrumentation: timed only while perf is enabled (LMS_PERF=1, or the
+# stats window, F12). merge_sort, import_books and external_sort carry
+# @perf.timed where they are defined.
+perf.instrument(HashTable, ["insert", "insert_many", "search", "delete", "update",
+                            "search_text", "search_fuzzy", "query"], "table")
+perf.instrument(CompactHashTable, ["insert", "search", "delete", "update"], "table")
+perf.instrument(ConcurrentHashTable, ["insert", "search", "delete", "update", "snapshot"], "table")
+perf.instrument(SortedIndex, ["update"], "sort")
+perf.instrument(TextIndex, ["add_many", "search"], "text")
+perf.instrument(FuzzyIndex, ["add_many", "search"], "fuzzy")
+perf.instrument(CatalogStore, ["load", "sync", "compact"], "store")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "library_data")
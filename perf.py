@@ -0,0 +1,253 @@
+import atexit
+import functools
+import heapq
+import inspect
+import json
+import os
+import re
+import threading
+import time
+
+# -----------------------------
+# Opt-in performance instrumentation
+# -----------------------------
+# Hot paths are registered with instrument(owner, names, group) but left
+# untouched until enable() swaps timing wrappers in; disable() puts the
+# originals back. While disabled the only cost is an `enabled` test in
+# the few places that record by hand (SQL cursors, cache counters).
+# Module-level functions are imported by name elsewhere, so swapping the
+# module attribute would miss those callers: they are wrapped once with
+# @timed(name), which checks `enabled` on each call instead. A generator
+# is timed over every resume, and recorded once it finishes or is closed.
+#
+# Every timed name gets a Histogram: count, total, min, max and
+# power-of-two latency buckets from 1us, enough to estimate p50/p95/p99.
+# SQL statements go through traced(cursor): each is timed under its text
+# (IN lists collapsed, so batches of any size share a line) and the
+# SLOW_QUERIES slowest are kept with their parameters.
+#
+# LMS_PERF=1 starts enabled; LMS_PERF=<file>.json also writes dump() there
+# on exit.
+
+BUCKETS = 28  # bucket b holds durations below 2**b microseconds
+SLOW_QUERIES = 20
+PARAMS_LIMIT = 200
+
+enabled = False
+_registry = []   # (owner, attribute, stat name)
+_wrapped = []    # (owner, attribute, original)
+_stats = {}
+_counters = {}
+_slow = []       # min-heap of (seconds, sequence, query, params)
+_sequence = 0
+_lock = threading.Lock()
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        # upper edge of the bucket holding that rank, capped at the max seen
+        rank = fraction * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min((1 << b) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets_us": {1 << b: n for b, n in enumerate(self.buckets) if n},
+        }
+
+def record(name, seconds):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = Histogram()
+        stat.add(seconds)
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+# ---- wrappers ----
+
+def _timed(fn, name):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+    return wrapper
+
+def _timed_generator(fn, name):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        generator = fn(*args, **kwargs)
+        spent = time.perf_counter() - start
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - start
+                yield item
+        finally:
+            start = time.perf_counter()
+            generator.close()
+            record(name, spent + time.perf_counter() - start)
+    return wrapper
+
+def _wrap(fn, name):
+    return (_timed_generator if inspect.isgeneratorfunction(fn) else _timed)(fn, name)
+
+def _install(owner, attribute, name):
+    original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+    _wrapped.append((owner, attribute, original))
+    setattr(owner, attribute, _wrap(original, name))
+
+def timed(name):
+    def decorate(fn):
+        timed_fn = _wrap(fn, name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return (timed_fn if enabled else fn)(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def instrument(owner, names, group):
+    # owner is a class (or module); its functions are timed as group.name
+    for attribute in names:
+        _registry.append((owner, attribute, f"{group}.{attribute}"))
+        if enabled:
+            _install(owner, attribute, f"{group}.{attribute}")
+
+def enable():
+    global enabled
+    if enabled:
+        return
+    for owner, attribute, name in _registry:
+        _install(owner, attribute, name)
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+    while _wrapped:
+        owner, attribute, original = _wrapped.pop()
+        setattr(owner, attribute, original)
+
+# ---- SQL ----
+
+IN_LIST = re.compile(r"\((?:%s|\?)(?:,\s*(?:%s|\?))+\)")
+WHITESPACE = re.compile(r"\s+")
+
+def _short(value):
+    text = repr(value)
+    return text if len(text) <= PARAMS_LIMIT else text[:PARAMS_LIMIT] + "..."
+
+def record_query(query, params, seconds):
+    global _sequence
+    name = "sql " + IN_LIST.sub("(...)", WHITESPACE.sub(" ", query).strip())
+    record(name, seconds)
+    with _lock:
+        _sequence += 1
+        entry = (seconds, _sequence, query, params)
+        if len(_slow) < SLOW_QUERIES:
+            heapq.heappush(_slow, entry)
+        elif seconds > _slow[0][0]:
+            heapq.heapreplace(_slow, entry)
+
+class TracedCursor:
+    # A DB-API cursor whose execute/executemany are timed. Only the
+    # statement itself is: rows a driver produces lazily (sqlite3) show up
+    # in the db.* timing of the call that fetched them.
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, *args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, *args)
+        finally:
+            record_query(query, _short(args[0]) if args else None, time.perf_counter() - start)
+
+    def executemany(self, query, rows):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, rows)
+        finally:
+            record_query(query, _short(rows), time.perf_counter() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def traced(cursor):
+    return TracedCursor(cursor) if enabled else cursor
+
+# ---- reports ----
+
+def reset():
+    global _sequence
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+        _slow.clear()
+        _sequence = 0
+
+def snapshot():
+    with _lock:
+        return {
+            "enabled": enabled,
+            "timings": {name: stat.summary() for name, stat in sorted(_stats.items())},
+            "counters": dict(sorted(_counters.items())),
+            "slow_queries": [{"seconds": seconds, "query": query, "params": params}
+                             for seconds, _, query, params in sorted(_slow, reverse=True)],
+        }
+
+def dump(path, extra=None):
+    report = snapshot()
+    report["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if extra:
+        report.update(extra)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, default=str)
+
+_setting = os.environ.get("LMS_PERF", "")
+if _setting and _setting != "0":
+    enable()
+    if _setting.endswith(".json"):
+        atexit.register(dump, _setting)
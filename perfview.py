@@ -0,0 +1,117 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+import perf
+
+# -----------------------------
+# Stats window for perf
+# -----------------------------
+# One window per app (show() raises it if it is already open). It redraws
+# every REFRESH_MS from perf.snapshot(): a row per timed name and counter,
+# the slowest SQL statements, and whatever figures the app's extra()
+# callback returns (hash table chain lengths, cache sizes).
+
+REFRESH_MS = 2000
+_window = None
+
+def _ms(seconds):
+    return f"{seconds * 1000:.3f}"
+
+def _figures(values):
+    return "   ".join(f"{key.replace('_', ' ')}: {value:.3f}" if isinstance(value, float)
+                      else f"{key.replace('_', ' ')}: {value}" for key, value in values.items())
+
+class StatsWindow:
+    COLUMNS = ("count", "mean ms", "p50 ms", "p95 ms", "p99 ms", "max ms", "total ms")
+
+    def __init__(self, parent, extra=None):
+        self.extra = extra
+        self.win = tk.Toplevel(parent)
+        self.win.title("Performance")
+        self.win.geometry("900x560")
+
+        bar = tk.Frame(self.win)
+        bar.pack(fill="x", padx=8, pady=6)
+        self.toggle_button = ttk.Button(bar, command=self.toggle)
+        self.toggle_button.pack(side="left")
+        ttk.Button(bar, text="Reset", command=self.reset).pack(side="left", padx=6)
+        ttk.Button(bar, text="Save JSON...", command=self.save).pack(side="left")
+        self.status = tk.Label(bar, anchor="w")
+        self.status.pack(side="left", padx=12)
+
+        self.figures = tk.Label(self.win, anchor="w", justify="left", wraplength=880)
+        self.figures.pack(fill="x", padx=8)
+
+        self.timings = ttk.Treeview(self.win, columns=self.COLUMNS, height=12)
+        self.timings.heading("#0", text="operation")
+        self.timings.column("#0", width=300)
+        for column in self.COLUMNS:
+            self.timings.heading(column, text=column)
+            self.timings.column(column, width=80, anchor="e")
+        self.timings.pack(fill="both", expand=True, padx=8, pady=6)
+
+        tk.Label(self.win, text=f"Slowest SQL statements (top {perf.SLOW_QUERIES})", anchor="w").pack(fill="x", padx=8)
+        self.slow = ttk.Treeview(self.win, columns=("ms", "params"), height=6)
+        self.slow.heading("#0", text="query")
+        self.slow.column("#0", width=480)
+        self.slow.heading("ms", text="ms")
+        self.slow.column("ms", width=80, anchor="e")
+        self.slow.heading("params", text="params")
+        self.slow.column("params", width=300)
+        self.slow.pack(fill="both", padx=8, pady=6)
+
+        self.refresh()
+
+    def refresh(self):
+        if self.win.winfo_exists():
+            self.draw()
+            self.win.after(REFRESH_MS, self.refresh)
+
+    def draw(self):
+        report = perf.snapshot()
+        self.toggle_button.config(text="Disable" if report["enabled"] else "Enable")
+        self.status.config(text="recording" if report["enabled"]
+                           else "off: start with LMS_PERF=1 or press Enable")
+        if self.extra is not None:
+            self.figures.config(text=_figures(self.extra()))
+
+        self.timings.delete(*self.timings.get_children())
+        for name, stat in report["timings"].items():
+            self.timings.insert("", "end", text=name, values=(
+                stat["count"], _ms(stat["mean"]), _ms(stat["p50"]), _ms(stat["p95"]),
+                _ms(stat["p99"]), _ms(stat["max"]), _ms(stat["total"])))
+        for name, value in report["counters"].items():
+            self.timings.insert("", "end", text=name, values=(value,))
+
+        self.slow.delete(*self.slow.get_children())
+        for entry in report["slow_queries"]:
+            self.slow.insert("", "end", text=" ".join(entry["query"].split()),
+                             values=(_ms(entry["seconds"]), entry["params"] or ""))
+
+    def toggle(self):
+        if perf.enabled:
+            perf.disable()
+        else:
+            perf.enable()
+        self.draw()
+
+    def reset(self):
+        perf.reset()
+        self.draw()
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self.win, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        extra = {"figures": self.extra()} if self.extra is not None else None
+        perf.dump(path, extra)
+        messagebox.showinfo("Saved", f"Stats written to {path}", parent=self.win)
+
+def show(parent, extra=None):
+    global _window
+    if _window is not None and _window.win.winfo_exists():
+        _window.win.lift()
+        return _window
+    _window = StatsWindow(parent, extra)
+    return _window
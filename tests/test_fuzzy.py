@@ -0,0 +1,75 @@
+import random
+from itertools import product
+
+from fuzzy import TermIndex, distance, isbn_key, max_edits, neighbours
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def osa(a, b):
+    # the textbook full-matrix optimal string alignment distance
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+# -----------------------------
+# Edit distance
+# -----------------------------
+def test_neighbours_are_one_edit_away():
+    for key in ("abca", "aab", "c"):
+        everything = {"".join(chars) for n in range(len(key) - 1, len(key) + 2)
+                      for chars in product("abc", repeat=n)}
+        assert neighbours(key, "abc") == {word for word in everything if osa(key, word) == 1}
+
+def test_distance_matches_full_matrix():
+    rng = random.Random(1)
+    for _ in range(3000):
+        a = "".join(rng.choice("abcd") for _ in range(rng.randrange(8)))
+        b = "".join(rng.choice("abcd") for _ in range(rng.randrange(8)))
+        limit = rng.randrange(4)
+        assert distance(a, b, limit) == min(osa(a, b), limit + 1), (a, b, limit)
+
+def test_distance_counts_a_swap_once():
+    assert distance("0306406157", "0306401657", 2) == 1
+    assert distance("hobbit", "hboibt", 3) == 2
+
+def test_max_edits():
+    assert [max_edits("x" * n) for n in range(1, 9)] == [0, 0, 1, 1, 1, 2, 2, 2]
+
+def test_isbn_key():
+    assert isbn_key("978-0-306-40615-7") == "9780306406157"
+    assert isbn_key("0 306 40615 x") == "030640615X"
+    assert isbn_key("tolkien") is None
+    assert isbn_key("1937") is None
+
+
+# -----------------------------
+# Term index
+# -----------------------------
+def test_similar_terms():
+    terms = TermIndex(["hobbit", "habit", "rabbit", "hobbits", "tolkien", "of", "the"])
+    assert [term for term, _ in terms.similar("hobit")] == ["hobbit", "habit"]
+    assert terms.similar("hobbit")[0] == ("hobbit", 1.0)
+    assert terms.similar("tolkein") == [("tolkien", 1 - 1 / 7)]
+    # too short to correct: exact or nothing
+    assert terms.similar("of") == [("of", 1.0)]
+    assert terms.similar("og") == []
+
+def test_similar_ties_go_to_weight():
+    terms = TermIndex(["cart", "card", "care"])
+    weights = {"cart": 1, "card": 5, "care": 3}
+    assert [term for term, _ in terms.similar("carx", weight=weights.get)] == ["card", "care", "cart"]
+
+def test_removed_terms_are_not_offered():
+    terms = TermIndex(["hobbit", "habit"])
+    terms.remove("hobbit")
+    assert "hobbit" not in terms and len(terms) == 1
+    assert [term for term, _ in terms.similar("hobbit")] == ["habit"]
+    terms.add("hobbit")
+    assert terms.similar("hobbit")[0] == ("hobbit", 1.0)
@@ -0,0 +1,142 @@
+from library_db import (BOOK_COLUMNS, SearchCache, filter_words, mysql_search_words, narrows, plain_words,
+                        plan_search)
+
+SELECT = f"SELECT {BOOK_COLUMNS} FROM books WHERE "
+
+
+# -----------------------------
+# Search planning
+# -----------------------------
+def branches(query):
+    assert query.endswith(" ORDER BY ISBN")
+    parts = query[:-len(" ORDER BY ISBN")].split(" UNION ")
+    for part in parts:
+        assert part.startswith("(" + SELECT) and part.endswith(")")
+    return [part[len(SELECT) + 1:-1] for part in parts]
+
+def test_isbn_is_a_primary_key_lookup():
+    for key in ("9780306406157", "978-0-306-40615-7", "030640615X"):
+        assert plan_search(key) == (SELECT + "ISBN=%s", (key,))
+
+def test_short_number_is_also_a_year():
+    query, params = plan_search("1984")
+    assert branches(query) == ["ISBN=%s", "Year=%s", "MATCH(Title, Author) AGAINST (%s IN BOOLEAN MODE)"]
+    assert params == ("1984", 1984, "+1984*")
+    query, params = plan_search("84")
+    assert branches(query) == ["ISBN=%s", "Year=%s", "Title LIKE %s", "Author LIKE %s"]
+    assert params == ("84", 84, "84%", "84%")
+
+def test_words_go_to_full_text():
+    query, params = plan_search("tolk the Lord of rings")
+    assert branches(query) == ["ISBN=%s", "MATCH(Title, Author) AGAINST (%s IN BOOLEAN MODE)"]
+    # stopwords and words under the minimum token size are never indexed
+    assert params == ("tolk the Lord of rings", "+tolk* +Lord* +rings*")
+
+def test_short_words_use_prefix_like():
+    query, params = plan_search("of")
+    assert branches(query) == ["ISBN=%s", "Title LIKE %s", "Author LIKE %s"]
+    assert params == ("of", "of%", "of%")
+    # LIKE wildcards in the key are matched literally
+    assert plan_search("5%_")[1] == ("5%_", "5\\%\\_%", "5\\%\\_%")
+
+def test_longer_number_is_not_a_year():
+    query, params = plan_search("12345")
+    assert branches(query) == ["ISBN=%s", "MATCH(Title, Author) AGAINST (%s IN BOOLEAN MODE)"]
+    assert params == ("12345", "+12345*")
+
+
+# -----------------------------
+# Search result cache
+# -----------------------------
+def rows(n, tag="row"):
+    return [("%s %d" % (tag, i),) for i in range(n)]
+
+def test_cache_hits_only_at_the_same_version():
+    cache = SearchCache()
+    cache.put("tolkien", 1, rows(3))
+    assert cache.get("tolkien", 1) == rows(3)
+    assert cache.get("tolkien", 2) is None
+    assert cache.get("tolk", 1) is None
+    cache.put("tolkien", 2, rows(1))
+    assert cache.get("tolkien", 1) is None
+    assert cache.get("tolkien", 2) == rows(1)
+    assert cache.rows == 1
+
+def test_cache_evicts_least_recently_used():
+    cache = SearchCache(max_entries=3)
+    for key in "abc":
+        cache.put(key, 1, rows(1, key))
+    cache.get("a", 1)  # b is now the oldest
+    cache.put("d", 1, rows(1, "d"))
+    assert [key for key in "abcd" if cache.get(key, 1) is not None] == ["a", "c", "d"]
+
+def test_cache_row_limit():
+    cache = SearchCache(max_rows=10)
+    cache.put("big", 1, rows(11))
+    assert cache.get("big", 1) is None and cache.rows == 0
+    cache.put("a", 1, rows(4))
+    cache.put("b", 1, rows(4))
+    cache.put("c", 1, rows(4))
+    assert cache.get("a", 1) is None
+    assert cache.rows == 8
+    cache.clear()
+    assert cache.get("b", 1) is None and cache.rows == 0
+
+
+# -----------------------------
+# Narrowing a search locally
+# -----------------------------
+CATALOG = [
+    ("1", "The Hobbit", "J. R. R. Tolkien"),
+    ("2", "Tolkien: A Biography", "Humphrey Carpenter"),
+    ("3", "Les Misérables", "Victor Hugo"),
+    ("4", "Émile", None),
+    ("5", "Hobbies for Everyone", "Tom Tolley"),
+]
+
+def test_plain_words():
+    assert plain_words("Tolk hob") == ["tolk", "hob"]
+    assert plain_words("MISÉR") == ["miser"]
+    # could be an ISBN prefix: also searched on ISBN, never narrowed
+    assert plain_words("978-0") is None
+    assert plain_words("  ") is None
+    assert mysql_search_words("of the hobbit") == ["hobbit"]
+    assert mysql_search_words("of") is None
+
+def test_filter_words():
+    def found(key):
+        return [row[0] for row in filter_words(CATALOG, plain_words(key))]
+
+    assert found("tol") == ["1", "2", "5"]
+    assert found("tolk hob") == ["1"]
+    assert found("hob") == ["1", "5"]
+    assert found("miser") == ["3"]
+    assert found("emile") == ["4"]
+    assert found("obbit") == []
+
+def test_narrows():
+    assert narrows(["tol"], ["tolk"])
+    assert narrows(["tol"], ["tolk", "hob"])
+    assert narrows(["tolk", "h"], ["hobbit", "tolkien"])
+    assert not narrows(["tolk"], ["tol"])
+    assert not narrows(["tolk", "hob"], ["tolk"])
+
+def test_narrowed_result_equals_a_fresh_search():
+    keys = ["t", "to", "tol", "tolk", "tolk h", "tolk hob", "h", "hob", "hobb", "e", "em", "les mis"]
+    for old in keys:
+        for new in keys:
+            old_words, new_words = plain_words(old), plain_words(new)
+            if narrows(old_words, new_words):
+                narrowed = filter_words(filter_words(CATALOG, old_words), new_words)
+                assert narrowed == filter_words(CATALOG, new_words)
+
+def test_find_prefix():
+    cache = SearchCache()
+    cache.put("to", 1, [("a",)])
+    cache.put("tolk", 1, [("b",)])
+    cache.put("tolki", 2, [("c",)])
+    assert cache.find_prefix("tolkien", 1) == ("tolk", [("b",)])
+    assert cache.find_prefix("tolkien", 2) == ("tolki", [("c",)])
+    assert cache.find_prefix("tom", 1) == ("to", [("a",)])
+    assert cache.find_prefix("tolk", 1) == ("to", [("a",)])  # never the key itself
+    assert cache.find_prefix("tolkien", 3) is None
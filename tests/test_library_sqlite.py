@@ -0,0 +1,161 @@
+import pytest
+
+from library_db import DuplicateISBN, filter_words, narrows
+from library_sqlite import SQLiteBackend
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def isbn(n):
+    return "978%010d" % n
+
+def row(n, title="Title", author="Author", year=2000):
+    return (isbn(n), title, author, year, "2024-01-01", "12:00:00")
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "library.db"))
+    backend.create_schema()
+    yield backend
+    backend.close()
+
+def books(backend):
+    return {book[0]: book[1:4] for book in backend.page(None, 10 ** 6)}
+
+
+# -----------------------------
+# Book operations
+# -----------------------------
+def test_insert_rejects_duplicate(backend):
+    backend.insert(row(1))
+    with pytest.raises(DuplicateISBN):
+        backend.insert(row(1, "Other"))
+    assert books(backend) == {isbn(1): ("Title", "Author", 2000)}
+
+def test_page_walks_in_isbn_order(backend):
+    for n in (5, 3, 9, 1, 7):
+        backend.insert(row(n))
+    assert [book[0] for book in backend.page(None, 2)] == [isbn(1), isbn(3)]
+    assert [book[0] for book in backend.page(isbn(3), 2)] == [isbn(5), isbn(7)]
+    assert [book[0] for book in backend.page(isbn(9), 2)] == []
+
+def test_search_access_paths(backend):
+    backend.insert(row(1, "The Hobbit", "J. R. R. Tolkien", 1937))
+    backend.insert(row(2, "Dune", "Frank Herbert", 1965))
+    backend.insert(row(3, "50% Off", "A. N. Other", 1965))
+    backend.insert(row(4, "5 Go Adventuring", "Enid Blyton", 1943))
+
+    def found(key):
+        return [book[0] for book in backend.search(key)]
+
+    assert found(isbn(2)) == [isbn(2)]
+    assert found("tolk") == [isbn(1)]
+    assert found("hobbit TOLKIEN") == [isbn(1)]
+    assert found("1965") == [isbn(2), isbn(3)]
+    assert found("5") == [isbn(3), isbn(4)]  # words are prefixes: "50" and "5"
+    assert found("50%") == [isbn(3)]
+    assert found("nothing") == []
+
+def test_narrowing_matches_search(backend):
+    titles = ["The Hobbit", "Tolkien Letters", "Les Misérables", "Hobbies", "Émile", "Tom Sawyer"]
+    for n, title in enumerate(titles):
+        backend.insert(row(n, title, "Author %d" % n))
+    keys = ["t", "to", "tol", "hob", "hobbit", "mis", "les m", "emi", "Émile", "auth", "author 3"]
+    for old in keys:
+        for new in keys:
+            old_words, new_words = backend.search_words(old), backend.search_words(new)
+            if old_words and new_words and narrows(old_words, new_words):
+                assert filter_words(backend.search(old), new_words) == backend.search(new), (old, new)
+
+def test_delete_and_update_many(backend):
+    for n in range(5):
+        backend.insert(row(n))
+    assert backend.delete([isbn(1), isbn(3), isbn(7)]) == 2
+    backend.update_many([isbn(0), isbn(4)], {"Author": "New", "Year": 1999})
+    backend.update(isbn(2), "Renamed", "Someone", 2010)
+    assert books(backend) == {isbn(0): ("Title", "New", 1999), isbn(2): ("Renamed", "Someone", 2010),
+                              isbn(4): ("Title", "New", 1999)}
+
+def test_changes_since_version(backend):
+    for n in range(3):
+        backend.insert(row(n))
+    version = backend.version()
+    backend.update(isbn(1), "Changed", "Author", 2000)
+    backend.delete([isbn(2)])
+    rows, deleted = backend.changes(version)
+    # changes() may return a little more than changed, never less
+    assert isbn(1) in [book[0] for book in rows if book[1] == "Changed"]
+    assert isbn(2) in deleted
+    assert backend.version() != version
+
+
+# -----------------------------
+# Batched import
+# -----------------------------
+def test_insert_batch_modes(backend):
+    backend.insert(row(1, "Old"))
+    batch = [row(1, "New"), row(2, "First"), row(2, "Second"), row(3)]
+
+    duplicates = []
+    backend.insert_batch(batch, "skip", duplicates)
+    assert books(backend) == {isbn(1): ("Old", "Author", 2000), isbn(2): ("First", "Author", 2000),
+                              isbn(3): ("Title", "Author", 2000)}
+    assert duplicates == []
+
+    backend.insert_batch([row(1, "New", "Other", 2001), row(4)], "upsert", duplicates)
+    assert books(backend)[isbn(1)] == ("New", "Other", 2001)
+    assert books(backend)[isbn(4)] == ("Title", "Author", 2000)
+
+    duplicates = []
+    assert backend.insert_batch([row(1, "Again"), row(5), row(5, "Twice")], "report", duplicates) == 1
+    assert duplicates == [isbn(1), isbn(5)]
+    assert books(backend)[isbn(1)] == ("New", "Other", 2001)
+    assert books(backend)[isbn(5)] == ("Title", "Author", 2000)
+
+
+# -----------------------------
+# Range deletes and updates
+# -----------------------------
+def test_delete_ranges(backend):
+    for n in range(10):
+        backend.insert(row(n))
+    assert backend.delete_ranges([(isbn(1), isbn(3), 3), (isbn(6), isbn(6), 1)]) == 4
+    assert sorted(books(backend)) == [isbn(n) for n in (0, 4, 5, 7, 8, 9)]
+
+def test_stale_range_changes_nothing(backend):
+    for n in range(0, 10, 2):
+        backend.insert(row(n))
+    ranges = [(isbn(0), isbn(2), 2), (isbn(6), isbn(8), 2)]
+    before = books(backend)
+    # another client added a book inside the second range after it was read
+    backend.insert(row(7))
+    assert backend.delete_ranges(ranges) is None
+    assert backend.update_ranges(ranges, {"Author": "Changed"}) is None
+    assert books(backend) == dict(before, **{isbn(7): ("Title", "Author", 2000)})
+    backend.delete([isbn(7)])
+    assert backend.update_ranges(ranges, {"Author": "Changed", "Year": 1990}) == 4
+    assert books(backend) == {isbn(n): ("Title", "Author", 2000) if n == 4 else ("Title", "Changed", 1990)
+                              for n in range(0, 10, 2)}
+
+
+# -----------------------------
+# Near matches
+# -----------------------------
+def suggested(backend, key):
+    return [(book[0], round(s, 3)) for book, s in backend.suggest(key)]
+
+def test_suggest(backend):
+    backend.insert(("9780261103344", "The Hobbit", "J. R. R. Tolkien", 1937, "2024-01-01", "12:00:00"))
+    backend.insert(("978-0-441-17271-9", "Dune", "Frank Herbert", 1965, "2024-01-01", "12:00:00"))
+    backend.insert(("9780141439518", "Pride and Prejudice", "Jane Austen", 1813, "2024-01-01", "12:00:00"))
+    assert suggested(backend, "9780261103434") == [("9780261103344", 0.923)]
+    assert suggested(backend, "9780441172718") == [("978-0-441-17271-9", 0.923)]
+    assert suggested(backend, "prejudise") == [("9780141439518", 0.889)]
+    assert suggested(backend, "hobit tolkein")[0][0] == "9780261103344"
+    assert suggested(backend, "zzzzzz") == []
+    # the vocabulary follows later writes
+    backend.update("9780261103344", "The Silmarillion", "J. R. R. Tolkien", 1977)
+    assert suggested(backend, "silmarilion") == [("9780261103344", 0.917)]
+    backend.delete(["9780141439518"])
+    assert suggested(backend, "prejudise") == []
@@ -0,0 +1,606 @@
+import json
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from array import array
+from itertools import islice, permutations
+
+import pytest
+
+import lms_core
+from lms_core import (Book, CatalogStore, CompactHashTable, ConcurrentHashTable, HashTable, ImportReport, SNAPSHOT_HEADER,
+                      SNAPSHOT_MAGIC_UNESCAPED, external_sort, import_books, read_snapshot)
+
+TABLES = [HashTable, CompactHashTable, ConcurrentHashTable]
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def isbn(n):
+    return "978%010d" % n
+
+def fields(book):
+    return (book.title, book.author, book.year)
+
+def check_table(table, model):
+    assert len(table) == len(model)
+    assert {book.isbn: fields(book) for book in table.get_all_books()} == model
+    for key, value in model.items():
+        assert fields(table.search(key)) == value
+    # the title order holds every book once, sorted by title then ISBN
+    expected = sorted(model, key=lambda key: (model[key][0].casefold(), key))
+    assert list(table.title_index) == expected
+
+def random_ops(table, model, rng, keys, ops):
+    for step in range(ops):
+        key = isbn(rng.randrange(keys))
+        value = ("Title %d" % rng.randrange(50), "Author %d" % step, rng.randrange(1900, 2030))
+        op = rng.random()
+        if op < 0.45:
+            assert table.insert(Book(key, *value)) == (key not in model)
+            model.setdefault(key, value)
+        elif op < 0.8:
+            assert table.delete(key) == (key in model)
+            model.pop(key, None)
+        elif op < 0.95:
+            assert table.update(key, *value) == (key in model)
+            if key in model:
+                model[key] = value
+        else:
+            book = table.search(key)
+            assert (book is None) == (key not in model)
+
+
+# -----------------------------
+# Tables against a dict model
+# -----------------------------
+@pytest.mark.parametrize("cls", TABLES)
+def test_matches_dict_model(cls):
+    rng = random.Random(1)
+    table = cls()
+    model = {}
+    for keys in (50, 2000, 50):  # grow, then delete down and shrink
+        random_ops(table, model, rng, keys, 6000)
+        check_table(table, model)
+
+def test_rehash_is_spread_over_inserts():
+    table = HashTable()
+    rehashing = 0
+    for n in range(200):
+        table.insert(Book(isbn(n), "Title", "Author", 2000))
+        rehashing += table.chain_stats()["rehashing"]
+    # every growth moves a few buckets per insert instead of all at once
+    assert rehashing > 3
+    assert table.chain_stats()["load_factor"] <= 1
+
+def test_permuted_isbns_spread_over_buckets():
+    # the old ordinal-sum hash put every one of these in the same chain
+    keys = ["".join(p) for p in islice(permutations("9781234560"), 2000)]
+    table = HashTable()
+    for key in keys:
+        table.insert(Book(key, "Title", "Author", 2000))
+    stats = table.chain_stats()
+    assert stats["count"] == len(set(keys))
+    assert stats["max_chain"] <= 10
+
+@pytest.mark.parametrize("cls", TABLES)
+def test_shrinks_after_deletes(cls):
+    table = cls()
+    for n in range(5000):
+        table.insert(Book(isbn(n), "Title", "Author", 2000))
+    grown = table.size
+    for n in range(4990):
+        assert table.delete(isbn(n))
+    assert table.size < grown // 8
+    check_table(table, {isbn(n): ("Title", "Author", 2000) for n in range(4990, 5000)})
+
+def test_compact_table_holds_less():
+    books = [Book(isbn(n), "Title %d" % n, "Author %d" % (n % 100), 2000) for n in range(20000)]
+    held = {}
+    for cls in (HashTable, CompactHashTable):
+        tracemalloc.start()
+        table = cls()
+        for book in books:
+            table.insert(Book(book.isbn, book.title, book.author, book.year))
+        held[cls], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del table
+    assert held[CompactHashTable] < held[HashTable] * 0.85
+
+
+# -----------------------------
+# query() with and without secondary indexes
+# -----------------------------
+def brute_query(books, isbn=None, author=None, year_from=None, year_to=None, title_prefix=None):
+    return sorted(
+        book.isbn for book in books
+        if (isbn is None or book.isbn == isbn)
+        and (author is None or book.author.casefold() == author.casefold())
+        and (year_from is None or book.year >= year_from)
+        and (year_to is None or book.year <= year_to)
+        and (not title_prefix or book.title.casefold().startswith(title_prefix.casefold())))
+
+@pytest.mark.parametrize("cls", TABLES)
+@pytest.mark.parametrize("indexed", [False, True])
+def test_query_matches_brute_force(cls, indexed):
+    rng = random.Random(7)
+    table = cls()
+    for n in range(1500):
+        table.insert(Book(isbn(n), rng.choice(["Alpha", "alpine", "Beta", "Gamma"]) + " %d" % n,
+                          "Author %d" % rng.randrange(20), rng.randrange(1950, 2020)))
+    if indexed:
+        table.enable_secondary_indexes()
+    # the indexes must follow updates and deletes made after they were built
+    for n in range(0, 1500, 3):
+        table.update(isbn(n), "Beta %d" % n, "Author %d" % rng.randrange(20), rng.randrange(1950, 2020))
+    for n in range(0, 1500, 5):
+        table.delete(isbn(n))
+    books = table.get_all_books()
+    conditions = [
+        {"author": "author 3"},
+        {"year_from": 1990, "year_to": 2000},
+        {"year_from": 2015},
+        {"year_to": 1951},
+        {"title_prefix": "alp"},
+        {"title_prefix": "ALPHA 1"},
+        {"author": "Author 7", "year_from": 1980},
+        {"author": "Author 7", "title_prefix": "beta", "year_to": 1990},
+        {"isbn": isbn(7), "author": table.search(isbn(7)).author},
+        {"isbn": isbn(7), "author": "nobody"},
+        {"isbn": isbn(5)},
+        {"author": "nobody"},
+        {},
+    ]
+    for condition in conditions:
+        assert sorted(book.isbn for book in table.query(**condition)) == brute_query(books, **condition)
+
+
+# -----------------------------
+# Keyword index
+# -----------------------------
+@pytest.mark.parametrize("cls", TABLES)
+def test_text_index_follows_updates(cls):
+    table = cls()
+    table.insert(Book(isbn(1), "Old Harbour", "Author", 2000))
+    table.enable_text_index()
+    table.update(isbn(1), "New Lighthouse", "Author", 2000)
+    assert [book.isbn for book in table.search_text("lighthouse")] == [isbn(1)]
+    assert table.search_text("harbour") == []
+    table.delete(isbn(1))
+    assert table.search_text("lighthouse") == []
+
+
+# -----------------------------
+# Bulk CSV import
+# -----------------------------
+def write_csv(path, lines):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        file.write("\r\n".join(lines) + "\r\n")
+
+@pytest.mark.parametrize("cls", TABLES)
+def test_import_books_reports_bad_rows(cls, tmp_path):
+    path = tmp_path / "books.csv"
+    write_csv(path, [
+        "ISBN,Title,Author,Year",
+        "%s,Good One,Author,2001" % isbn(1),
+        "12345,Short ISBN,Author,2001",
+        "%s,Bad Year,Author,soon" % isbn(2),
+        "%s,,Author,2001" % isbn(3),
+        "%s,Too Few" % isbn(4),
+        "",
+        "%s,Again,Author,2002" % isbn(1),
+        "%s,Existing,Author,2003" % isbn(9),
+        "%s,Good Two,Author,2004" % isbn(5),
+    ])
+    table = cls()
+    table.insert(Book(isbn(9), "Kept", "Author", 1999))
+    report = ImportReport()
+    list(import_books(table, str(path), report))
+    assert report.added == 2
+    assert report.errors == [
+        (3, "bad ISBN '12345'"),
+        (4, "bad year 'soon'"),
+        (5, "title and author are required"),
+        (6, "expected 4 columns: ISBN, Title, Author, Year"),
+        (8, "duplicate ISBN %r" % isbn(1)),
+        (9, "duplicate ISBN %r" % isbn(9)),
+    ]
+    # duplicates are skipped: the first row and the book already there win
+    check_table(table, {isbn(1): ("Good One", "Author", 2001), isbn(5): ("Good Two", "Author", 2004),
+                        isbn(9): ("Kept", "Author", 1999)})
+
+@pytest.mark.parametrize("cls", TABLES)
+def test_import_books_in_batches(cls, tmp_path):
+    path = tmp_path / "books.csv"
+    # no header row, and ISBNs with dashes as export_data may have them
+    write_csv(path, ["978-%010d,Title %d,Author %d,%d" % (n, n % 97, n % 13, 1900 + n % 120)
+                     for n in range(2500)])
+    table = cls()
+    table.enable_secondary_indexes()
+    table.enable_text_index()
+    report = ImportReport()
+    progress = list(import_books(table, str(path), report, batch_size=1000))
+    # the expected count is an estimate that takes the first line for a header
+    assert progress == [(1000, 2499), (2000, 2499), (2500, 2499)]
+    assert report.added == 2500 and report.errors == []
+    model = {"978-%010d" % n: ("Title %d" % (n % 97), "Author %d" % (n % 13), 1900 + n % 120)
+             for n in range(2500)}
+    check_table(table, model)
+    # the indexes detached for the load are back and hold every book
+    assert len(table.query(author="Author 3")) == len([n for n in range(2500) if n % 13 == 3])
+    assert len(table.search_text("title")) == 2500
+
+def test_import_books_closed_midway(tmp_path):
+    path = tmp_path / "books.csv"
+    write_csv(path, ["%s,Title %d,Author,2000" % (isbn(n), n) for n in range(3000)])
+    table = HashTable()
+    table.enable_secondary_indexes()
+    report = ImportReport()
+    rows = import_books(table, str(path), report, batch_size=1000)
+    next(rows)
+    rows.close()
+    # the batch already read stays, indexed like any other book
+    assert report.added == 1000
+    check_table(table, {isbn(n): ("Title %d" % n, "Author", 2000) for n in range(1000)})
+    assert len(table.query(author="Author")) == 1000
+    assert table.insert(Book(isbn(5000), "After", "Author", 2000))
+    assert len(table.query(author="Author")) == 1001
+
+
+@pytest.mark.parametrize("cls", TABLES)
+def test_insert_many_matches_dict_model(cls):
+    table = cls()
+    model = {}
+    books = [Book(isbn(n % 700), "Title %d" % n, "Author", 2000) for n in range(1000)]
+    added = table.insert_many(books)
+    for book in books:
+        model.setdefault(book.isbn, fields(book))
+    assert len(added) == len(model)
+    check_table(table, model)
+    random_ops(table, model, random.Random(2), 1000, 3000)
+    check_table(table, model)
+
+
+# -----------------------------
+# Snapshot and journal replay
+# -----------------------------
+def load(directory, cls=HashTable):
+    table = cls()
+    CatalogStore(str(directory)).load(table, read_only=True)
+    return table
+
+def test_journal_replay_after_crash(tmp_path):
+    store = CatalogStore(str(tmp_path))
+    table = HashTable()
+    store.load(table)
+    model = {}
+    random_ops(table, model, random.Random(3), 300, 2000)
+    # the process dies: no close(), and the last write was cut short
+    store.journal.file.flush()
+    with open(store.journal_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(["I", isbn(10 ** 6), "Torn", "Author", 2000])[:20])
+    store.journal.file.close()
+
+    for cls in TABLES:
+        check_table(load(tmp_path, cls), model)
+
+def test_replay_on_top_of_snapshot(tmp_path):
+    store = CatalogStore(str(tmp_path))
+    table = HashTable()
+    store.load(table)
+    model = {}
+    rng = random.Random(4)
+    random_ops(table, model, rng, 300, 1000)
+    store.compact(table)
+    random_ops(table, model, rng, 300, 1000)
+    store.journal.file.close()
+    check_table(load(tmp_path), model)
+
+def test_crash_between_snapshot_and_truncate(tmp_path):
+    store = CatalogStore(str(tmp_path))
+    table = HashTable()
+    store.load(table)
+    model = {}
+    random_ops(table, model, random.Random(5), 300, 2000)
+    store.journal.file.close()
+    # the snapshot is written but the journal was never truncated: replaying
+    # it again on top of the snapshot must be harmless
+    with open(store.journal_path, encoding="utf-8") as file:
+        journal = file.read()
+    store.journal = None
+    store.compact(table)
+    with open(store.journal_path, "w", encoding="utf-8") as file:
+        file.write(journal)
+    check_table(load(tmp_path), model)
+
+def test_close_compacts_and_reopens(tmp_path):
+    store = CatalogStore(str(tmp_path), compact_after=100)
+    table = HashTable()
+    store.load(table)
+    model = {}
+    random_ops(table, model, random.Random(6), 300, 1000)
+    store.close(table)
+    assert os.path.getsize(store.journal_path) == 0
+
+    store = CatalogStore(str(tmp_path))
+    table = HashTable()
+    store.load(table)
+    check_table(table, model)
+    table.insert(Book(isbn(10 ** 6), "After", "Author", 2001))
+    model[isbn(10 ** 6)] = ("After", "Author", 2001)
+    store.close(table)
+    check_table(load(tmp_path), model)
+
+def test_read_only_load_leaves_files_alone(tmp_path):
+    store = CatalogStore(str(tmp_path), compact_after=1)
+    table = HashTable()
+    store.load(table)
+    table.insert(Book(isbn(1), "Title", "Author", 2000))
+    store.journal.file.close()
+    before = sorted(os.listdir(tmp_path)), os.path.getsize(store.journal_path)
+
+    reader = CatalogStore(str(tmp_path), compact_after=1)
+    table = HashTable()
+    reader.load(table, read_only=True)
+    table.insert(Book(isbn(2), "Title", "Author", 2000))
+    reader.close(table)
+    assert (sorted(os.listdir(tmp_path)), os.path.getsize(store.journal_path)) == before
+
+def test_snapshot_keeps_nul_and_escape(tmp_path):
+    model = {
+        isbn(1): ("Plain", "Author", 2000),
+        isbn(2): ("Nul\0Inside", "\0", -5),
+        isbn(3): ("Escape \x01 and \x010", "\x01\x01", 2001),
+        isbn(4): ("", "", 0),
+    }
+    table = HashTable()
+    for key, value in model.items():
+        table.insert(Book(key, *value))
+    store = CatalogStore(str(tmp_path))
+    store.journal = None
+    store.compact(table)
+    check_table(load(tmp_path), model)
+
+def test_reads_unescaped_snapshot(tmp_path):
+    # LMSSNAP1 files were written without escaping: \x01 is plain text there
+    sections = [isbn(1).encode(), "Old \x010 Title".encode(), b"Author", array("i", [1999]).tobytes()]
+    path = tmp_path / "catalog.snap"
+    path.write_bytes(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC_UNESCAPED, 1, *map(len, sections)) + b"".join(sections))
+    isbns, titles, authors, years = read_snapshot(str(path))
+    assert (isbns, titles, authors, list(years)) == ([isbn(1)], ["Old \x010 Title"], ["Author"], [1999])
+
+
+# -----------------------------
+# External merge sort
+# -----------------------------
+def sort_rows(n):
+    rng = random.Random(8)
+    # few distinct titles, authors and years, so ties fall through to later keys
+    return [(isbn(rng.randrange(10 ** 6)), rng.choice(["beta", "Alpha", "alpha", "Émile", "zeta"]),
+             rng.choice(["Smith", None, "adams", ""]), rng.randrange(1990, 1995)) for _ in range(n)]
+
+@pytest.mark.parametrize("key", sorted(lms_core.SORT_KEYS))
+def test_external_sort_single_run(key):
+    rows = sort_rows(500)
+    assert list(external_sort(rows, key)) == sorted(rows, key=lms_core.SORT_KEYS[key])
+
+@pytest.mark.parametrize("key", sorted(lms_core.SORT_KEYS))
+def test_external_sort_many_runs(key, tmp_path, monkeypatch):
+    # 37 runs merged in groups of 4, so there is an intermediate merge pass
+    monkeypatch.setattr(lms_core, "MERGE_FAN_IN", 4)
+    monkeypatch.setattr(lms_core, "RUN_BLOCK", 16)
+    rows = sort_rows(3000)
+    result = list(external_sort(iter(rows), key, run_size=81, workers=1, directory=str(tmp_path)))
+    assert result == sorted(rows, key=lms_core.SORT_KEYS[key])
+    assert os.listdir(tmp_path) == []  # the runs are removed afterwards
+
+def test_external_sort_in_worker_processes(tmp_path):
+    rows = sort_rows(3000)
+    result = list(external_sort(rows, "author", run_size=400, workers=2, directory=str(tmp_path)))
+    assert result == sorted(rows, key=lms_core.SORT_KEYS["author"])
+    assert os.listdir(tmp_path) == []
+
+
+# -----------------------------
+# Fuzzy lookup
+# -----------------------------
+def fuzzy_isbns(table, text, limit=10):
+    return [(book.isbn, round(s, 3)) for book, s in table.search_fuzzy(text, limit)]
+
+@pytest.mark.parametrize("cls", TABLES)
+def test_search_fuzzy(cls):
+    table = cls()
+    table.insert(Book("9780261103344", "The Hobbit", "J. R. R. Tolkien", 1937))
+    table.insert(Book("978-0-441-17271-9", "Dune", "Frank Herbert", 1965))
+    table.insert(Book("9780141439518", "Pride and Prejudice", "Jane Austen", 1813))
+    table.enable_fuzzy_index()
+    # a swapped pair of digits, a dropped digit, hyphens and spaces typed or not
+    assert fuzzy_isbns(table, "9780261103434") == [("9780261103344", 0.923)]
+    assert fuzzy_isbns(table, "978026110334") == [("9780261103344", 0.923)]
+    assert fuzzy_isbns(table, "978 0 441 17271 9") == [("978-0-441-17271-9", 1.0)]
+    assert fuzzy_isbns(table, "9780441172718") == [("978-0-441-17271-9", 0.923)]
+    # the mean over the words, an author word counting half
+    assert fuzzy_isbns(table, "hobit tolkein") == [("9780261103344", 0.631)]
+    assert fuzzy_isbns(table, "prejudise") == [("9780141439518", 0.889)]
+    assert fuzzy_isbns(table, "zzzzzz") == []
+    # the index follows changes made after it was built
+    table.update("9780261103344", "The Silmarillion", "J. R. R. Tolkien", 1977)
+    assert fuzzy_isbns(table, "hobit") == []
+    assert fuzzy_isbns(table, "silmarilion") == [("9780261103344", 0.917)]
+    table.delete("9780141439518")
+    assert fuzzy_isbns(table, "prejudise") == []
+    assert fuzzy_isbns(table, "9780141439581") == []
+
+
+# -----------------------------
+# ConcurrentHashTable with threads
+# -----------------------------
+@pytest.fixture
+def switch_often():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+def test_concurrent_writers_match_dict_model(switch_often):
+    table = ConcurrentHashTable()
+    table.enable_text_index()
+    writers = 4
+    models = [{} for _ in range(writers)]
+    errors = []
+    done = threading.Event()
+
+    def writer(w):
+        try:
+            rng = random.Random(w)
+            model = models[w]
+            for step in range(4000):
+                # each writer owns the ISBNs congruent to w, so its model is exact
+                key = isbn(rng.randrange(500) * writers + w)
+                value = ("Title %d" % rng.randrange(50), "Writer %d" % w, step)
+                op = rng.random()
+                if op < 0.5:
+                    assert table.insert(Book(key, *value)) == (key not in model)
+                    model.setdefault(key, value)
+                elif op < 0.8:
+                    assert table.delete(key) == (key in model)
+                    model.pop(key, None)
+                else:
+                    assert table.update(key, *value) == (key in model)
+                    if key in model:
+                        model[key] = value
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            rng = random.Random(99)
+            while not done.is_set():
+                key = isbn(rng.randrange(500 * writers))
+                book = table.search(key)
+                assert book is None or book.isbn == key
+                books = [book.isbn for chain in table.snapshot() if chain for book in chain]
+                assert len(books) == len(set(books))
+                list(table.books_by_title(0, 20))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads + readers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    model = {}
+    for part in models:
+        model.update(part)
+    check_table(table, model)
+    assert sorted(book.isbn for book in table.search_text("title")) == sorted(model)
+
+def test_concurrent_readers_never_miss_during_rehash(switch_often):
+    # the books in keep are never touched: lock-free lookups must find
+    # them all while writers grow and shrink the table around them
+    table = ConcurrentHashTable()
+    keep = [isbn(n) for n in range(0, 2000, 7)]
+    for key in keep:
+        table.insert(Book(key, "Kept", "Author", 2000))
+    misses = []
+    done = threading.Event()
+
+    def writer(w):
+        for _ in range(3):
+            keys = [isbn(10 ** 6 + w * 10 ** 5 + n) for n in range(5000)]
+            for key in keys:
+                table.insert(Book(key, "Title", "Author", 2000))
+            for key in keys:
+                table.delete(key)
+
+    def reader():
+        while not done.is_set():
+            for key in keep:
+                if table.search(key) is None:
+                    misses.append(key)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(2)]
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads + readers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert misses == []
+    check_table(table, {key: ("Kept", "Author", 2000) for key in keep})
+
+def test_concurrent_writers_same_keys(switch_often):
+    # racing on the same ISBNs: every insert/delete answer must agree with
+    # the final count, and the indexes with the buckets
+    table = ConcurrentHashTable()
+    inserted = [0] * 4
+    deleted = [0] * 4
+
+    def worker(w):
+        rng = random.Random(w)
+        for _ in range(5000):
+            key = isbn(rng.randrange(300))
+            if rng.random() < 0.5:
+                inserted[w] += table.insert(Book(key, "Title", "Author %d" % w, 2000))
+            else:
+                deleted[w] += table.delete(key)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    books = table.get_all_books()
+    assert len(books) == len(table) == sum(inserted) - sum(deleted)
+    assert sorted(table.title_index) == sorted(book.isbn for book in books)
+
+def test_bulk_load_keeps_other_writers_out(tmp_path):
+    path = tmp_path / "books.csv"
+    write_csv(path, ["%s,Title %d,Author,2000" % (isbn(n), n) for n in range(3000)])
+    store = CatalogStore(str(tmp_path / "catalog"))
+    table = ConcurrentHashTable()
+    store.load(table)
+    table.enable_secondary_indexes()
+    rows = import_books(table, str(path), ImportReport(), batch_size=1000)
+    next(rows)
+
+    # the loading thread itself gets an error instead of a deadlock
+    with pytest.raises(RuntimeError):
+        table.insert(Book(isbn(5000), "Same Thread", "Author", 2000))
+    # other threads wait for the load, then go through the indexes and journal
+    started = threading.Event()
+
+    def other():
+        started.set()
+        table.insert(Book(isbn(5001), "Other Thread", "Writer", 2000))
+        table.enable_fuzzy_index()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    started.wait()
+    thread.join(0.2)
+    assert thread.is_alive() and table.search(isbn(5001)) is None
+    list(rows)
+    thread.join()
+
+    assert len(table) == 3001
+    assert [book.isbn for book in table.query(author="Writer")] == [isbn(5001)]
+    # the fuzzy index built by the other thread was not lost with the detached list
+    assert table.fuzzy_index in table.indexes
+    assert [book.isbn for book, _ in table.search_fuzzy("other thred", 1)] == [isbn(5001)]
+    store.journal.file.close()
+    assert load(tmp_path / "catalog", ConcurrentHashTable).search(isbn(5001)) is not None
@@ -0,0 +1,121 @@
+import random
+from operator import itemgetter
+from types import SimpleNamespace
+
+from virtualview import RangeSelection, VirtualTreeview
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def positions(selection):
+    return {pos for start, stop in selection.ranges() for pos in range(start, stop)}
+
+def check(selection, model):
+    ranges = selection.ranges()
+    for start, stop in ranges:
+        assert start < stop
+    for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+        assert stop < start  # disjoint and not touching
+    assert positions(selection) == model
+    assert len(selection) == len(model)
+    assert bool(selection) == bool(model)
+    for pos in range(-2, 60):
+        assert (pos in selection) == (pos in model)
+
+
+# -----------------------------
+# RangeSelection
+# -----------------------------
+def test_add_merges_touching_ranges():
+    selection = RangeSelection()
+    selection.add(5, 8)
+    selection.add(10, 12)
+    selection.add(8, 10)
+    assert selection.ranges() == [(5, 12)]
+    selection.add(3, 3)
+    assert selection.ranges() == [(5, 12)]
+
+def test_remove_splits_range():
+    selection = RangeSelection([(0, 10)])
+    selection.remove(3, 5)
+    assert selection.ranges() == [(0, 3), (5, 10)]
+    selection.remove(0, 10)
+    assert selection.ranges() == []
+
+def test_toggle():
+    selection = RangeSelection([(2, 5)])
+    selection.toggle(3)
+    assert selection.ranges() == [(2, 3), (4, 5)]
+    selection.toggle(3)
+    assert selection.ranges() == [(2, 5)]
+    selection.toggle(5)
+    assert selection.ranges() == [(2, 6)]
+
+def test_shift_click_extends_from_base():
+    # ctrl-click picks a row, shift-click adds the span from the anchor on
+    # top of the selection as it was before the drag started
+    base = RangeSelection([(0, 2)])
+    base.toggle(10)
+    for focus in (14, 12, 6):
+        selected = base.copy()
+        anchor = 10
+        selected.add(min(anchor, focus), max(anchor, focus) + 1)
+        expected = {0, 1} | set(range(min(anchor, focus), max(anchor, focus) + 1))
+        check(selected, expected)
+    check(base, {0, 1, 10})
+
+def test_insert_shifts_later_rows():
+    selection = RangeSelection([(2, 5), (8, 9)])
+    selection.insert(3)
+    assert selection.ranges() == [(2, 3), (4, 6), (9, 10)]
+    selection.insert(0)
+    assert selection.ranges() == [(3, 4), (5, 7), (10, 11)]
+    selection.insert(11)
+    assert selection.ranges() == [(3, 4), (5, 7), (10, 11)]
+
+def test_delete_closes_gaps():
+    selection = RangeSelection([(2, 5), (7, 9)])
+    selection.delete([5, 6])
+    assert selection.ranges() == [(2, 7)]
+    selection.delete([0, 2, 3, 4, 5])
+    assert selection.ranges() == [(1, 2)]
+    selection.delete([1])
+    assert selection.ranges() == []
+
+def test_matches_set_model():
+    rng = random.Random(1)
+    selection = RangeSelection()
+    model = set()
+    for _ in range(5000):
+        op = rng.random()
+        start = rng.randrange(50)
+        stop = start + rng.randrange(6)
+        if op < 0.25:
+            selection.add(start, stop)
+            model |= set(range(start, stop))
+        elif op < 0.45:
+            selection.remove(start, stop)
+            model -= set(range(start, stop))
+        elif op < 0.65:
+            selection.toggle(start)
+            model ^= {start}
+        elif op < 0.8:
+            selection.insert(start)
+            model = {pos + (pos >= start) for pos in model}
+        elif op < 0.95:
+            gone = sorted(rng.sample(range(55), rng.randrange(1, 6)))
+            selection.delete(gone)
+            model = {pos - sum(g < pos for g in gone) for pos in model if pos not in gone}
+        else:
+            selection = selection.copy() if rng.random() < 0.9 else RangeSelection()
+            if not selection:
+                model = set()
+        check(selection, model)
+
+
+def test_selection_ranges_are_key_ranges():
+    # only source, key and selected are read, so no Tk widget is needed
+    view = SimpleNamespace(source=[(n * 10, "Title") for n in range(20)], key=itemgetter(0),
+                           selected=RangeSelection([(0, 1), (4, 8), (19, 20)]))
+    assert VirtualTreeview.selection_ranges(view) == [("0", "0", 1), ("40", "70", 4), ("190", "190", 1)]
@@ -0,0 +1,462 @@
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from tkinter import ttk
+
+import perf
+
+# -----------------------------
+# Virtual list mode for ttk.Treeview
+# -----------------------------
+# The Treeview only ever holds the rows on screen plus a small buffer.
+# The data lives in a "source": anything with len() and slicing that
+# returns row tuples (a list, or an adapter over a sorted index). The
+# scrollbar is driven by row offsets into that source, so scrolling and
+# refreshing cost the same for 100 rows or 1,000,000.
+#
+# Items are created with iid = row key (the ISBN), so the Treeview itself
+# is the key -> item map. After a single add/update/delete the caller
+# changes its source and reports the change with insert_row / delete_row /
+# move_row / update_row; only that row's item is touched (plus one row
+# entering or leaving the window). render() is the full-rebuild fallback.
+#
+# A source that is loaded lazily sets near_end: it is called whenever the
+# window comes within a screen of the last row, and the caller reports the
+# rows it appends with extended().
+#
+# The selection is kept as ranges of source positions (RangeSelection), so
+# selecting 100k rows by dragging costs the same as selecting ten, and it
+# survives scrolling. The Treeview's own selection only ever mirrors the
+# part of it in the window, and is updated by difference (_sync_window).
+# Clicks and drags are handled here: click, Ctrl+click toggles, Shift+click
+# extends from the last click, dragging selects the rows between and
+# scrolls when the pointer leaves the table. Motion events are coalesced
+# into one update per DRAG_FRAME_MS.
+
+class RangeSelection:
+    # sorted, disjoint, non-adjacent [start, stop) ranges of positions
+    def __init__(self, ranges=()):
+        self.starts = [start for start, _ in ranges]
+        self.stops = [stop for _, stop in ranges]
+
+    def copy(self):
+        return RangeSelection(self.ranges())
+
+    def ranges(self):
+        return list(zip(self.starts, self.stops))
+
+    def clear(self):
+        self.starts = []
+        self.stops = []
+
+    def __len__(self):
+        return sum(self.stops) - sum(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __contains__(self, position):
+        i = bisect_right(self.starts, position) - 1
+        return i >= 0 and position < self.stops[i]
+
+    def add(self, start, stop):
+        # merges with any range it overlaps or touches
+        if start >= stop:
+            return
+        i = bisect_left(self.stops, start)
+        j = bisect_right(self.starts, stop)
+        if i < j:
+            start = min(start, self.starts[i])
+            stop = max(stop, self.stops[j - 1])
+        self.starts[i:j] = [start]
+        self.stops[i:j] = [stop]
+
+    def remove(self, start, stop):
+        if start >= stop:
+            return
+        i = bisect_right(self.stops, start)
+        j = bisect_left(self.starts, stop)
+        if i >= j:
+            return
+        starts, stops = [], []
+        if self.starts[i] < start:
+            starts.append(self.starts[i])
+            stops.append(start)
+        if self.stops[j - 1] > stop:
+            starts.append(stop)
+            stops.append(self.stops[j - 1])
+        self.starts[i:j] = starts
+        self.stops[i:j] = stops
+
+    def toggle(self, position):
+        if position in self:
+            self.remove(position, position + 1)
+        else:
+            self.add(position, position + 1)
+
+    def insert(self, position):
+        # an unselected row was inserted at position: later ones move down
+        i = bisect_right(self.stops, position)
+        if i < len(self.starts) and self.starts[i] < position:
+            self.starts.insert(i + 1, position)
+            self.stops.insert(i + 1, self.stops[i])
+            self.stops[i] = position
+            i += 1
+        for k in range(i, len(self.starts)):
+            self.starts[k] += 1
+            self.stops[k] += 1
+
+    def delete(self, positions):
+        # the rows at these (sorted) positions were removed
+        if not positions or not self.starts:
+            return
+        starts, stops = [], []
+        for start, stop in zip(self.starts, self.stops):
+            start -= bisect_left(positions, start)
+            stop -= bisect_left(positions, stop)
+            if start >= stop:
+                continue
+            if stops and stops[-1] >= start:
+                stops[-1] = stop
+            else:
+                starts.append(start)
+                stops.append(stop)
+        self.starts, self.stops = starts, stops
+
+class VirtualTreeview:
+    HEADING_HEIGHT = 25
+    DRAG_FRAME_MS = 16
+
+    def __init__(self, tree, scrollbar=None, key=itemgetter(0), buffer=5, near_end=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.key = key
+        self.buffer = buffer
+        self.near_end = near_end
+        self.source = []
+        self.offset = 0
+        self.visible = int(tree.cget("height")) or 10
+        self.selected = RangeSelection()
+        self._keys = []
+        self._index = {}         # key -> index in _keys
+        self._anchor = None      # position of the last click, for Shift+click and drags
+        self._drag_base = None   # the selection a drag adds its range to
+        self._drag_y = None
+        self._drag_job = None
+
+        rowheight = ttk.Style(tree).lookup("Treeview", "rowheight")
+        self.row_height = int(rowheight) if rowheight else 20
+
+        tree.configure(yscrollcommand="")
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<ButtonPress-1>", self._on_press, add="+")
+        tree.bind("<B1-Motion>", self._on_motion, add="+")
+        tree.bind("<ButtonRelease-1>", self._on_release, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel, add="+")
+        tree.bind("<Button-4>", lambda e: self._scroll_event(-3), add="+")
+        tree.bind("<Button-5>", lambda e: self._scroll_event(3), add="+")
+        tree.bind("<Prior>", lambda e: self._scroll_event(-self.visible), add="+")
+        tree.bind("<Next>", lambda e: self._scroll_event(self.visible), add="+")
+        tree.bind("<Home>", lambda e: self._scroll_event(-len(self.source)), add="+")
+        tree.bind("<End>", lambda e: self._scroll_event(len(self.source)), add="+")
+        tree.bind("<Up>", lambda e: self._on_arrow(-1), add="+")
+        tree.bind("<Down>", lambda e: self._on_arrow(1), add="+")
+
+    def set_source(self, source):
+        self.source = source
+        self.offset = 0
+        self.selected = RangeSelection()
+        self._anchor = None
+        self.render()
+
+    def refresh(self):
+        self.render()
+
+    def render(self):
+        tree = self.tree
+        total = len(self.source)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        rows = self.source[self.offset:self.offset + self.visible + self.buffer]
+        if self._keys:
+            tree.delete(*self._keys)
+        keys = []
+        for row in rows:
+            key = str(self.key(row))
+            tree.insert("", "end", iid=key, values=row)
+            keys.append(key)
+        self._keys = keys
+        self._reindex()
+        selected = [key for i, key in enumerate(keys) if self.offset + i in self.selected]
+        if selected:
+            tree.selection_set(selected)
+        self._update_scrollbar(total)
+        self._check_near_end(total)
+
+    def insert_row(self, position, row):
+        # the source already holds row at position
+        self.selected.insert(position)
+        self._shift_anchor(position, 1)
+        if position < self.offset:
+            self.offset += 1  # keep the same rows on screen
+        else:
+            self._insert_item(position, row)
+        self._fill()
+
+    def delete_row(self, position, key):
+        # the source no longer holds the row that was at position
+        self.selected.delete([position])
+        self._shift_anchor(position, -1)
+        if position < self.offset:
+            self.offset -= 1
+        else:
+            self._delete_item(str(key))
+        self._fill()
+
+    def delete_rows(self, positions):
+        # many rows left the source (positions sorted, before the removal)
+        self.selected.delete(positions)
+        self._anchor = None
+        self.render()
+
+    def move_row(self, old_position, new_position, row):
+        # a row whose sort key changed; new_position is in the updated source
+        key = str(self.key(row))
+        if old_position == new_position:
+            self.update_row(row)
+            return
+        was_selected = old_position in self.selected
+        self.selected.delete([old_position])
+        self.selected.insert(new_position)
+        if was_selected:
+            self.selected.add(new_position, new_position + 1)
+        self._anchor = None
+        if old_position < self.offset:
+            self.offset -= 1
+        else:
+            self._delete_item(key)
+        if new_position < self.offset:
+            self.offset += 1
+        else:
+            self._insert_item(new_position, row)
+        self._fill()
+
+    def update_row(self, row):
+        key = str(self.key(row))
+        if key in self._keys:
+            self.tree.item(key, values=row)
+
+    def _insert_item(self, position, row):
+        index = position - self.offset
+        if index > len(self._keys):
+            return
+        key = str(self.key(row))
+        self.tree.insert("", index, iid=key, values=row)
+        self._keys.insert(index, key)
+        self._reindex()
+        if position in self.selected:
+            self.tree.selection_add(key)
+
+    def _delete_item(self, key):
+        if key in self._index:
+            self._keys.remove(key)
+            self.tree.delete(key)
+            self._reindex()
+
+    def _reindex(self):
+        self._index = {key: i for i, key in enumerate(self._keys)}
+
+    def _shift_anchor(self, position, step):
+        if self._anchor is not None and self._anchor >= position:
+            self._anchor = max(0, self._anchor + step)
+
+    def _fill(self):
+        # top the window up from the source, or trim it, after an edit
+        total = len(self.source)
+        if self.offset > max(0, total - self.visible):
+            self.render()
+            return
+        keys = self._keys
+        want = min(self.visible + self.buffer, total - self.offset)
+        if len(keys) > want:
+            self.tree.delete(*keys[want:])
+            del keys[want:]
+            self._reindex()
+        elif len(keys) < want:
+            for row in self.source[self.offset + len(keys):self.offset + want]:
+                key = str(self.key(row))
+                self.tree.insert("", "end", iid=key, values=row)
+                self._index[key] = len(keys)
+                keys.append(key)
+                if self.offset + self._index[key] in self.selected:
+                    self.tree.selection_add(key)
+        self._update_scrollbar(total)
+        self._check_near_end(total)
+
+    def extended(self):
+        # rows were appended to the end of the source
+        self._fill()
+
+    def _check_near_end(self, total):
+        if self.near_end is not None and self.offset + 2 * self.visible + self.buffer >= total:
+            self.near_end()
+
+    def _update_scrollbar(self, total):
+        if self.scrollbar is None:
+            return
+        if total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.visible) / total)
+
+    def scroll(self, rows):
+        offset = max(0, min(self.offset + rows, len(self.source) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def yview(self, *args):
+        # scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"|"pages")
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.source))
+            self.render()
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll(step * self.visible if args[2] == "pages" else step)
+
+    def selection(self):
+        # selected keys in source order
+        return [str(self.key(row)) for start, stop in self.selected.ranges()
+                for row in self.source[start:stop]]
+
+    def selection_ranges(self):
+        # (first key, last key, rows) per selected run of rows; with a source
+        # in key order each is a key range
+        return [(str(self.key(self.source[start])), str(self.key(self.source[stop - 1])), stop - start)
+                for start, stop in self.selected.ranges()]
+
+    def select(self, start, stop, extend=False):
+        # select source positions [start, stop), replacing the selection unless extend
+        if not extend:
+            self.selected.clear()
+        self.selected.add(max(0, start), min(stop, len(self.source)))
+        self._sync_window()
+
+    def _sync_window(self):
+        # make the Treeview's selection match self.selected, by difference
+        want = {key for i, key in enumerate(self._keys) if self.offset + i in self.selected}
+        have = set(self.tree.selection())
+        if have - want:
+            self.tree.selection_remove(list(have - want))
+        if want - have:
+            self.tree.selection_add(list(want - have))
+
+    def _scroll_event(self, rows):
+        self.scroll(rows)
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_event(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        visible = max(1, (event.height - self.HEADING_HEIGHT) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def _position_at(self, y):
+        row = self.tree.identify_row(y)
+        return self.offset + self._index[row] if row in self._index else None
+
+    def _on_press(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # headings and separators keep their default bindings
+        position = self._position_at(event.y)
+        if position is None:
+            return None
+        self.tree.focus_set()
+        self.tree.focus(self._keys[position - self.offset])
+        if event.state & 0x0001 and self._anchor is not None:  # Shift: extend from the last click
+            self._drag_base = self.selected.copy() if event.state & 0x0004 else RangeSelection()
+            self._drag_to(position)
+        else:
+            if event.state & 0x0004:  # Control: toggle one row
+                self.selected.toggle(position)
+                self._drag_base = self.selected.copy()
+            else:
+                self.selected = RangeSelection([(position, position + 1)])
+                self._drag_base = RangeSelection()
+            self._anchor = position
+            self._sync_window()
+        return "break"
+
+    def _on_motion(self, event):
+        if self._drag_base is None:
+            return
+        self._drag_y = event.y
+        if self._drag_job is None:
+            self._drag_job = self.tree.after(self.DRAG_FRAME_MS, self._drag_frame)
+
+    def _drag_frame(self):
+        # past the top or bottom edge the window scrolls a row per frame
+        self._drag_job = None
+        if self._drag_base is None or self._anchor is None:
+            return
+        y = self._drag_y
+        outside = y < self.HEADING_HEIGHT or y >= self.HEADING_HEIGHT + self.visible * self.row_height
+        if y < self.HEADING_HEIGHT:
+            self.scroll(-1)
+            position = self.offset
+        elif outside:
+            self.scroll(1)
+            position = min(self.offset + self.visible, len(self.source)) - 1
+        else:
+            position = self._position_at(y)
+            if position is None:
+                return
+        self._drag_to(position)
+        if outside:
+            self._drag_job = self.tree.after(self.DRAG_FRAME_MS, self._drag_frame)
+
+    def _drag_to(self, position):
+        start, stop = sorted((self._anchor, position))
+        self.selected = self._drag_base.copy()
+        self.selected.add(start, stop + 1)
+        self._sync_window()
+
+    def _on_release(self, event):
+        if self._drag_job is not None:
+            self.tree.after_cancel(self._drag_job)
+            self._drag_job = None
+            position = self._position_at(event.y)
+            if self._drag_base is not None and position is not None:
+                self._drag_to(position)  # the motion still waiting for its frame
+        self._drag_base = None
+        self._drag_y = None
+
+    def _on_select(self, event):
+        # the Treeview changed its selection itself (keyboard): take the window part
+        self.selected.remove(self.offset, self.offset + len(self._keys))
+        for key in self.tree.selection():
+            if key in self._index:
+                position = self.offset + self._index[key]
+                self.selected.add(position, position + 1)
+
+    def _on_arrow(self, step):
+        # moving past the first/last visible row scrolls the window
+        keys = self._keys[:self.visible]
+        focus = self.tree.focus()
+        if not keys or focus != (keys[0] if step < 0 else keys[-1]):
+            return None
+        before = self.offset
+        self.scroll(step)
+        if self.offset != before:
+            target = self._keys[0] if step < 0 else self._keys[min(self.visible, len(self._keys)) - 1]
+            self._anchor = self.offset + self._index[target]
+            self.selected = RangeSelection([(self._anchor, self._anchor + 1)])
+            self.tree.focus(target)
+            self.tree.selection_set(target)
+        return "break"
+
+perf.instrument(VirtualTreeview, ["set_source", "render", "_fill", "scroll"], "view")